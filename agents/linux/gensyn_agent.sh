@@ -1,6 +1,7 @@
 #!/usr/bin/env bash
 # Gensyn heartbeat agent (Linux)
-# Sends node health to central server every run (use with systemd timer)
+# Sends node health to central server every run (use with systemd timer),
+# or stays resident with --daemon / DAEMON=true (gensyn-agent-daemon.service)
 set -euo pipefail
 
 # --- Config --------------------------------------------------------------------
@@ -14,6 +15,9 @@ CHECK_PORT="${CHECK_PORT:-true}" # check local UI port 3000
 PORT="${PORT:-3000}"
 IP_CMD_V4="${IP_CMD_V4:-https://ipv4.icanhazip.com}"
 IP_CMD="${IP_CMD:-https://ifconfig.me}"
+IP_LOOKUP="${IP_LOOKUP:-true}"        # false = send no ip, the server takes it from the connection
+IP_CACHE_TTL="${IP_CACHE_TTL:-21600}" # seconds to reuse the cached public IP (0 = always look up)
+STATE_DIR="${STATE_DIR:-/var/lib/gensyn-agent}"  # persisted agent state (IP cache, ...)
 GSWARM_EOA="${GSWARM_EOA:-}"
 GSWARM_PEER_IDS="${GSWARM_PEER_IDS:-}"  # comma-separated or JSON array
 GSWARM_TGID="${GSWARM_TGID:-}"          # optional per-node Telegram ID for off-chain stats
@@ -21,6 +25,18 @@ GSWARM_TGID="${GSWARM_TGID:-}"          # optional per-node Telegram ID for off-
 # Extra detection knobs
 AUTO_KILL_EMPTY_SCREEN="${AUTO_KILL_EMPTY_SCREEN:-false}"
 
+# Remediation actions the server may return in the heartbeat response
+# (comma-separated allow-list; "none" disables). Outcome is reported on the next beat.
+# By default the server may only restart the launcher; closing the screen is allowed
+# only when the local opt-in AUTO_KILL_EMPTY_SCREEN=true is set (or listed explicitly).
+if [[ -z "${REMOTE_ACTIONS:-}" ]]; then
+  REMOTE_ACTIONS="restart-launcher"
+  if [[ "$AUTO_KILL_EMPTY_SCREEN" == "true" ]]; then
+    REMOTE_ACTIONS+=",kill-empty-screen"
+  fi
+fi
+LAUNCHER_SERVICE="${LAUNCHER_SERVICE:-gensyn-screen-launcher.service}"
+
 # Runtime “allow/deny”
 # ⚠️ NOTE: default uses double quotes here; in /etc/gensyn-agent.env prefer SINGLE quotes for regex values.
 ALLOW_REGEX="${ALLOW_REGEX:-rgym_exp\.runner\.swarm_launcher|hivemind_cli/p2pd|(^|[/[:space:]])rl-swarm([[:space:]]|$)|python[^ ]*.*rgym_exp}"
@@ -36,15 +52,42 @@ REQUIRE_P2PD="${REQUIRE_P2PD:-false}"
 LOG_FILE="${LOG_FILE:-}"            # e.g. /root/rl-swarm/logs/swarm.log
 LOG_MAX_AGE="${LOG_MAX_AGE:-300}"   # seconds
 
+# Training progress from LOG_FILE (read incrementally from a persisted byte offset)
+LOG_TAIL_MAX_BYTES="${LOG_TAIL_MAX_BYTES:-1048576}"   # cap per run; older backlog is skipped
+LOG_ROUND_REGEX="${LOG_ROUND_REGEX:-[Rr]ound[:= #]*[0-9]+}"
+LOG_STAGE_REGEX="${LOG_STAGE_REGEX:-[Ss]tage[:= #]*[0-9]+}"
+LOG_ERROR_REGEX="${LOG_ERROR_REGEX:-Traceback|ERROR|Exception|CUDA out of memory|Killed}"
+
+# Daemon mode: one resident process with a keep-alive connection to the monitor
+DAEMON="${DAEMON:-false}"
+BEAT_INTERVAL="${BEAT_INTERVAL:-20}"  # seconds between regular beats
+BEAT_JITTER="${BEAT_JITTER:-5}"       # + random 0..N seconds, so nodes do not beat in lockstep
+STATE_POLL="${STATE_POLL:-5}"         # local re-check period; a status change is sent at once
+PROC_RESCAN="${PROC_RESCAN:-60}"      # while UP, trust cached pids/screen at most this long
+HTTP_TIMEOUT="${HTTP_TIMEOUT:-10}"    # request timeout (keep-alive read / curl --max-time)
+
+# Server-assigned schedule: the heartbeat response says in how many seconds to beat
+# next (a per-node slot, spread across the interval; longer when the monitor is
+# overloaded) and a 429 carries retry_after. false = ignore it, beat on our own timing.
+FOLLOW_SCHEDULE="${FOLLOW_SCHEDULE:-true}"
+TIMER_INTERVAL="${TIMER_INTERVAL:-60}"  # one-shot mode: period of gensyn-agent.timer
+
 # Optional: global env file
 if [[ -f /etc/gensyn-agent.env ]]; then
   # shellcheck disable=SC1091
   . /etc/gensyn-agent.env
 fi
+[[ "${1:-}" == "--daemon" ]] && DAEMON=true
 
 # --- Helpers -------------------------------------------------------------------
 have() { command -v "$1" >/dev/null 2>&1; }
 log()  { printf '[%s] %s\n' "$(date -u +%F'T'%T'Z')" "$*" >&2; }
+# Milliseconds since epoch into $NOW_MS without forking (bash 5 EPOCHREALTIME; 0 otherwise)
+now_ms() {
+  local t="${EPOCHREALTIME:-0}"
+  t=${t/[.,]/}
+  NOW_MS=$(( 10#$t / 1000 ))
+}
 json_escape() {
   local str="${1:-}"
   str=${str//\\/\\\\}
@@ -62,39 +105,78 @@ screen_session_name() {
     | head -n1
 }
 
+# --- Process table -------------------------------------------------------------
+# One pass over /proc per run, no forks: full cmdline for every process, and the
+# STY (screen session) environ entry for ALLOW/p2pd candidates. All runtime checks
+# below are answered from these tables instead of pgrep/ps/tr per PID.
+P2PD_REGEX='hivemind_cli/p2pd'
+declare -A PROC_CMD=()   # pid -> "argv joined by spaces" (same text pgrep -f / ps args= see)
+declare -A PROC_STY=()   # pid -> STY value ("" if not inside screen)
+ALLOW_PIDS=()
+P2PD_PIDS=()
+
+scan_procs() {
+  local d pid cmd entry is_allow is_p2pd
+  local -a argv envv
+  for d in /proc/[0-9]*; do
+    pid=${d#/proc/}
+    [[ "$pid" == "$$" ]] && continue
+    mapfile -d '' -t argv 2>/dev/null < "$d/cmdline" || continue
+    (( ${#argv[@]} )) || continue   # kernel threads have empty cmdline
+    cmd="${argv[*]}"
+    PROC_CMD[$pid]=$cmd
+    is_allow=0; is_p2pd=0
+    [[ "$cmd" =~ $ALLOW_REGEX ]] && is_allow=1
+    [[ "$cmd" =~ $P2PD_REGEX ]] && is_p2pd=1
+    (( is_allow || is_p2pd )) || continue
+    (( is_allow )) && ALLOW_PIDS+=("$pid")
+    (( is_p2pd )) && P2PD_PIDS+=("$pid")
+    PROC_STY[$pid]=""
+    mapfile -d '' -t envv 2>/dev/null < "$d/environ" || continue
+    for entry in "${envv[@]}"; do
+      if [[ "$entry" == STY=* ]]; then
+        PROC_STY[$pid]=${entry#STY=}
+        break
+      fi
+    done
+  done
+}
+
+# DENY is matched case-insensitively (as grep -Ei did)
+is_denied() {
+  local rc=1
+  shopt -s nocasematch
+  [[ "$1" =~ $DENY_REGEX ]] && rc=0
+  shopt -u nocasematch
+  return $rc
+}
+
 # Is there an ALLOW process in THIS screen (and not matching DENY)?
 has_target_in_screen() {
-  local sname="$1" p args
+  local sname="$1" p
   [[ -z "$sname" ]] && return 1
-  have pgrep || return 1
-  while IFS= read -r p; do
-    [[ -z "$p" ]] && continue
-    if tr '\0' '\n' < "/proc/$p/environ" 2>/dev/null | grep -qx "STY=$sname"; then
-      args=$(ps -p "$p" -o args= 2>/dev/null || true)
-      if ! grep -Eiq "$DENY_REGEX" <<<"$args"; then
-        return 0
-      fi
-    fi
-  done < <(pgrep -f "$ALLOW_REGEX" 2>/dev/null || true)
+  for p in "${ALLOW_PIDS[@]}"; do
+    [[ "${PROC_STY[$p]:-}" == "$sname" ]] || continue
+    is_denied "${PROC_CMD[$p]}" || return 0
+  done
   return 1
 }
 
 # Require p2pd: false (no requirement) | any (anywhere) | screen (inside this screen)
 p2pd_ok() {
-  local mode="${REQUIRE_P2PD}"
+  local mode="${REQUIRE_P2PD}" p
   case "$mode" in
     false) return 0 ;;
     any)
-      pgrep -f 'hivemind_cli/p2pd' >/dev/null 2>&1
+      (( ${#P2PD_PIDS[@]} > 0 ))
       return $?
       ;;
     screen)
       local sname="$1"
       [[ -n "$sname" ]] || return 1
-      have pgrep || return 1
-      while IFS= read -r p; do
-        tr '\0' '\n' < "/proc/$p/environ" 2>/dev/null | grep -qx "STY=$sname" && return 0
-      done < <(pgrep -f 'hivemind_cli/p2pd' 2>/dev/null || true)
+      for p in "${P2PD_PIDS[@]}"; do
+        [[ "${PROC_STY[$p]:-}" == "$sname" ]] && return 0
+      done
       return 1
       ;;
     *) return 0 ;;
@@ -104,7 +186,7 @@ p2pd_ok() {
 # If no screen allowed: any ALLOW process?
 proc_ok() {
   [[ "$PROC_FALLBACK_WITHOUT_SCREEN" != "true" ]] && return 1
-  have pgrep && pgrep -f "$ALLOW_REGEX" >/dev/null 2>&1
+  (( ${#ALLOW_PIDS[@]} > 0 ))
 }
 
 # Port check
@@ -123,7 +205,7 @@ log_fresh() {
   [[ -z "${LOG_FILE}" ]] && return 0
   [[ ! -f "${LOG_FILE}" ]] && return 1
   local now ts age
-  now=$(date +%s)
+  printf -v now '%(%s)T' -1
   ts=$(stat -c %Y "${LOG_FILE}" 2>/dev/null || echo 0)
   age=$(( now - ts ))
   [[ ${age} -le ${LOG_MAX_AGE} ]]
@@ -142,34 +224,179 @@ public_ip() {
   (curl -fsS --max-time 2 "${IP_CMD}" || true) | tr -d '\r\n'
 }
 
+# Incremental tail of LOG_FILE: only bytes appended since the last run are read.
+# State in $STATE_DIR/log_tail: "<inode> <offset> <round> <stage>" + last error line.
+# A new inode or a file shorter than the offset means rotation/truncation -> start over.
+# Sets LOG_ROUND, LOG_STAGE (last seen values), LOG_NEW_ERRORS, LOG_LAST_ERROR, LOG_NEW_BYTES.
+LOG_ROUND=""; LOG_STAGE=""; LOG_NEW_ERRORS=0; LOG_LAST_ERROR=""; LOG_NEW_BYTES=0
+tail_log() {
+  [[ -n "${LOG_FILE}" && -f "${LOG_FILE}" ]] || return 0
+  local state="${STATE_DIR}/log_tail" st inode size off=0 s_inode="" round stage errs lasterr
+  st=$(stat -c '%i %s' "${LOG_FILE}" 2>/dev/null) || return 0
+  read -r inode size <<<"$st"
+  if [[ -r "$state" ]]; then
+    { read -r s_inode off LOG_ROUND LOG_STAGE; read -r LOG_LAST_ERROR; } < "$state" || true
+  fi
+  [[ "$off" =~ ^[0-9]+$ ]] || off=0
+  [[ "$LOG_ROUND" == "-" ]] && LOG_ROUND=""
+  [[ "$LOG_STAGE" == "-" ]] && LOG_STAGE=""
+  if [[ "$s_inode" != "$inode" ]] || (( size < off )); then
+    off=0
+  fi
+  if (( size - off > LOG_TAIL_MAX_BYTES )); then
+    off=$(( size - LOG_TAIL_MAX_BYTES ))
+  fi
+  if (( size > off )); then
+    LOG_NEW_BYTES=$(( size - off ))
+    IFS=$'\t' read -r round stage errs lasterr < <(
+      tail -c +"$(( off + 1 ))" "${LOG_FILE}" 2>/dev/null | head -c "$LOG_NEW_BYTES" \
+        | awk -v rre="$LOG_ROUND_REGEX" -v sre="$LOG_STAGE_REGEX" -v ere="$LOG_ERROR_REGEX" '
+            function lastnum(s,   m, n, a) { m = substr(s, RSTART, RLENGTH); gsub(/[^0-9]+/, " ", m); n = split(m, a, " "); return n ? a[n] : "" }
+            { if (match($0, rre)) r = lastnum($0)
+              if (match($0, sre)) g = lastnum($0)
+              if ($0 ~ ere) { e++; le = $0 } }
+            END { gsub(/[\t\r]/, " ", le); printf "%s\t%s\t%d\t%s\n", (r == "" ? "-" : r), (g == "" ? "-" : g), e, substr(le, 1, 300) }'
+    ) || true
+    [[ -n "${round:-}" && "$round" != "-" ]] && LOG_ROUND=$round
+    [[ -n "${stage:-}" && "$stage" != "-" ]] && LOG_STAGE=$stage
+    LOG_NEW_ERRORS=${errs:-0}
+    [[ -n "${lasterr:-}" ]] && LOG_LAST_ERROR=$lasterr
+  fi
+  if mkdir -p "$STATE_DIR" 2>/dev/null; then
+    printf '%s %s %s %s\n%s\n' "$inode" "$size" "${LOG_ROUND:--}" "${LOG_STAGE:--}" "$LOG_LAST_ERROR" \
+      > "${state}.tmp" 2>/dev/null && mv -f "${state}.tmp" "$state" 2>/dev/null || true
+  fi
+}
+
+# Execute actions from the heartbeat response body: "actions":[{"id":"...","type":"..."}, ...]
+# (keys in any order). Outcomes are appended to $STATE_DIR/action_results and sent with
+# the next beat.
+run_actions() {
+  local body="$1" rest obj id type ok detail
+  local start_re='^[[:space:]]*:[[:space:]]*\['
+  local obj_re='^[[:space:]]*,?[[:space:]]*(\{[^{}]*\})'
+  local id_re='"id"[[:space:]]*:[[:space:]]*"([^"]+)"'
+  local type_re='"type"[[:space:]]*:[[:space:]]*"([^"]+)"'
+  [[ "$REMOTE_ACTIONS" == "none" || -z "$REMOTE_ACTIONS" ]] && return 0
+  rest=${body#*\"actions\"}
+  [[ "$rest" == "$body" ]] && return 0
+  [[ "$rest" =~ $start_re ]] || return 0
+  rest=${rest#"${BASH_REMATCH[0]}"}
+  while [[ "$rest" =~ $obj_re ]]; do
+    obj=${BASH_REMATCH[1]}
+    rest=${rest#"${BASH_REMATCH[0]}"}
+    id=""; type=""
+    [[ "$obj" =~ $id_re ]] && id=${BASH_REMATCH[1]}
+    [[ "$obj" =~ $type_re ]] && type=${BASH_REMATCH[1]}
+    [[ -n "$id" && -n "$type" ]] || continue
+    ok=false; detail=""
+    if [[ ",${REMOTE_ACTIONS}," != *",${type},"* ]]; then
+      detail="not allowed by REMOTE_ACTIONS"
+    else
+      case "$type" in
+        restart-launcher)
+          if detail=$(systemctl restart "$LAUNCHER_SERVICE" 2>&1); then ok=true; detail="restarted ${LAUNCHER_SERVICE}"; fi
+          ;;
+        kill-empty-screen)
+          if detail=$(screen -S "$SCREEN_NAME" -X quit 2>&1); then ok=true; detail="closed screen ${SCREEN_NAME}"; fi
+          ;;
+        *) detail="unknown action" ;;
+      esac
+    fi
+    log "action id=${id} type=${type} ok=${ok}${detail:+ detail=${detail}}"
+    if mkdir -p "$STATE_DIR" 2>/dev/null; then
+      printf '{"id":"%s","type":"%s","ok":%s,"detail":"%s"}\n' \
+        "$(json_escape "$id")" "$(json_escape "$type")" "$ok" "$(json_escape "$(printf '%.180s' "$detail")")" \
+        >> "${STATE_DIR}/action_results" 2>/dev/null || true
+    fi
+  done
+}
+
+# Cheap network identity: default route device/source/gateway. A change here means
+# the public IP may have changed too, so the cached value is dropped early.
+net_fingerprint() {
+  local out="" dev="" src="" via="" line
+  if have ip; then
+    out=$(ip -4 -o route get 1.1.1.1 2>/dev/null || true)
+    [[ "$out" =~ dev\ ([^ ]+) ]] && dev=${BASH_REMATCH[1]}
+    [[ "$out" =~ src\ ([^ ]+) ]] && src=${BASH_REMATCH[1]}
+    [[ "$out" =~ via\ ([^ ]+) ]] && via=${BASH_REMATCH[1]}
+  elif [[ -r /proc/net/route ]]; then
+    while read -r line; do
+      # Iface Destination Gateway ...
+      set -- $line
+      if [[ "${2:-}" == "00000000" ]]; then dev=$1; via=$3; break; fi
+    done < /proc/net/route
+  fi
+  printf '%s' "${dev:-none}@${src:-none}@${via:-none}"
+}
+
+# Public IP with an on-disk cache: "<ip> <epoch> <fingerprint>" in $STATE_DIR/public_ip.
+# Looks up again only when the TTL expires or the network fingerprint changes;
+# if the lookup fails, the last known IP is reused.
+public_ip_cached() {
+  [[ "$IP_LOOKUP" == "true" ]] || return 0
+  local cache="${STATE_DIR}/public_ip" now fp ip="" ts=0 cfp="" fresh
+  printf -v now '%(%s)T' -1
+  fp=$(net_fingerprint)
+  if [[ -r "$cache" ]]; then
+    read -r ip ts cfp < "$cache" || true
+    [[ "$ts" =~ ^[0-9]+$ ]] || ts=0
+    if [[ -n "$ip" && "$cfp" == "$fp" ]] && (( IP_CACHE_TTL > 0 && now - ts < IP_CACHE_TTL )); then
+      printf '%s' "$ip"
+      return 0
+    fi
+  fi
+  fresh=$(public_ip)
+  if [[ -n "$fresh" ]]; then
+    if mkdir -p "$STATE_DIR" 2>/dev/null; then
+      printf '%s %s %s\n' "$fresh" "$now" "$fp" > "${cache}.tmp" 2>/dev/null \
+        && mv -f "${cache}.tmp" "$cache" 2>/dev/null || true
+    fi
+    ip=$fresh
+  fi
+  printf '%s' "$ip"
+}
+
 # --- Health check --------------------------------------------------------------
 status="DOWN"
 reason=""
+sname=""
+RUNTIME_SCANNED_AT=0
 
-sname="$(screen_session_name || true)"
-
-if [[ -n "$sname" ]]; then
-  if ! has_target_in_screen "$sname"; then
-    reason="empty_screen_no_runtime"
-  elif ! p2pd_ok "$sname"; then
-    reason="no_p2pd_in_screen"
-  elif ! port_ok; then
-    reason="port_closed_${PORT}"
-  elif ! log_fresh; then
-    reason="stale_log"
-  else
-    status="UP"
+# Process table + screen session. A one-shot run always scans; the daemon reuses the
+# previous tick's tables while the node is UP, every cached pid (and the screen pid)
+# is still alive and PROC_RESCAN has not expired. Any DOWN tick rescans from scratch.
+refresh_runtime() {
+  local now p fresh=1
+  printf -v now '%(%s)T' -1
+  if [[ "$DAEMON" == "true" && "$status" == "UP" ]] && (( now - RUNTIME_SCANNED_AT < PROC_RESCAN )); then
+    fresh=0
+    for p in "${ALLOW_PIDS[@]}" "${P2PD_PIDS[@]}"; do
+      [[ -d "/proc/$p" ]] || { fresh=1; break; }
+    done
+    [[ -z "$sname" || -d "/proc/${sname%%.*}" ]] || fresh=1
   fi
+  (( fresh )) || return 0
+  PROC_CMD=(); PROC_STY=(); ALLOW_PIDS=(); P2PD_PIDS=()
+  scan_procs
+  sname="$(screen_session_name || true)"
+  RUNTIME_SCANNED_AT=$now
+}
 
-  if [[ "$status" == "DOWN" && "$reason" == "empty_screen_no_runtime" && "$AUTO_KILL_EMPTY_SCREEN" == "true" ]]; then
-    screen -S "$SCREEN_NAME" -X quit || true
-    log "INFO: auto-closed empty screen $SCREEN_NAME"
-  fi
-else
-  # No screen found — allow fallback if enabled
-  if proc_ok; then
-    if ! p2pd_ok ""; then
-      reason="no_p2pd"
+# Sets status/reason (+ t_start/t_scan for the timing line)
+check_health() {
+  now_ms; t_start=$NOW_MS
+  refresh_runtime
+  now_ms; t_scan=$NOW_MS
+  status="DOWN"
+  reason=""
+
+  if [[ -n "$sname" ]]; then
+    if ! has_target_in_screen "$sname"; then
+      reason="empty_screen_no_runtime"
+    elif ! p2pd_ok "$sname"; then
+      reason="no_p2pd_in_screen"
     elif ! port_ok; then
       reason="port_closed_${PORT}"
     elif ! log_fresh; then
@@ -177,54 +404,329 @@ else
     else
       status="UP"
     fi
+
+    if [[ "$status" == "DOWN" && "$reason" == "empty_screen_no_runtime" && "$AUTO_KILL_EMPTY_SCREEN" == "true" ]]; then
+      screen -S "$SCREEN_NAME" -X quit || true
+      log "INFO: auto-closed empty screen $SCREEN_NAME"
+    fi
   else
-    reason="no_screen_no_proc"
+    # No screen found — allow fallback if enabled
+    if proc_ok; then
+      if ! p2pd_ok ""; then
+        reason="no_p2pd"
+      elif ! port_ok; then
+        reason="port_closed_${PORT}"
+      elif ! log_fresh; then
+        reason="stale_log"
+      else
+        status="UP"
+      fi
+    else
+      reason="no_screen_no_proc"
+    fi
   fi
-fi
+}
+
+build_payload() {
+  # put reason into meta when DOWN (to see it in /api/nodes & UI)
+  META_OUT="${META}"
+  [[ -n "$reason" && "$status" != "UP" ]] && META_OUT="${META:+$META,}reason=${reason}"
+
+  payload=$(printf '{"node_id":"%s","ip":"%s","meta":"%s","status":"%s"' \
+    "$(json_escape "$NODE_ID")" \
+    "$(json_escape "$IP")" \
+    "$(json_escape "$META_OUT")" \
+    "$(json_escape "$status")")
+  if [[ -n "$GSWARM_EOA" ]]; then
+    payload=$(printf '%s,"gswarm_eoa":"%s"' "$payload" "$(json_escape "$GSWARM_EOA")")
+  fi
+  if [[ -n "$GSWARM_PEER_IDS" ]]; then
+    payload=$(printf '%s,"gswarm_peer_ids":"%s"' "$payload" "$(json_escape "$GSWARM_PEER_IDS")")
+  fi
+  if [[ -n "$GSWARM_TGID" ]]; then
+    payload=$(printf '%s,"gswarm_tgid":"%s"' "$payload" "$(json_escape "$GSWARM_TGID")")
+  fi
+  if [[ -n "$LOG_FILE" ]]; then
+    payload=$(printf '%s,"progress":{"round":%s,"stage":%s,"errors":%d,"log_bytes":%d,"last_error":"%s"}' \
+      "$payload" "${LOG_ROUND:-null}" "${LOG_STAGE:-null}" "$LOG_NEW_ERRORS" "$LOG_NEW_BYTES" \
+      "$(json_escape "$LOG_LAST_ERROR")")
+  fi
+  action_results=""
+  if [[ -r "${STATE_DIR}/action_results" ]]; then
+    while IFS= read -r line; do
+      [[ "$line" == \{* ]] && action_results="${action_results:+${action_results},}${line}"
+    done < "${STATE_DIR}/action_results"
+    [[ -n "$action_results" ]] && payload="${payload},\"action_results\":[${action_results}]"
+  fi
+  if [[ "$DAEMON" == "true" ]]; then
+    payload="${payload},\"beat_interval\":${BEAT_INTERVAL}"
+  else
+    payload="${payload},\"beat_interval\":${TIMER_INTERVAL}"
+  fi
+  payload="${payload}}"
+}
 
-IP="$(public_ip)"
+# --- Keep-alive HTTP (daemon mode) ----------------------------------------------
+# One HTTP/1.1 connection reused across beats: /dev/tcp for http://, an
+# "openssl s_client" coprocess for https:// (TLS handshake once, not per beat).
+# Any protocol hiccup closes the connection and the beat falls back to curl;
+# after a failed connect keep-alive is paused for KA_RETRY seconds.
+HB_SCHEME=""; HB_HOST=""; HB_PORT=""; HB_BASE=""; HB_HOSTHDR=""
+HB_IN=""; HB_OUT=""; HB_PID=""; KA_PAUSED_UNTIL=0; KA_RETRY=60
 
-# put reason into meta when DOWN (to see it in /api/nodes & UI)
-META_OUT="${META}"
-[[ -n "$reason" && "$status" != "UP" ]] && META_OUT="${META:+$META,}reason=${reason}"
+http_target() {
+  local url="${SERVER_URL%/}" rest hostport
+  HB_SCHEME=${url%%://*}
+  rest=${url#*://}
+  hostport=${rest%%/*}
+  HB_BASE=${rest#"$hostport"}
+  HB_HOSTHDR=$hostport
+  HB_HOST=${hostport%:*}
+  if [[ "$hostport" == *:* ]]; then HB_PORT=${hostport##*:}; else HB_PORT=""; fi
+  case "$HB_SCHEME" in
+    http)  HB_PORT=${HB_PORT:-80} ;;
+    https) HB_PORT=${HB_PORT:-443} ;;
+    *) HB_SCHEME="" ;;
+  esac
+  # IPv6 literals and odd URLs: curl only
+  [[ "$HB_HOST" == \[* || ! "$HB_PORT" =~ ^[0-9]+$ ]] && HB_SCHEME=""
+  return 0
+}
 
-payload=$(printf '{"node_id":"%s","ip":"%s","meta":"%s","status":"%s"' \
-  "$(json_escape "$NODE_ID")" \
-  "$(json_escape "$IP")" \
-  "$(json_escape "$META_OUT")" \
-  "$(json_escape "$status")")
-if [[ -n "$GSWARM_EOA" ]]; then
-  payload=$(printf '%s,"gswarm_eoa":"%s"' "$payload" "$(json_escape "$GSWARM_EOA")")
-fi
-if [[ -n "$GSWARM_PEER_IDS" ]]; then
-  payload=$(printf '%s,"gswarm_peer_ids":"%s"' "$payload" "$(json_escape "$GSWARM_PEER_IDS")")
-fi
-if [[ -n "$GSWARM_TGID" ]]; then
-  payload=$(printf '%s,"gswarm_tgid":"%s"' "$payload" "$(json_escape "$GSWARM_TGID")")
-fi
-payload="${payload}}"
+http_close() {
+  # (a bare "exec ... 2>/dev/null" would redirect the whole script's stderr)
+  [[ -n "$HB_OUT" && "$HB_OUT" != "$HB_IN" ]] && { exec {HB_OUT}>&-; } 2>/dev/null
+  [[ -n "$HB_IN" ]] && { exec {HB_IN}<&-; } 2>/dev/null
+  if [[ -n "$HB_PID" ]]; then
+    kill "$HB_PID" 2>/dev/null || true
+    wait "$HB_PID" 2>/dev/null || true
+  fi
+  HB_IN=""; HB_OUT=""; HB_PID=""
+  return 0
+}
+
+http_open() {
+  case "$HB_SCHEME" in
+    http)
+      { exec {HB_IN}<>"/dev/tcp/${HB_HOST}/${HB_PORT}"; } 2>/dev/null || { HB_IN=""; return 1; }
+      HB_OUT=$HB_IN
+      ;;
+    https)
+      have openssl || return 1
+      coproc HB_TLS { exec openssl s_client -quiet -connect "${HB_HOST}:${HB_PORT}" -servername "$HB_HOST" \
+        -verify_return_error -verify_hostname "$HB_HOST" 2>/dev/null; }
+      HB_PID=$HB_TLS_PID
+      # coproc fds are private to bash; duplicate them so they survive the coproc cleanup
+      exec {HB_IN}<&"${HB_TLS[0]}" {HB_OUT}>&"${HB_TLS[1]}"
+      ;;
+    *) return 1 ;;
+  esac
+}
+
+# Read a "Transfer-Encoding: chunked" body from the kept connection into $body.
+# Runs under http_post's LC_ALL=C, so chunk sizes and read -N count bytes.
+http_read_chunked() {
+  local line size part
+  while :; do
+    IFS= read -r -t "$HTTP_TIMEOUT" -u "$HB_IN" line || return 1
+    line=${line%$'\r'}; line=${line%%;*}; line=${line//[[:space:]]/}
+    [[ "$line" =~ ^[0-9a-fA-F]{1,7}$ ]] || return 1
+    size=$(( 16#$line ))
+    if (( size == 0 )); then
+      # optional trailer headers up to the empty line
+      while IFS= read -r -t "$HTTP_TIMEOUT" -u "$HB_IN" line; do
+        [[ -z "${line%$'\r'}" ]] && return 0
+      done
+      return 1
+    fi
+    IFS= read -r -N "$size" -t "$HTTP_TIMEOUT" -u "$HB_IN" part || return 1
+    body+=$part
+    IFS= read -r -t "$HTTP_TIMEOUT" -u "$HB_IN" line || return 1   # CRLF closing the chunk
+    [[ -z "${line%$'\r'}" ]] || return 1
+  done
+}
+
+# POST $2 to path $1 over the kept connection; sets http_status and body.
+# LC_ALL=C for the whole exchange: ${#data}, Content-Length, chunk sizes and read -N
+# all count bytes, not characters. The body is framed by Content-Length or chunked
+# encoding; anything else (read-until-close, other codings) drops the connection and
+# the beat is resent via curl.
+http_post() {
+  local path="$1" data="$2" req line len=-1 chunked=0 close=0 fail=2 LC_ALL=C
+  if [[ -n "$HB_IN" ]] && read -r -t 0 -u "$HB_IN" 2>/dev/null; then
+    # idle socket readable = server closed it (keep-alive timeout): reconnect
+    http_close
+  fi
+  if [[ -z "$HB_IN" ]]; then
+    http_open || return 1
+    fail=1   # nothing back on a fresh connection (TLS refused, ...) counts as a failed connect
+  fi
+  printf -v req 'POST %s HTTP/1.1\r\nHost: %s\r\nAuthorization: Bearer %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\nConnection: keep-alive\r\n\r\n%s' \
+    "${HB_BASE}${path}" "$HB_HOSTHDR" "$SHARED_SECRET" "${#data}" "$data"
+  printf '%s' "$req" >&"$HB_OUT" 2>/dev/null || { http_close; return $fail; }
+  IFS= read -r -t "$HTTP_TIMEOUT" -u "$HB_IN" line || { http_close; return $fail; }
+  [[ "$line" =~ ^HTTP/1\.[01]\ ([0-9]{3}) ]] || { http_close; return $fail; }
+  http_status=${BASH_REMATCH[1]}
+  while :; do
+    IFS= read -r -t "$HTTP_TIMEOUT" -u "$HB_IN" line || { http_close; return 2; }
+    line=${line%$'\r'}
+    [[ -z "$line" ]] && break
+    case "${line,,}" in
+      content-length:*) len=${line#*:}; len=${len//[[:space:]]/} ;;
+      transfer-encoding:*)
+        line=${line#*:}; line=${line//[[:space:]]/}
+        if [[ "${line,,}" == "chunked" ]]; then chunked=1; else { http_close; return 2; }; fi
+        ;;
+      connection:*close*) close=1 ;;
+    esac
+  done
+  [[ "$http_status" == 204 || "$http_status" == 304 ]] && len=0
+  body=""
+  if (( chunked )); then
+    http_read_chunked || { http_close; return 2; }
+  elif [[ "$len" =~ ^[0-9]+$ ]]; then
+    if (( len > 0 )); then
+      IFS= read -r -N "$len" -t "$HTTP_TIMEOUT" -u "$HB_IN" body || { http_close; return 2; }
+    fi
+  else
+    # no framing (body until close): cannot reuse the connection
+    http_close; return 2
+  fi
+  (( close )) && http_close
+  return 0
+}
 
 # --- Send heartbeat ------------------------------------------------------------
+# Sets http_status/body; non-zero on transport error
+send_beat() {
+  local now response
+  http_status=""; body=""
+  if [[ "$DAEMON" == "true" && -n "$HB_SCHEME" ]]; then
+    printf -v now '%(%s)T' -1
+    if (( now >= KA_PAUSED_UNTIL )); then
+      http_post "/api/heartbeat" "$payload" && return 0
+      # 1 = could not connect; 2 = connection broke mid-request (just retry via curl)
+      [[ $? -eq 1 ]] && KA_PAUSED_UNTIL=$(( now + KA_RETRY ))
+    fi
+  fi
+  response=$(curl -sS -X POST "${SERVER_URL%/}/api/heartbeat" \
+    --max-time "$HTTP_TIMEOUT" \
+    -H "Authorization: Bearer ${SHARED_SECRET}" \
+    -H "Content-Type: application/json" \
+    -w 'HTTPSTATUS:%{http_code}' \
+    --data "${payload}") || return 1
+  http_status=${response##*HTTPSTATUS:}
+  body=${response%HTTPSTATUS:*}
+}
+
+# tail_log + IP + payload + send, after check_health.
+# Sets SERVER_NEXT_BEAT (seconds) when the response carries next_beat / retry_after.
+SERVER_NEXT_BEAT=""
+beat() {
+  SERVER_NEXT_BEAT=""
+  tail_log
+  now_ms; t_checks=$NOW_MS
+  IP="$(public_ip_cached)"
+  now_ms; t_ip=$NOW_MS
+  build_payload
+
+  if ! send_beat; then
+    log "WARN: heartbeat send failed (transport error)"
+    return 1
+  fi
+  now_ms; t_send=$NOW_MS
+  timing="scan=$((t_scan - t_start))ms checks=$((t_checks - t_scan))ms ip=$((t_ip - t_checks))ms send=$((t_send - t_ip))ms procs=${#PROC_CMD[@]}"
+  if [[ "$body" =~ \"(next_beat|retry_after)\"[[:space:]]*:[[:space:]]*([0-9]+) ]]; then
+    SERVER_NEXT_BEAT=${BASH_REMATCH[2]}
+  fi
+  if [[ "${http_status}" =~ ^[0-9]+$ ]] && ((http_status >= 200 && http_status < 300)); then
+    [[ "$body" =~ \"overload\"[[:space:]]*:[[:space:]]*true ]] && timing="${timing} overload=1"
+    log "beat node_id=${NODE_ID} status=${status} ip=${IP}${reason:+ reason=${reason}} ${timing}${SERVER_NEXT_BEAT:+ next=${SERVER_NEXT_BEAT}s}"
+    [[ -n "$action_results" ]] && rm -f "${STATE_DIR}/action_results"
+    run_actions "$body"
+  else
+    body_clean=${body//$'\r'/ }
+    body_clean=${body_clean//$'\n'/ }
+    body_clean=${body_clean//$'\t'/ }
+    body_clean=$(printf '%.180s' "$body_clean")
+    log "WARN: heartbeat send failed status=${http_status:-unknown}${body_clean:+ body=${body_clean}}"
+  fi
+  return 0
+}
+
+# One-shot mode: the previous run stored when the server wants the next beat
+# ($STATE_DIR/next_beat, epoch). Sleep until then if it falls inside this timer
+# period; return 1 (skip this run) if it lies beyond it — the server asked to back off.
+schedule_wait() {
+  [[ "$FOLLOW_SCHEDULE" == "true" && -r "${STATE_DIR}/next_beat" ]] || return 0
+  local due now
+  read -r due < "${STATE_DIR}/next_beat" || return 0
+  [[ "$due" =~ ^[0-9]+$ ]] || return 0
+  printf -v now '%(%s)T' -1
+  (( due > now )) || return 0
+  (( due - now < TIMER_INTERVAL )) || return 1
+  sleep "$(( due - now ))"
+}
+
+schedule_save() {
+  local now
+  [[ "$FOLLOW_SCHEDULE" == "true" ]] || return 0
+  if [[ -z "$SERVER_NEXT_BEAT" ]]; then
+    rm -f "${STATE_DIR}/next_beat" 2>/dev/null || true
+    return 0
+  fi
+  printf -v now '%(%s)T' -1
+  if mkdir -p "$STATE_DIR" 2>/dev/null; then
+    printf '%s\n' "$(( now + SERVER_NEXT_BEAT ))" > "${STATE_DIR}/next_beat" 2>/dev/null || true
+  fi
+}
+
+# Resident loop: re-check local state every STATE_POLL seconds, beat every
+# BEAT_INTERVAL(+jitter) seconds (or when the server schedule says), and at once
+# when status/reason changes.
+daemon_loop() {
+  local now next_beat=0 sig last_sig="" wait sleep_fd
+  trap '' PIPE
+  trap 'http_close; log "daemon stopped"; exit 0' TERM INT
+  http_target
+  # sleep without forking: read with a timeout on a pipe nobody writes to
+  exec {sleep_fd}<> <(:)
+  log "daemon started node_id=${NODE_ID} interval=${BEAT_INTERVAL}s jitter=${BEAT_JITTER}s poll=${STATE_POLL}s keepalive=${HB_SCHEME:-off}"
+  while :; do
+    check_health
+    printf -v now '%(%s)T' -1
+    sig="${status}|${reason}"
+    if [[ -n "$last_sig" && "$sig" != "$last_sig" ]]; then
+      log "state change ${last_sig} -> ${sig}: beating now"
+      next_beat=0
+    fi
+    if (( now >= next_beat )); then
+      beat || true
+      last_sig=$sig
+      if [[ "$FOLLOW_SCHEDULE" == "true" && -n "$SERVER_NEXT_BEAT" ]]; then
+        next_beat=$(( now + SERVER_NEXT_BEAT ))
+      else
+        next_beat=$(( now + BEAT_INTERVAL + RANDOM % (BEAT_JITTER + 1) ))
+      fi
+    fi
+    wait=$(( next_beat - now ))
+    (( wait > STATE_POLL )) && wait=$STATE_POLL
+    (( wait < 1 )) && wait=1
+    read -r -t "$wait" -u "$sleep_fd" _ || true
+  done
+}
+
+if [[ "$DAEMON" == "true" ]]; then
+  daemon_loop
+fi
+
 if ! have curl; then
   log "ERROR: curl not found"; exit 1
 fi
-
-if ! response=$(curl -sS -X POST "${SERVER_URL%/}/api/heartbeat" \
-  -H "Authorization: Bearer ${SHARED_SECRET}" \
-  -H "Content-Type: application/json" \
-  -w 'HTTPSTATUS:%{http_code}' \
-  --data "${payload}"); then
-  log "WARN: heartbeat send failed (transport error)"
+if ! schedule_wait; then
+  log "skip: server schedule puts the next beat after this timer period"
   exit 0
 fi
-http_status=${response##*HTTPSTATUS:}
-body=${response%HTTPSTATUS:*}
-if [[ "${http_status}" =~ ^[0-9]+$ ]] && ((http_status >= 200 && http_status < 300)); then
-  log "beat node_id=${NODE_ID} status=${status} ip=${IP}${reason:+ reason=${reason}}"
-else
-  body_clean=${body//$'\r'/ }
-  body_clean=${body_clean//$'\n'/ }
-  body_clean=${body_clean//$'\t'/ }
-  body_clean=$(printf '%.180s' "$body_clean")
-  log "WARN: heartbeat send failed status=${http_status:-unknown}${body_clean:+ body=${body_clean}}"
-fi
+check_health
+beat || true
+schedule_save
@@ -1,7 +1,8 @@
 # Gensyn heartbeat agent (Windows)
-# Run via Task Scheduler every minute (SYSTEM account recommended)
+# Run via Task Scheduler every minute (SYSTEM account recommended),
+# or once at startup with -Daemon / DAEMON=true to stay resident.
 
-Param()
+Param([switch]$Daemon)
 
 # --- Config --------------------------------------------------------------------
 # Set these as Environment Variables or directly edit below:
@@ -15,21 +16,59 @@ $IP_CMD         = $env:IP_CMD         # e.g. https://ifconfig.me
 $GSWARM_EOA     = $env:GSWARM_EOA
 $GSWARM_PEER_IDS= $env:GSWARM_PEER_IDS
 $GSWARM_TGID    = $env:GSWARM_TGID
+$IP_LOOKUP      = $env:IP_LOOKUP      # "false" = send no ip, the server takes it from the connection
+$IP_CACHE_TTL   = $env:IP_CACHE_TTL   # seconds to reuse the cached public IP (default 21600, 0 = always look up)
+$STATE_DIR      = $env:STATE_DIR      # default -> "%ProgramData%\gensyn-agent"
+$DAEMON_MODE    = $env:DAEMON         # "true" = resident loop (same as -Daemon)
+$BEAT_INTERVAL  = $env:BEAT_INTERVAL  # daemon: seconds between regular beats (default 20)
+$BEAT_JITTER    = $env:BEAT_JITTER    # daemon: + random 0..N seconds (default 5)
+$STATE_POLL     = $env:STATE_POLL     # daemon: local re-check period, a change is sent at once (default 5)
+$PROC_RESCAN    = $env:PROC_RESCAN    # daemon: trust cached PIDs at most this long while UP (default 60)
+$FOLLOW_SCHEDULE= $env:FOLLOW_SCHEDULE # "false" = ignore next_beat/retry_after from the server (default true)
+$TIMER_INTERVAL = $env:TIMER_INTERVAL # scheduled-task mode: task period in seconds (default 60)
 
 if ([string]::IsNullOrWhiteSpace($NODE_ID))    { $NODE_ID = "$($env:COMPUTERNAME)-gensyn" }
 if ([string]::IsNullOrWhiteSpace($CHECK_PORT)) { $CHECK_PORT = "true" }
 if ([string]::IsNullOrWhiteSpace($PORT))       { $PORT = 3000 }
 if ([string]::IsNullOrWhiteSpace($IP_CMD))     { $IP_CMD = "https://ifconfig.me" }
+if ([string]::IsNullOrWhiteSpace($IP_LOOKUP))  { $IP_LOOKUP = "true" }
+if ([string]::IsNullOrWhiteSpace($IP_CACHE_TTL)) { $IP_CACHE_TTL = 21600 }
+if ([string]::IsNullOrWhiteSpace($STATE_DIR))  { $STATE_DIR = Join-Path $env:ProgramData "gensyn-agent" }
+if ($Daemon) { $DAEMON_MODE = "true" }
+if ([string]::IsNullOrWhiteSpace($BEAT_INTERVAL)) { $BEAT_INTERVAL = 20 }
+if ([string]::IsNullOrWhiteSpace($BEAT_JITTER))   { $BEAT_JITTER = 5 }
+if ([string]::IsNullOrWhiteSpace($STATE_POLL))    { $STATE_POLL = 5 }
+if ([string]::IsNullOrWhiteSpace($PROC_RESCAN))   { $PROC_RESCAN = 60 }
+if ([string]::IsNullOrWhiteSpace($FOLLOW_SCHEDULE)) { $FOLLOW_SCHEDULE = "true" }
+if ([string]::IsNullOrWhiteSpace($TIMER_INTERVAL))  { $TIMER_INTERVAL = 60 }
+
+# Matching PIDs from the last full WMI scan (daemon mode reuses them between ticks)
+$script:ProcPids = @()
+$script:ProcScannedAt = 0
 
 function Test-ProcOk {
   try {
     $procs = Get-CimInstance Win32_Process | Where-Object {
       $_.CommandLine -match 'run_rl_swarm\.sh|rl-swarm|python.*rl-swarm'
     }
+    $script:ProcPids = @($procs | ForEach-Object { [int]$_.ProcessId })
+    $script:ProcScannedAt = [DateTimeOffset]::UtcNow.ToUnixTimeSeconds()
     return [bool]$procs
   } catch { return $false }
 }
 
+# Win32_Process with command lines is the slow part (hundreds of ms). While the node
+# is UP, every cached PID is still alive and PROC_RESCAN has not expired, the cheap
+# Get-Process check is enough; otherwise do the full scan.
+function Test-ProcOkCached([bool]$wasUp) {
+  $now = [DateTimeOffset]::UtcNow.ToUnixTimeSeconds()
+  if ($wasUp -and $script:ProcPids.Count -and ($now - $script:ProcScannedAt) -lt [int]$PROC_RESCAN) {
+    $alive = @(Get-Process -Id $script:ProcPids -ErrorAction SilentlyContinue)
+    if ($alive.Count -eq $script:ProcPids.Count) { return $true }
+  }
+  return (Test-ProcOk)
+}
+
 function Test-PortOk {
   if ($CHECK_PORT -ne "true") { return $true }
   try {
@@ -47,35 +86,170 @@ function Get-PublicIP {
   } catch { return "" }
 }
 
-# Windows has no "screen", so we rely on process + optional port
-$healthy = (Test-ProcOk) -and (Test-PortOk)
-$status  = if ($healthy) { "UP" } else { "DOWN" }
-$ip      = Get-PublicIP
+# Cheap network identity: addresses and gateways of the interfaces that are up.
+# A change here means the public IP may have changed too, so the cache is dropped early.
+function Get-NetFingerprint {
+  try {
+    $parts = foreach ($nic in [System.Net.NetworkInformation.NetworkInterface]::GetAllNetworkInterfaces()) {
+      if ($nic.OperationalStatus -ne 'Up') { continue }
+      $props = $nic.GetIPProperties()
+      if (-not $props.GatewayAddresses.Count) { continue }
+      $addrs = ($props.UnicastAddresses | Where-Object { $_.Address.AddressFamily -eq 'InterNetwork' } | ForEach-Object { $_.Address.ToString() }) -join ','
+      $gws = ($props.GatewayAddresses | ForEach-Object { $_.Address.ToString() }) -join ','
+      "{0}@{1}@{2}" -f $nic.Id, $addrs, $gws
+    }
+    return (@($parts) | Sort-Object) -join ';'
+  } catch { return "" }
+}
+
+# Public IP with an on-disk cache ($STATE_DIR\public_ip.json). Looks up again only
+# when the TTL expires or the network fingerprint changes; a failed lookup reuses
+# the last known IP.
+function Get-PublicIPCached {
+  if ($IP_LOOKUP -ne "true") { return "" }
+  $cacheFile = Join-Path $STATE_DIR "public_ip.json"
+  $now = [DateTimeOffset]::UtcNow.ToUnixTimeSeconds()
+  $fp = Get-NetFingerprint
+  $cached = $null
+  if (Test-Path $cacheFile) {
+    try { $cached = Get-Content -Raw $cacheFile | ConvertFrom-Json } catch { $cached = $null }
+  }
+  if ($cached -and $cached.ip -and $cached.fp -eq $fp -and [int]$IP_CACHE_TTL -gt 0 -and ($now - [long]$cached.ts) -lt [int]$IP_CACHE_TTL) {
+    return [string]$cached.ip
+  }
+  $fresh = Get-PublicIP
+  if ([string]::IsNullOrWhiteSpace($fresh)) {
+    if ($cached -and $cached.ip) { return [string]$cached.ip }
+    return ""
+  }
+  try {
+    New-Item -ItemType Directory -Force -Path $STATE_DIR | Out-Null
+    $tmp = "$cacheFile.tmp"
+    (@{ ip = $fresh; ts = $now; fp = $fp } | ConvertTo-Json -Compress) | Set-Content -Path $tmp -Encoding UTF8
+    Move-Item -Force -Path $tmp -Destination $cacheFile
+  } catch { }
+  return $fresh
+}
 
-$payload = [ordered]@{
-  node_id = $NODE_ID
-  ip      = $ip
-  meta    = $META
-  status  = $status
+function Build-Payload([string]$status, [string]$ip, [int]$interval) {
+  $payload = [ordered]@{
+    node_id = $NODE_ID
+    ip      = $ip
+    meta    = $META
+    status  = $status
+    beat_interval = $interval
+  }
+  if (-not [string]::IsNullOrWhiteSpace($GSWARM_EOA)) {
+    $payload["gswarm_eoa"] = $GSWARM_EOA.Trim()
+  }
+  if (-not [string]::IsNullOrWhiteSpace($GSWARM_PEER_IDS)) {
+    $payload["gswarm_peer_ids"] = $GSWARM_PEER_IDS.Trim()
+  }
+  if (-not [string]::IsNullOrWhiteSpace($GSWARM_TGID)) {
+    $payload["gswarm_tgid"] = $GSWARM_TGID.Trim()
+  }
+  return ($payload | ConvertTo-Json -Compress)
 }
-if (-not [string]::IsNullOrWhiteSpace($GSWARM_EOA)) {
-  $payload["gswarm_eoa"] = $GSWARM_EOA.Trim()
+
+# Seconds until the next beat as assigned by the server: next_beat on success,
+# retry_after on 429 (the body is {"detail": {"retry_after": N}}). $null if absent.
+function Get-ServerNextBeat([string]$body) {
+  if ($FOLLOW_SCHEDULE -ne "true" -or [string]::IsNullOrWhiteSpace($body)) { return $null }
+  if ($body -match '"(next_beat|retry_after)"\s*:\s*(\d+)') { return [int]$Matches[2] }
+  return $null
 }
-if (-not [string]::IsNullOrWhiteSpace($GSWARM_PEER_IDS)) {
-  $payload["gswarm_peer_ids"] = $GSWARM_PEER_IDS.Trim()
+
+$HEARTBEAT_URL = "{0}/api/heartbeat" -f $SERVER_URL.TrimEnd('/')
+
+if ($DAEMON_MODE -eq "true") {
+  # One HttpClient for the life of the process: connections (and TLS sessions) are
+  # kept alive and reused between beats instead of a new handshake every minute.
+  Add-Type -AssemblyName System.Net.Http
+  $http = New-Object System.Net.Http.HttpClient
+  $http.Timeout = [TimeSpan]::FromSeconds(10)
+  $http.DefaultRequestHeaders.Authorization = New-Object System.Net.Http.Headers.AuthenticationHeaderValue("Bearer", $SHARED_SECRET)
+  $rng = New-Object System.Random
+  $status = "DOWN"
+  $lastStatus = ""
+  $nextBeat = 0
+  Write-Output ("[{0}] daemon started node_id={1} interval={2}s jitter={3}s poll={4}s" -f (Get-Date).ToString("s"), $NODE_ID, $BEAT_INTERVAL, $BEAT_JITTER, $STATE_POLL)
+  while ($true) {
+    $healthy = (Test-ProcOkCached ($status -eq "UP")) -and (Test-PortOk)
+    $status  = if ($healthy) { "UP" } else { "DOWN" }
+    $now = [DateTimeOffset]::UtcNow.ToUnixTimeSeconds()
+    if ($lastStatus -and $status -ne $lastStatus) {
+      Write-Output ("[{0}] state change {1} -> {2}: beating now" -f (Get-Date).ToString("s"), $lastStatus, $status)
+      $nextBeat = 0
+    }
+    if ($now -ge $nextBeat) {
+      $ip = Get-PublicIPCached
+      $content = New-Object System.Net.Http.StringContent((Build-Payload $status $ip ([int]$BEAT_INTERVAL)), [System.Text.Encoding]::UTF8, "application/json")
+      $serverNext = $null
+      try {
+        $resp = $http.PostAsync($HEARTBEAT_URL, $content).GetAwaiter().GetResult()
+        $serverNext = Get-ServerNextBeat ($resp.Content.ReadAsStringAsync().GetAwaiter().GetResult())
+        Write-Output ("[{0}] beat node_id={1} status={2} ip={3} http={4} next={5}" -f (Get-Date).ToString("s"), $NODE_ID, $status, $ip, [int]$resp.StatusCode, $serverNext)
+        $resp.Dispose()
+      } catch {
+        Write-Output ("[{0}] WARN: heartbeat send failed: {1}" -f (Get-Date).ToString("s"), $_.Exception.Message)
+      } finally {
+        $content.Dispose()
+      }
+      $lastStatus = $status
+      if ($null -ne $serverNext) {
+        $nextBeat = $now + $serverNext
+      } else {
+        $nextBeat = $now + [int]$BEAT_INTERVAL + $rng.Next(0, [int]$BEAT_JITTER + 1)
+      }
+    }
+    $wait = [Math]::Max(1, [Math]::Min([int]$STATE_POLL, $nextBeat - $now))
+    Start-Sleep -Seconds $wait
+  }
 }
-if (-not [string]::IsNullOrWhiteSpace($GSWARM_TGID)) {
-  $payload["gswarm_tgid"] = $GSWARM_TGID.Trim()
+
+# Scheduled-task mode: the previous run stored when the server wants the next beat
+# ($STATE_DIR\next_beat). Wait for it if it falls inside this task period, skip the
+# run if it lies beyond it (the server asked to back off).
+$scheduleFile = Join-Path $STATE_DIR "next_beat"
+if ($FOLLOW_SCHEDULE -eq "true" -and (Test-Path $scheduleFile)) {
+  $due = 0L
+  if ([long]::TryParse((Get-Content -Raw $scheduleFile).Trim(), [ref]$due)) {
+    $left = $due - [DateTimeOffset]::UtcNow.ToUnixTimeSeconds()
+    if ($left -ge [int]$TIMER_INTERVAL) {
+      Write-Output ("[{0}] skip: server schedule puts the next beat after this task period" -f (Get-Date).ToString("s"))
+      exit 0
+    }
+    if ($left -gt 0) { Start-Sleep -Seconds $left }
+  }
 }
-$payloadJson = $payload | ConvertTo-Json -Compress
 
+# Windows has no "screen", so we rely on process + optional port
+$healthy = (Test-ProcOk) -and (Test-PortOk)
+$status  = if ($healthy) { "UP" } else { "DOWN" }
+$ip      = Get-PublicIPCached
+$payloadJson = Build-Payload $status $ip ([int]$TIMER_INTERVAL)
+
+$serverNext = $null
 try {
-  Invoke-WebRequest -UseBasicParsing -Method Post -Uri ("{0}/api/heartbeat" -f $SERVER_URL.TrimEnd('/')) `
+  $resp = Invoke-WebRequest -UseBasicParsing -Method Post -Uri $HEARTBEAT_URL `
     -Headers @{ Authorization = "Bearer $SHARED_SECRET"; "Content-Type" = "application/json" } `
-    -Body $payloadJson | Out-Null
+    -Body $payloadJson
+  $serverNext = Get-ServerNextBeat $resp.Content
 } catch {
-  # swallow to avoid Scheduler spam; could log to Event Log if needed
+  # swallow to avoid Scheduler spam; a 429 still tells when to come back
+  try {
+    $retry = $_.Exception.Response.Headers["Retry-After"]
+    if ($FOLLOW_SCHEDULE -eq "true" -and $retry) { $serverNext = [int]$retry }
+  } catch { }
 }
+try {
+  if ($null -ne $serverNext) {
+    New-Item -ItemType Directory -Force -Path $STATE_DIR | Out-Null
+    [string]([DateTimeOffset]::UtcNow.ToUnixTimeSeconds() + $serverNext) | Set-Content -Path $scheduleFile -Encoding ASCII
+  } elseif (Test-Path $scheduleFile) {
+    Remove-Item -Force $scheduleFile
+  }
+} catch { }
 
 # Optional console output when running manually
 Write-Output ("[{0}] beat node_id={1} status={2} ip={3}" -f (Get-Date).ToString("s"), $NODE_ID, $status, $ip)
@@ -1,11 +1,19 @@
 from typing import Optional, List, Dict, Any
-import os, asyncio, time, json, logging
+import os, sys, io, asyncio, time, json, logging, base64, ipaddress, secrets, bisect, hashlib, gzip, heapq
+import threading, traceback, cProfile, pstats, itertools
+from collections import Counter
 from fastapi import FastAPI, Request, HTTPException, Header, Body, Query
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response
 from fastapi.templating import Jinja2Templates
 import aiosqlite, httpx
 from dotenv import load_dotenv
-from integrations.gswarm_checker import run_once
+from integrations.gswarm_checker import run_once, aiter_run, refresh_eoa_peers, note_reported_peers, load_state, save_state
+from integrations.gswarm_offchain import OffchainClient, merge_offchain
+from integrations.gswarm_worker import RefreshWorker
+try:
+    import orjson
+except ImportError:  # orjson опционален: без него кодируем стандартным json
+    orjson = None
 
 # ── Конфиг ─────────────────────────────────────────────────────────────────────
 load_dotenv()
@@ -29,6 +37,7 @@ BOT_TOKEN  = os.getenv("TELEGRAM_BOT_TOKEN", "")
 CHAT_ID    = os.getenv("TELEGRAM_CHAT_ID", "")
 SHARED     = os.getenv("SHARED_SECRET", "")
 THRESHOLD  = _env_int("DOWN_THRESHOLD_SEC", 180)  # сек. до статуса DOWN
+PROGRESS_STALL_SEC = _env_int("PROGRESS_STALL_SEC", 1800)  # сек. без смены round/stage = «застрял» (0 = выкл)
 SITE_TITLE = os.getenv("SITE_TITLE", "Gensyn Nodes")
 
 # Админ-опции
@@ -40,12 +49,50 @@ GSWARM_REFRESH_INTERVAL = _env_int("GSWARM_REFRESH_INTERVAL", 120)
 GSWARM_AUTO_SEND = os.getenv("GSWARM_AUTO_SEND", "0") == "1"
 # If enabled, persist G-Swarm stats node-by-node to show data earlier on the dashboard
 GSWARM_INCREMENTAL = os.getenv("GSWARM_INCREMENTAL", "1") == "1"
+GSWARM_EOA_REFRESH_INTERVAL = _env_int("GSWARM_EOA_REFRESH_INTERVAL", 3600)  # фоновый проход кэша EOA→peers (0 = выкл)
 # Pause between nodes (incremental mode) to avoid 429 from RPC providers
 try:
     GSWARM_NODE_PAUSE_SEC = float(os.getenv("GSWARM_NODE_PAUSE_SEC", "80"))
 except Exception:
     GSWARM_NODE_PAUSE_SEC = 2.0
 GSWARM_NODE_MAP_RAW = os.getenv("GSWARM_NODE_MAP", "").strip()
+# Сколько секунд курсор прерванного цикла годен для продолжения после рестарта.
+# 0 = авто: 2 × (интервал + пауза между нодами) — курсор пишется после каждой ноды,
+# так что в обычной работе ему не больше паузы плюс одного прохода ноды.
+GSWARM_RESUME_MAX_AGE_SEC = _env_int("GSWARM_RESUME_MAX_AGE_SEC", 0)
+# Потоковое сохранение: готовые peers пишутся в БД партиями, не дожидаясь конца прохода
+GSWARM_STREAM_BATCH = _env_int("GSWARM_STREAM_BATCH", 50)          # peers в партии
+GSWARM_STREAM_FLUSH_SEC = _env_int("GSWARM_STREAM_FLUSH_SEC", 5)   # неполная партия сбрасывается не реже
+# RPC-работа чекера — в отдельном процессе, чтобы не делить GIL с API (0 = потоки API-процесса)
+GSWARM_WORKER = os.getenv("GSWARM_WORKER", "1") == "1"
+GSWARM_WORKER_RESTART_SEC = _env_int("GSWARM_WORKER_RESTART_SEC", 5)  # пауза перед перезапуском, дальше ×2
+
+# Действия по восстановлению, которые сервер возвращает агенту в ответе на heartbeat
+REMEDIATION_ENABLED = os.getenv("REMEDIATION_ENABLED", "1") == "1"
+REMEDIATION_GRACE_SEC = _env_int("REMEDIATION_GRACE_SEC", 120)          # DOWN дольше N сек — первое действие
+REMEDIATION_BACKOFF_SEC = _env_int("REMEDIATION_BACKOFF_SEC", 600)      # пауза после 1-го действия, дальше ×2
+REMEDIATION_BACKOFF_MAX_SEC = _env_int("REMEDIATION_BACKOFF_MAX_SEC", 3600)
+
+# Расписание heartbeat: сервер назначает каждой ноде свой слот внутри интервала
+HEARTBEAT_INTERVAL_SEC = _env_int("HEARTBEAT_INTERVAL_SEC", 60)   # интервал агента, если он не прислал свой
+HEARTBEAT_MAX_INFLIGHT = _env_int("HEARTBEAT_MAX_INFLIGHT", 64)   # одновременных upsert, дальше 429 (0 = без лимита)
+HEARTBEAT_RETRY_AFTER = _env_int("HEARTBEAT_RETRY_AFTER", 5)      # базовый Retry-After для 429, сек
+HEARTBEAT_MAX_BYTES = _env_int("HEARTBEAT_MAX_BYTES", 65536)      # больше — 413 (0 = без лимита)
+
+# Прокси, которым доверяем X-Forwarded-For / X-Real-IP (IP или CIDR через запятую)
+TRUSTED_PROXIES_RAW = os.getenv("TRUSTED_PROXIES", "127.0.0.1,::1")
+
+# Диагностика производительности
+LOOP_LAG_WARN_MS = _env_int("LOOP_LAG_WARN_MS", 250)       # логировать блокировки event loop дольше N мс (0 = выкл)
+PROFILE_MAX_SEC = _env_int("PROFILE_MAX_SEC", 120)         # верхний предел /api/admin/profile
+
+# Федерация: regional принимает heartbeats/G-Swarm своих нод и пушит дельты на central
+FEDERATION_ROLE = os.getenv("FEDERATION_ROLE", "").strip().lower()       # "" | regional | central
+FEDERATION_REGION = os.getenv("FEDERATION_REGION", "").strip()           # имя региона (для regional)
+FEDERATION_CENTRAL_URL = os.getenv("FEDERATION_CENTRAL_URL", "").strip().rstrip("/")
+FEDERATION_TOKEN = os.getenv("FEDERATION_TOKEN", "")                     # общий Bearer regional ↔ central
+FEDERATION_PUSH_INTERVAL = _env_int("FEDERATION_PUSH_INTERVAL", 10)
+FEDERATION_BATCH = _env_int("FEDERATION_BATCH", 500)                     # строк в одном пуше
 
 def _dedup(seq: List[str]) -> List[str]:
     seen = set()
@@ -125,6 +172,43 @@ def _load_env_node_map(raw: str) -> Dict[str, Dict[str, Any]]:
 
 ENV_GSWARM_NODE_MAP = _load_env_node_map(GSWARM_NODE_MAP_RAW)
 
+def _parse_networks(raw: str) -> List[Any]:
+    nets: List[Any] = []
+    for item in raw.split(","):
+        item = item.split("#", 1)[0].strip()
+        if not item:
+            continue
+        try:
+            nets.append(ipaddress.ip_network(item, strict=False))
+        except ValueError:
+            logger.warning("Invalid TRUSTED_PROXIES entry: %r", item)
+    return nets
+
+TRUSTED_PROXIES = _parse_networks(TRUSTED_PROXIES_RAW)
+
+def _is_trusted_proxy(host: str) -> bool:
+    try:
+        addr = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(addr in net for net in TRUSTED_PROXIES)
+
+def client_ip(req: Request) -> str:
+    """IP агента по соединению; заголовки прокси учитываются только от доверенных адресов."""
+    peer = req.client.host if req.client else ""
+    if not _is_trusted_proxy(peer):
+        return peer
+    forwarded = req.headers.get("x-forwarded-for") or ""
+    hops = [h.strip() for h in forwarded.split(",") if h.strip()]
+    # справа налево: первый недоверенный адрес — реальный клиент
+    for hop in reversed(hops):
+        if not _is_trusted_proxy(hop):
+            return hop
+    if hops:
+        return hops[0]
+    real_ip = (req.headers.get("x-real-ip") or "").strip()
+    return real_ip or peer
+
 if not (BOT_TOKEN and CHAT_ID and SHARED):
     raise RuntimeError("Set TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID, SHARED_SECRET in .env")
 
@@ -158,24 +242,113 @@ async def init_db():
             "ALTER TABLE nodes ADD COLUMN gswarm_stats TEXT",
             "ALTER TABLE nodes ADD COLUMN gswarm_updated INTEGER",
             "ALTER TABLE nodes ADD COLUMN gswarm_alert INTEGER DEFAULT 1",
+            "ALTER TABLE nodes ADD COLUMN gswarm_wins INTEGER",
+            "ALTER TABLE nodes ADD COLUMN gswarm_rewards INTEGER",
+            "ALTER TABLE nodes ADD COLUMN gswarm_checked INTEGER",
+            "ALTER TABLE nodes ADD COLUMN gswarm_digest TEXT",
+            "ALTER TABLE nodes ADD COLUMN progress_round INTEGER",
+            "ALTER TABLE nodes ADD COLUMN progress_stage INTEGER",
+            "ALTER TABLE nodes ADD COLUMN progress_changed INTEGER",
+            "ALTER TABLE nodes ADD COLUMN progress_errors INTEGER",
+            "ALTER TABLE nodes ADD COLUMN progress_last_error TEXT",
+            "ALTER TABLE nodes ADD COLUMN progress_reported INTEGER",
+            "ALTER TABLE nodes ADD COLUMN progress_stall_alerted INTEGER DEFAULT 0",
+            "ALTER TABLE nodes ADD COLUMN row_version INTEGER",
+            "ALTER TABLE nodes ADD COLUMN region TEXT",
         ):
             try:
                 await db.execute(ddl)
             except Exception:
                 pass
+        # индексы под сортировки/keyset-пагинацию /api/nodes (выражения = NODE_SORT_KEYS)
+        for ddl in (
+            "CREATE INDEX IF NOT EXISTS idx_nodes_last_seen ON nodes(last_seen, node_id)",
+            "CREATE INDEX IF NOT EXISTS idx_nodes_wins ON nodes(COALESCE(gswarm_wins, -1), node_id)",
+            "CREATE INDEX IF NOT EXISTS idx_nodes_rewards ON nodes(COALESCE(gswarm_rewards, -1), node_id)",
+            "CREATE INDEX IF NOT EXISTS idx_nodes_row_version ON nodes(row_version)",
+        ):
+            await db.execute(ddl)
+        await _init_row_versions(db)
+        # бэкфилл тоталов из уже сохранённых gswarm_stats
+        try:
+            await db.execute("""
+                UPDATE nodes
+                SET gswarm_wins = CAST(json_extract(gswarm_stats, '$.totals.wins') AS INTEGER),
+                    gswarm_rewards = CAST(json_extract(gswarm_stats, '$.totals.rewards') AS INTEGER)
+                WHERE gswarm_stats IS NOT NULL AND gswarm_wins IS NULL
+            """)
+        except Exception as exc:
+            logger.warning("gswarm totals backfill skipped: %s", exc)
         await db.commit()
 
+OFFCHAIN = OffchainClient()
+# воркер нужен только работающему refresh; при GSWARM_REFRESH_INTERVAL=0 ручной
+# /api/gswarm/check и проход EOA→peers идут в потоках API-процесса
+REFRESH_WORKER = RefreshWorker(GSWARM_WORKER_RESTART_SEC) if GSWARM_WORKER and GSWARM_REFRESH_INTERVAL > 0 else None
+
+async def _gswarm_call(fn, *args, **kwargs):
+    """Функция чекера — в процессе-воркере, если он включён, иначе в пуле потоков."""
+    if REFRESH_WORKER is not None:
+        return await REFRESH_WORKER.call(fn.__name__, *args, **kwargs)
+    return await asyncio.to_thread(fn, *args, **kwargs)
+
+def _gswarm_stream(**kwargs):
+    """Потоковый проход чекера (события iter_run) — из воркера или из потока API-процесса."""
+    if REFRESH_WORKER is not None:
+        return REFRESH_WORKER.aiter_run(**kwargs)
+    return aiter_run(**kwargs)
+
+async def _with_offchain(result: Dict[str, Any], peer_groups: Dict[str | None, List[str]]) -> Dict[str, Any]:
+    """Дополнить результат run_once off-chain статистикой (по запросу на tgid-группу)."""
+    if not OFFCHAIN.enabled or not peer_groups:
+        return result
+    try:
+        offchain = await OFFCHAIN.fetch_groups(peer_groups)
+    except Exception as exc:
+        logger.warning("[GSWARM] off-chain fetch failed: %s", exc)
+        return result
+    return merge_offchain(result, offchain)
+
+@app.on_event("shutdown")
+async def shutdown():
+    await OFFCHAIN.aclose()
+    if REFRESH_WORKER is not None:
+        await REFRESH_WORKER.close()
+    if _FED_HTTP is not None:
+        await _FED_HTTP.aclose()
+
 @app.on_event("startup")
 async def startup():
     await init_db()
+    if LOOP_LAG_WARN_MS > 0:
+        LOOP_LAG.start(asyncio.get_running_loop())
+    await load_rank_index()
+    await load_fleet_summary()
     asyncio.create_task(watchdog_loop())
+    if REFRESH_WORKER is not None:
+        REFRESH_WORKER.start()
     if GSWARM_REFRESH_INTERVAL > 0:
-        asyncio.create_task(gswarm_loop())
+        try:
+            cursor = await _gswarm_call(load_state)
+        except Exception as exc:
+            logger.warning("[GSWARM] warm-start state unavailable: %s", exc)
+            cursor = None
+        asyncio.create_task(gswarm_loop(cursor))
+    if GSWARM_EOA_REFRESH_INTERVAL > 0:
+        asyncio.create_task(eoa_peers_loop())
+    if FEDERATION_ROLE == "regional":
+        if FEDERATION_CENTRAL_URL and FEDERATION_REGION:
+            asyncio.create_task(federation_push_loop())
+        else:
+            logger.error("[FED] regional mode needs FEDERATION_CENTRAL_URL and FEDERATION_REGION")
 
-def fresh_since(last_seen: int) -> bool:
-    return (int(time.time()) - int(last_seen)) <= THRESHOLD
+def fresh_since(last_seen: int, now: Optional[int] = None) -> bool:
+    now = int(time.time()) if now is None else now
+    return (now - int(last_seen)) <= THRESHOLD
 
 async def send_tg(text: str):
+    if FEDERATION_ROLE == "regional":
+        return  # уведомления шлёт central по пришедшим дельтам
     async with httpx.AsyncClient(timeout=10) as c:
         await c.post(
             f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage",
@@ -189,123 +362,582 @@ async def upsert(
     reported: str,
     gswarm_eoa: Optional[str],
     gswarm_peer_ids: Optional[List[str]],
-    gswarm_tgid: Optional[str]
+    gswarm_tgid: Optional[str],
+    progress: Optional[Dict[str, Any]] = None,
+    gswarm_unchanged: bool = False,
 ):
+    """gswarm_unchanged — G-Swarm поля те же, что в прошлом heartbeat: пишем только ip/last_seen/meta/status."""
     now = int(time.time())
-    gswarm_eoa = (gswarm_eoa or "").strip() or None
-    gswarm_tgid = (gswarm_tgid or "").strip() or None
-    peers_blob = peers_to_store(gswarm_peer_ids)
 
     async with aiosqlite.connect(DB) as db:
-        await db.execute("""
-            INSERT INTO nodes(
-                node_id, ip, last_seen, last_state, last_computed, meta,
-                last_reported, gswarm_eoa, gswarm_tgid, gswarm_peer_ids
+        written = False
+        if gswarm_unchanged:
+            cur = await db.execute(
+                "UPDATE nodes SET ip=?, last_seen=?, meta=?, last_reported=? WHERE node_id=?",
+                (ip, now, meta, reported, node_id),
             )
-            VALUES(?, ?, ?, 'DOWN','UP', ?, ?, ?, ?, ?)
-            ON CONFLICT(node_id) DO UPDATE SET
-              ip             = excluded.ip,
-              last_seen      = excluded.last_seen,
-              meta           = excluded.meta,
-              last_reported  = excluded.last_reported,
-              -- не перетираем, если агент прислал NULL/пусто
-              gswarm_eoa = CASE
-                              WHEN excluded.gswarm_eoa IS NULL OR excluded.gswarm_eoa = '' THEN NULL
-                              ELSE excluded.gswarm_eoa
-                            END,
-              gswarm_tgid = CASE
-                               WHEN excluded.gswarm_tgid IS NULL OR excluded.gswarm_tgid = '' THEN NULL
-                               ELSE excluded.gswarm_tgid
-                             END,
-              gswarm_peer_ids = CASE
-                                   WHEN excluded.gswarm_peer_ids IS NULL OR excluded.gswarm_peer_ids = '' THEN NULL
-                                   ELSE excluded.gswarm_peer_ids
-                                 END
-        """, (node_id, ip, now, meta, reported, gswarm_eoa, gswarm_tgid, peers_blob))
+            written = cur.rowcount > 0   # 0 — узел удалён, нужен полный INSERT
+        if not written:
+            gswarm_eoa = (gswarm_eoa or "").strip() or None
+            gswarm_tgid = (gswarm_tgid or "").strip() or None
+            peers_blob = peers_to_store(gswarm_peer_ids)
+            await db.execute("""
+                INSERT INTO nodes(
+                    node_id, ip, last_seen, last_state, last_computed, meta,
+                    last_reported, gswarm_eoa, gswarm_tgid, gswarm_peer_ids
+                )
+                VALUES(?, ?, ?, 'DOWN','UP', ?, ?, ?, ?, ?)
+                ON CONFLICT(node_id) DO UPDATE SET
+                  ip             = excluded.ip,
+                  last_seen      = excluded.last_seen,
+                  meta           = excluded.meta,
+                  last_reported  = excluded.last_reported,
+                  -- не перетираем, если агент прислал NULL/пусто
+                  gswarm_eoa = CASE
+                                  WHEN excluded.gswarm_eoa IS NULL OR excluded.gswarm_eoa = '' THEN NULL
+                                  ELSE excluded.gswarm_eoa
+                                END,
+                  gswarm_tgid = CASE
+                                   WHEN excluded.gswarm_tgid IS NULL OR excluded.gswarm_tgid = '' THEN NULL
+                                   ELSE excluded.gswarm_tgid
+                                 END,
+                  gswarm_peer_ids = CASE
+                                       WHEN excluded.gswarm_peer_ids IS NULL OR excluded.gswarm_peer_ids = '' THEN NULL
+                                       ELSE excluded.gswarm_peer_ids
+                                     END
+            """, (node_id, ip, now, meta, reported, gswarm_eoa, gswarm_tgid, peers_blob))
+        if progress is not None:
+            # progress_changed двигается только при смене round/stage — по нему ловим «застрявшие» ноды
+            await db.execute("""
+                UPDATE nodes
+                SET progress_changed = CASE
+                        WHEN progress_changed IS NULL OR progress_round IS NOT ? OR progress_stage IS NOT ? THEN ?
+                        ELSE progress_changed
+                    END,
+                    progress_stall_alerted = CASE
+                        WHEN progress_round IS NOT ? OR progress_stage IS NOT ? THEN 0
+                        ELSE progress_stall_alerted
+                    END,
+                    progress_round = ?,
+                    progress_stage = ?,
+                    progress_errors = ?,
+                    progress_last_error = ?,
+                    progress_reported = ?
+                WHERE node_id = ?
+            """, (
+                progress["round"], progress["stage"], now,
+                progress["round"], progress["stage"],
+                progress["round"], progress["stage"], progress["errors"], progress["last_error"], now,
+                node_id,
+            ))
         await db.commit()
+    FLEET.observe(node_id, meta, reported, now)
+    visible = (
+        ip, meta, reported,
+        (gswarm_eoa or "").strip() or None, (gswarm_tgid or "").strip() or None, tuple(gswarm_peer_ids or ()),
+        None if progress is None else (progress["round"], progress["stage"], progress["errors"], progress["last_error"]),
+    )
+    if heartbeat_visible_changed(node_id, visible, now):
+        bump_nodes_version()
+
+def parse_progress(value: Any) -> Optional[Dict[str, Any]]:
+    """Блок progress из heartbeat: round/stage/errors/last_error (см. tail_log в агенте)."""
+    if not isinstance(value, dict):
+        return None
+
+    def _int(v: Any) -> Optional[int]:
+        try:
+            return int(v) if v is not None and str(v).strip() != "" else None
+        except (TypeError, ValueError):
+            return None
+
+    last_error = value.get("last_error")
+    last_error = str(last_error).strip()[:300] if last_error else None
+    return {
+        "round": _int(value.get("round")),
+        "stage": _int(value.get("stage")),
+        "errors": _int(value.get("errors")) or 0,
+        "last_error": last_error or None,
+    }
+
+SUMMARY_MAX_TAGS = 16   # тегов meta на узел, остальные в сводку не попадают
 
+def parse_meta_tags(meta: Optional[str]) -> tuple[tuple[str, ...], Optional[str]]:
+    """meta агента ("hetzner-fsn1,ram=16g,reason=stale_log") → (теги, reason).
+
+    Теги — элементы через запятую как есть ("hetzner-fsn1", "ram=16g"); reason=… тегом
+    не считается, он идёт в счётчики причин DOWN.
+    """
+    tags: List[str] = []
+    reason = None
+    for part in (meta or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        key, sep, value = part.partition("=")
+        if sep and key.strip() == "reason":
+            reason = value.strip() or reason
+            continue
+        if part not in tags and len(tags) < SUMMARY_MAX_TAGS:
+            tags.append(part[:64])
+    return tuple(tags), reason
 
-async def list_nodes():
+
+def _remediation_view(node_id: str) -> Optional[Dict[str, Any]]:
+    state = _REMEDIATION.get(node_id)
+    if not state or not (state.get("last_actions") or state.get("last_result")):
+        return None
+    return {
+        "attempts": state.get("attempts", 0),
+        "next_at": state.get("next_at") or None,
+        "last_actions": state.get("last_actions"),
+        "last_result": state.get("last_result"),
+    }
+
+def _gswarm_summary(stats: Dict[str, Any] | None) -> Dict[str, Any] | None:
+    """Облегчённые stats для списка нод: без per_peer/missing_peers (они — в /api/nodes/{id}/gswarm)."""
+    if not isinstance(stats, dict):
+        return None
+    return {
+        "totals": stats.get("totals"),
+        "last_check": stats.get("last_check"),
+        "rank": stats.get("rank"),
+        "missing_count": len(stats.get("missing_peers") or []),
+    }
+
+def _node_from_row(r: aiosqlite.Row, now: int, full: bool = False) -> Dict[str, Any]:
+    is_fresh = fresh_since(r["last_seen"], now)
+    reported = (r["last_reported"] or "DOWN").upper() if "last_reported" in r.keys() else "UP"
+    computed = "UP" if (is_fresh and reported == "UP") else "DOWN"
+
+    # peers из БД
+    peer_ids = parse_peer_ids(r["gswarm_peer_ids"] if "gswarm_peer_ids" in r.keys() else None)
+
+    # безопасный парсинг stats
+    gswarm_stats = None
+    raw_stats = r["gswarm_stats"] if "gswarm_stats" in r.keys() else None
+    if raw_stats:
+        try:
+            gswarm_stats = json.loads(raw_stats)
+        except Exception:
+            logger.warning("Bad gswarm_stats JSON for %s", r["node_id"])
+            gswarm_stats = None
+    if isinstance(gswarm_stats, dict):
+        _annotate_ranks(gswarm_stats)
+
+    # env-оверрайды
+    env_cfg = ENV_GSWARM_NODE_MAP.get(r["node_id"])
+    env_eoa = env_cfg.get("eoa") if env_cfg else None
+    env_peers = env_cfg.get("peer_ids") if env_cfg else []
+    env_tgid = env_cfg.get("tgid") if env_cfg else None
+    alert_raw = 1
+    if "gswarm_alert" in r.keys():
+        try:
+            alert_raw = int(r["gswarm_alert"])
+        except Exception:
+            alert_raw = 1
+    alert_enabled = bool(alert_raw if alert_raw is not None else 1)
+
+    # итоговые значения для UI
+    stats_eoa = gswarm_stats.get("eoa") if isinstance(gswarm_stats, dict) else None
+    eoa_value = r["gswarm_eoa"] or env_eoa or stats_eoa
+    peers_value = peer_ids or env_peers
+    db_tgid = None
+    if "gswarm_tgid" in r.keys():
+        raw_tgid = r["gswarm_tgid"]
+        if isinstance(raw_tgid, str):
+            db_tgid = raw_tgid.strip() or None
+        elif raw_tgid is not None:
+            db_tgid = str(raw_tgid).strip() or None
+    tgid_value = db_tgid or env_tgid
+
+    progress_block = None
+    if "progress_reported" in r.keys() and r["progress_reported"] is not None:
+        changed = r["progress_changed"]
+        stalled = bool(
+            PROGRESS_STALL_SEC > 0
+            and changed is not None
+            and (r["progress_round"] is not None or r["progress_stage"] is not None)
+            and now - int(changed) > PROGRESS_STALL_SEC
+        )
+        progress_block = {
+            "round": r["progress_round"],
+            "stage": r["progress_stage"],
+            "changed": changed,
+            "errors": r["progress_errors"] or 0,
+            "last_error": r["progress_last_error"],
+            "reported": r["progress_reported"],
+            "stalled": stalled,
+            "stall_alerted": bool(r["progress_stall_alerted"]),
+        }
+
+    updated_val = r["gswarm_updated"] if "gswarm_updated" in r.keys() else None
+    checked_val = r["gswarm_checked"] if "gswarm_checked" in r.keys() else None
+    gswarm_block = None
+    if eoa_value or peers_value or gswarm_stats or tgid_value or alert_enabled:
+        gswarm_block = {
+            "eoa": eoa_value,
+            "peers_count": len(peers_value) if peers_value else int(((gswarm_stats or {}).get("totals") or {}).get("peers") or 0),
+            "stats": gswarm_stats if full else _gswarm_summary(gswarm_stats),
+            "updated": updated_val,
+            "checked": checked_val,
+            "tgid": tgid_value,
+            "alert": alert_enabled
+        }
+        if full:
+            gswarm_block["peer_ids"] = peers_value
+
+    return {
+        "node_id": r["node_id"],
+        "ip": r["ip"],
+        "last_seen": r["last_seen"],
+        "computed": computed,
+        "last_state": r["last_state"],
+        "meta": r["meta"],
+        "age_sec": max(0, now - int(r["last_seen"])),
+        "reported": reported,
+        "gswarm": gswarm_block,
+        "gswarm_alert": alert_enabled,
+        "progress": progress_block,
+        "remediation": _remediation_view(r["node_id"]),
+        "region": r["region"] if "region" in r.keys() else None,
+    }
+
+async def list_nodes(full: bool = False):
     async with aiosqlite.connect(DB) as db:
         db.row_factory = aiosqlite.Row
         rows = await db.execute_fetchall("SELECT * FROM nodes ORDER BY node_id")
         now = int(time.time())
-        out = []
-        for r in rows:
-            is_fresh = fresh_since(r["last_seen"])
-            reported = (r["last_reported"] or "DOWN").upper() if "last_reported" in r.keys() else "UP"
-            computed = "UP" if (is_fresh and reported == "UP") else "DOWN"
+        return [_node_from_row(r, now, full) for r in rows]
 
-            # peers из БД
-            peer_ids = parse_peer_ids(r["gswarm_peer_ids"] if "gswarm_peer_ids" in r.keys() else None)
+async def node_gswarm_detail(node_id: str) -> Optional[Dict[str, Any]]:
+    async with aiosqlite.connect(DB) as db:
+        db.row_factory = aiosqlite.Row
+        cur = await db.execute("SELECT * FROM nodes WHERE node_id=?", (node_id,))
+        row = await cur.fetchone()
+    if row is None:
+        return None
+    return {"node_id": node_id, "gswarm": _node_from_row(row, int(time.time()), full=True)["gswarm"]}
+
+# computed=UP <=> свежий heartbeat и агент сам сообщил UP (см. _node_from_row); ? = now - THRESHOLD
+_STATUS_UP_SQL = "(last_seen >= ? AND UPPER(COALESCE(last_reported, 'DOWN')) = 'UP')"
+
+# Ключи сортировки для /api/nodes: SQL-выражения совпадают с индексами из init_db()
+# (age = now - last_seen, поэтому сортируется по last_seen в обратную сторону)
+NODE_SORT_KEYS: Dict[str, str] = {
+    "node_id": "node_id",
+    "age": "last_seen",
+    "wins": "COALESCE(gswarm_wins, -1)",
+    "rewards": "COALESCE(gswarm_rewards, -1)",
+    "status": f"CASE WHEN {_STATUS_UP_SQL} THEN 1 ELSE 0 END",
+}
+NODE_SORT_REVERSED = {"age"}
+NODE_SORT_DEFAULT_ORDER = {"node_id": "asc", "age": "asc", "wins": "desc", "rewards": "desc", "status": "asc"}
+NODES_PAGE_MAX = 500
+
+def _encode_cursor(key: Any, node_id: str, now: int) -> str:
+    raw = json.dumps([key, node_id, now], ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def _decode_cursor(cursor: str) -> tuple[Any, str, Optional[int]]:
+    """(ключ, node_id, now первой страницы) — статус считается от того же момента на всех страницах.
+
+    Курсор старого формата [ключ, node_id] без момента тоже принимается (now = None).
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key, node_id, *rest = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise HTTPException(400, "Invalid cursor")
+    now = rest[0] if rest else None
+    if not isinstance(node_id, str) or len(rest) > 1 or not (now is None or isinstance(now, int)):
+        raise HTTPException(400, "Invalid cursor")
+    return key, node_id, now
+
+async def query_nodes(
+    limit: int,
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    q: Optional[str] = None,
+    sort: Optional[str] = None,
+    order: Optional[str] = None,
+    full: bool = False,
+) -> Dict[str, Any]:
+    """Страница узлов с keyset-пагинацией (cursor = последний ключ сортировки + node_id).
+
+    Статус (фильтр, sort=status и computed в items) зависит от времени, поэтому курсор несёт
+    now первой страницы: нода, пересёкшая THRESHOLD между запросами, не пропадёт и не
+    повторится, а computed/age_sec всех страниц посчитаны от того же момента.
+    """
+    sort = sort or "node_id"
+    if sort not in NODE_SORT_KEYS:
+        raise HTTPException(400, f"sort must be one of: {', '.join(NODE_SORT_KEYS)}")
+    order = (order or NODE_SORT_DEFAULT_ORDER[sort]).lower()
+    if order not in ("asc", "desc"):
+        raise HTTPException(400, "order must be asc or desc")
+    limit = max(1, min(int(limit), NODES_PAGE_MAX))
+    cur_key = cur_id = None
+    snap = int(time.time())
+    if cursor:
+        cur_key, cur_id, cur_now = _decode_cursor(cursor)
+        if cur_now is not None:
+            snap = cur_now
+    status_params: List[Any] = [snap - THRESHOLD]
+    where: List[str] = []
+    params: List[Any] = []
+    if status:
+        status_norm = status.strip().upper()
+        if status_norm not in ("UP", "DOWN"):
+            raise HTTPException(400, "status must be UP or DOWN")
+        where.append(_STATUS_UP_SQL if status_norm == "UP" else f"NOT {_STATUS_UP_SQL}")
+        params.extend(status_params)
+    if q and q.strip():
+        like = "%" + q.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        where.append("(node_id LIKE ? ESCAPE '\\' OR ip LIKE ? ESCAPE '\\' OR meta LIKE ? ESCAPE '\\')")
+        params.extend([like, like, like])
+
+    key_expr = NODE_SORT_KEYS[sort]
+    select_params: List[Any] = list(status_params) if "?" in key_expr else []
+
+    where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+    page_where = list(where)
+    page_params = list(params)
+    sql_asc = (order == "asc") != (sort in NODE_SORT_REVERSED)
+    if cursor:
+        cmp = ">" if sql_asc else "<"
+        page_where.append(f"({key_expr}, node_id) {cmp} (?, ?)")
+        page_params.extend(select_params + [cur_key, cur_id])
+    page_where_sql = f"WHERE {' AND '.join(page_where)}" if page_where else ""
+    direction = "ASC" if sql_asc else "DESC"
 
-            # безопасный парсинг stats
-            gswarm_stats = None
-            raw_stats = r["gswarm_stats"] if "gswarm_stats" in r.keys() else None
-            if raw_stats:
-                try:
-                    gswarm_stats = json.loads(raw_stats)
-                except Exception:
-                    logger.warning("Bad gswarm_stats JSON for %s", r["node_id"])
-                    gswarm_stats = None
-
-            # env-оверрайды
-            env_cfg = ENV_GSWARM_NODE_MAP.get(r["node_id"])
-            env_eoa = env_cfg.get("eoa") if env_cfg else None
-            env_peers = env_cfg.get("peer_ids") if env_cfg else []
-            env_tgid = env_cfg.get("tgid") if env_cfg else None
-            alert_raw = 1
-            if "gswarm_alert" in r.keys():
-                try:
-                    alert_raw = int(r["gswarm_alert"])
-                except Exception:
-                    alert_raw = 1
-            alert_enabled = bool(alert_raw if alert_raw is not None else 1)
-
-            # итоговые значения для UI
-            stats_eoa = gswarm_stats.get("eoa") if isinstance(gswarm_stats, dict) else None
-            eoa_value = r["gswarm_eoa"] or env_eoa or stats_eoa
-            peers_value = peer_ids or env_peers
-            db_tgid = None
-            if "gswarm_tgid" in r.keys():
-                raw_tgid = r["gswarm_tgid"]
-                if isinstance(raw_tgid, str):
-                    db_tgid = raw_tgid.strip() or None
-                elif raw_tgid is not None:
-                    db_tgid = str(raw_tgid).strip() or None
-            tgid_value = db_tgid or env_tgid
-
-            updated_val = r["gswarm_updated"] if "gswarm_updated" in r.keys() else None
-            gswarm_block = None
-            if eoa_value or peers_value or gswarm_stats or tgid_value or alert_enabled:
-                gswarm_block = {
-                    "eoa": eoa_value,
-                    "peer_ids": peers_value,
-                    "stats": gswarm_stats,
-                    "updated": updated_val,
-                    "tgid": tgid_value,
-                    "alert": alert_enabled
-                }
+    async with aiosqlite.connect(DB) as db:
+        db.row_factory = aiosqlite.Row
+        cur = await db.execute(f"SELECT COUNT(*) FROM nodes {where_sql}", params)
+        (total,) = await cur.fetchone()
+        rows = await db.execute_fetchall(
+            f"""
+            SELECT *, {key_expr} AS sort_key
+            FROM nodes
+            {page_where_sql}
+            ORDER BY {key_expr} {direction}, node_id {direction}
+            LIMIT ?
+            """,
+            select_params + page_params + select_params + [limit + 1],
+        )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = _encode_cursor(rows[-1]["sort_key"], rows[-1]["node_id"], snap) if (has_more and rows) else None
+    return {
+        # computed/age_sec — от того же момента, что фильтр и сортировка по статусу
+        "items": [_node_from_row(r, snap, full) for r in rows],
+        "total": int(total),
+        "limit": limit,
+        "next_cursor": next_cursor,
+        "sort": sort,
+        "order": order,
+    }
 
-            out.append({
-                "node_id": r["node_id"],
-                "ip": r["ip"],
-                "last_seen": r["last_seen"],
-                "computed": computed,
-                "last_state": r["last_state"],
-                "meta": r["meta"],
-                "age_sec": max(0, now - int(r["last_seen"])),
-                "reported": reported,
-                "gswarm": gswarm_block,
-                "gswarm_alert": alert_enabled
-            })
-        return out
+# ── Кэш готовых ответов /api/nodes ───────────────────────────────────────────
+# Ответ хранится уже закодированным в bytes. Ключ: (версия состояния узлов,
+# окно времени NODES_CACHE_TTL_SEC, параметры запроса). age_sec/computed зависят от
+# времени, поэтому ответ живёт не дольше окна: age_sec отстаёт не больше чем на
+# NODES_CACHE_TTL_SEC, переход UP → DOWN по возрасту виден в следующем окне.
+# Версия сбрасывает кэш только при видимых изменениях: обычный heartbeat, который
+# лишь двигает last_seen у свежей ноды, кэш не трогает (см. heartbeat_visible_changed).
+NODES_CACHE_MAX_ENTRIES = 64
+NODES_CACHE_TTL_SEC = max(1, _env_int("NODES_CACHE_TTL_SEC", 5))
+_NODES_VERSION = 0
+_NODES_CACHE: Dict[tuple, bytes] = {}
+_NODES_INFLIGHT: Dict[tuple, "asyncio.Task[bytes]"] = {}
+_HB_VISIBLE: Dict[str, tuple] = {}  # node_id -> (видимые поля последнего heartbeat, last_seen)
+
+def _dumps_bytes(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def bump_nodes_version() -> int:
+    """Отметить изменение состояния узлов — закэшированные ответы устаревают."""
+    global _NODES_VERSION
+    _NODES_VERSION += 1
+    _NODES_CACHE.clear()
+    return _NODES_VERSION
+
+def heartbeat_visible_changed(node_id: str, visible: tuple, now: int) -> bool:
+    """Меняет ли heartbeat что-то в /api/nodes, кроме age_sec свежей ноды.
+
+    True для новой (или неизвестной после рестарта) ноды, при смене видимых полей и
+    когда прошлый heartbeat уже устарел — тогда computed переходит DOWN → UP.
+    """
+    prev = _HB_VISIBLE.get(node_id)
+    _HB_VISIBLE[node_id] = (visible, now)
+    return prev is None or prev[0] != visible or now - prev[1] > THRESHOLD
+
+async def cached_nodes_body(params: tuple, build) -> bytes:
+    """Вернуть закодированный ответ; одновременные запросы ждут одну сборку."""
+    key = (_NODES_VERSION, int(time.time()) // NODES_CACHE_TTL_SEC, params)
+    body = _NODES_CACHE.get(key)
+    if body is not None:
+        return body
+    task = _NODES_INFLIGHT.get(key)
+    if task is None:
+        async def _build() -> bytes:
+            try:
+                encoded = _dumps_bytes(await build())
+                if key[0] == _NODES_VERSION:
+                    stale = [k for k in _NODES_CACHE if k[:2] != key[:2]]
+                    for k in stale:
+                        del _NODES_CACHE[k]
+                    if len(_NODES_CACHE) < NODES_CACHE_MAX_ENTRIES:
+                        _NODES_CACHE[key] = encoded
+                return encoded
+            finally:
+                _NODES_INFLIGHT.pop(key, None)
+        task = asyncio.ensure_future(_build())
+        _NODES_INFLIGHT[key] = task
+    return await asyncio.shield(task)
+
+# ── Сводка по флоту (/api/summary) ──────────────────────────────────────────
+class FleetSummary:
+    """Счётчики узлов по статусу, тегам meta и причинам DOWN, ведомые дельтами.
+
+    На каждый узел хранится, как он учтён в счётчиках; heartbeat, пуш федерации и
+    админ-правки пересчитывают вклад одного узла. UP → DOWN по возрасту heartbeat
+    ловится min-heap'ом сроков свежести (last_seen + THRESHOLD), который разбирается
+    при чтении — сводка отдаётся за O(число групп), а не O(число узлов).
+    """
+
+    def __init__(self) -> None:
+        # node_id -> (tags, reported, reason, last_seen, status, down_reason)
+        self._nodes: Dict[str, tuple] = {}
+        self._status: Dict[str, int] = {"UP": 0, "DOWN": 0}
+        self._tags: Dict[str, Dict[str, int]] = {}
+        self._reasons: Dict[str, int] = {}
+        self._expiry: List[tuple[int, str]] = []
+        self._queued: Dict[str, int] = {}   # node_id -> срок его действующей записи в _expiry
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    @staticmethod
+    def _classify(reported: str, reason: Optional[str], last_seen: int, now: int) -> tuple[str, Optional[str]]:
+        # то же правило, что computed в _node_from_row
+        if now - last_seen <= THRESHOLD and reported == "UP":
+            return "UP", None
+        if reported == "DOWN":
+            return "DOWN", reason or "unspecified"
+        return "DOWN", "no_heartbeat"
+
+    def _count(self, tags: tuple, status: str, down_reason: Optional[str], delta: int) -> None:
+        self._status[status] += delta
+        for tag in tags:
+            bucket = self._tags.setdefault(tag, {"UP": 0, "DOWN": 0})
+            bucket[status] += delta
+            if not (bucket["UP"] or bucket["DOWN"]):
+                del self._tags[tag]
+        if down_reason is not None:
+            left = self._reasons.get(down_reason, 0) + delta
+            if left:
+                self._reasons[down_reason] = left
+            else:
+                self._reasons.pop(down_reason, None)
+
+    def _put(self, node_id: str, tags: tuple, reported: str, reason: Optional[str], last_seen: int, now: int) -> None:
+        status, down_reason = self._classify(reported, reason, last_seen, now)
+        self._nodes[node_id] = (tags, reported, reason, last_seen, status, down_reason)
+        self._count(tags, status, down_reason, 1)
+        if status == "UP":
+            deadline = last_seen + THRESHOLD
+            queued = self._queued.get(node_id)
+            # более поздний срок подхватится при разборе старой записи
+            if queued is None or deadline < queued:
+                heapq.heappush(self._expiry, (deadline, node_id))
+                self._queued[node_id] = deadline
+
+    def drop(self, node_id: str) -> Optional[tuple]:
+        # запись в _expiry не трогаем: при разборе она просто отбрасывается
+        old = self._nodes.pop(node_id, None)
+        if old is not None:
+            self._count(old[0], old[4], old[5], -1)
+        return old
+
+    def observe(self, node_id: str, meta: Optional[str], reported: Optional[str], last_seen: Any, now: Optional[int] = None) -> None:
+        """Учесть свежее состояние узла (heartbeat / строка из федерации)."""
+        now = int(time.time()) if now is None else now
+        tags, reason = parse_meta_tags(meta)
+        self.drop(node_id)
+        self._put(node_id, tags, (reported or "DOWN").upper(), reason, int(last_seen or 0), now)
+
+    def rename(self, old_id: str, new_id: str, now: Optional[int] = None) -> None:
+        old = self.drop(old_id)
+        if old is not None:
+            self._put(new_id, old[0], old[1], old[2], old[3], int(time.time()) if now is None else now)
+
+    def seed(self, rows: List[Any], now: Optional[int] = None) -> None:
+        now = int(time.time()) if now is None else now
+        self._nodes.clear()
+        self._status = {"UP": 0, "DOWN": 0}
+        self._tags.clear()
+        self._reasons.clear()
+        self._expiry.clear()
+        self._queued.clear()
+        for r in rows:
+            self.observe(r["node_id"], r["meta"], r["last_reported"], r["last_seen"], now)
+
+    def expire(self, now: int) -> int:
+        """Перевести в DOWN узлы, чей heartbeat устарел к моменту now."""
+        expired = 0
+        while self._expiry and self._expiry[0][0] < now:
+            queued, node_id = heapq.heappop(self._expiry)
+            if self._queued.get(node_id) != queued:
+                continue   # вытеснена более ранним сроком
+            del self._queued[node_id]
+            rec = self._nodes.get(node_id)
+            if rec is None or rec[4] != "UP":
+                continue
+            deadline = rec[3] + THRESHOLD
+            if deadline >= now:
+                # heartbeat пришёл после постановки в очередь — ждём новый срок
+                heapq.heappush(self._expiry, (deadline, node_id))
+                self._queued[node_id] = deadline
+                continue
+            self._count(rec[0], "UP", None, -1)
+            self._put(node_id, rec[0], rec[1], rec[2], rec[3], now)
+            expired += 1
+        return expired
+
+    def snapshot(self, now: Optional[int] = None) -> Dict[str, Any]:
+        now = int(time.time()) if now is None else now
+        self.expire(now)
+        return {
+            "total": len(self._nodes),
+            "status": dict(self._status),
+            "tags": {
+                tag: {"total": c["UP"] + c["DOWN"], "UP": c["UP"], "DOWN": c["DOWN"]}
+                for tag, c in self._tags.items()
+            },
+            "reasons": dict(self._reasons),
+            "threshold": THRESHOLD,
+            "generated": now,
+        }
+
+FLEET = FleetSummary()
+
+async def load_fleet_summary() -> None:
+    """Засеять FLEET одним проходом по таблице (старт / массовое удаление)."""
+    async with aiosqlite.connect(DB) as db:
+        db.row_factory = aiosqlite.Row
+        rows = await db.execute_fetchall("SELECT node_id, meta, last_reported, last_seen FROM nodes")
+    FLEET.seed(rows)
+    logger.info("fleet summary: %d nodes, %d tags", len(FLEET), len(FLEET._tags))
 
 async def update_and_alert():
     nodes = await list_nodes()
+    changed = 0
     async with aiosqlite.connect(DB) as db:
         for n in nodes:
             if n["computed"] != n["last_state"]:
+                changed += 1
                 mark = "✅" if n["computed"] == "UP" else "❌"
                 ts = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
                 txt = (
@@ -321,7 +953,30 @@ async def update_and_alert():
                     "UPDATE nodes SET last_state=?, last_computed=? WHERE node_id=?",
                     (n["computed"], n["computed"], n["node_id"])
                 )
+            progress = n.get("progress") or {}
+            if n["computed"] == "UP" and progress.get("stalled") and not progress.get("stall_alerted"):
+                changed += 1
+                idle_min = (int(time.time()) - int(progress["changed"])) // 60
+                txt = (
+                    f"⏸ *Gensyn node progress stalled*\n"
+                    f"Node ID: `{n['node_id']}`\n"
+                    f"Round: `{progress.get('round')}` Stage: `{progress.get('stage')}`\n"
+                    f"No change for: `{idle_min} min`"
+                )
+                if progress.get("last_error"):
+                    last_error = progress["last_error"][:200].replace("`", "'")
+                    txt += f"\nLast error: `{last_error}`"
+                try:
+                    await send_tg(txt)
+                except Exception:
+                    pass
+                await db.execute(
+                    "UPDATE nodes SET progress_stall_alerted=1 WHERE node_id=?",
+                    (n["node_id"],)
+                )
         await db.commit()
+    if changed:
+        bump_nodes_version()
 
 async def watchdog_loop():
     while True:
@@ -343,6 +998,7 @@ async def _gswarm_sources() -> tuple[List[str], Dict[str, Dict[str, Any]]]:
                    gswarm_alert,
                    gswarm_stats
             FROM nodes
+            WHERE region IS NULL  -- ноды регионов опрашивает их regional-инстанс
             """
         )
     eoas: List[str] = []
@@ -484,6 +1140,442 @@ def _collect_peer_groups(node_configs: Dict[str, Dict[str, Any]]) -> Dict[str |
             deduped[key] = items
     return deduped
 
+def _peer_wr(data: Dict[str, Any] | None) -> tuple[int, int]:
+    if not data:
+        return 0, 0
+    return int(data.get("wins", 0) or 0), int(data.get("rewards", 0) or 0)
+
+def _keep_rewards(old: Dict[str, Any] | None, new: Dict[str, Any] | None) -> Dict[str, Any] | None:
+    """Чекер не смог получить rewards peer (ключа нет) — оставить последнее известное значение."""
+    if new is not None and "rewards" not in new and old and "rewards" in old:
+        new["rewards"] = old["rewards"]
+    return new
+
+# ── Индекс peer → ноды ───────────────────────────────────────────────────────
+# Последние данные каждого peer и готовые агрегаты нод (тот же вид, что даёт
+# _build_node_gswarm). Результат run_once применяется дельтами: totals меняются только
+# у нод, где изменился хотя бы один peer, и только эти ноды помечаются к сохранению.
+class PeerNodeIndex:
+    def __init__(self) -> None:
+        self._peer_nodes: Dict[str, set] = {}         # peer_id -> {node_id}
+        self._node_cfg: Dict[str, tuple] = {}         # node_id -> (peers, eoa, tgid, alert)
+        self._values: Dict[str, Dict[str, Any]] = {}  # peer_id -> последние данные peer
+        self._stats: Dict[str, Dict[str, Any]] = {}   # node_id -> агрегат ноды
+        self._dirty: set = set()                      # ноды, изменившиеся с последнего pop_dirty
+
+    def __len__(self) -> int:
+        return len(self._node_cfg)
+
+    def seed(self, per_peer: Dict[str, Dict[str, Any]] | None) -> None:
+        """Начальные значения peers из сохранённых статов (старт процесса)."""
+        for pid, data in (per_peer or {}).items():
+            if isinstance(data, dict) and data:
+                self._values.setdefault(pid, data)
+
+    def _unlink(self, pid: str, node_id: str) -> None:
+        owners = self._peer_nodes.get(pid)
+        if owners is None:
+            return
+        owners.discard(node_id)
+        if not owners:
+            del self._peer_nodes[pid]
+            self._values.pop(pid, None)
+
+    def _rebuild(self, node_id: str) -> None:
+        peers, eoa, tgid, alert = self._node_cfg[node_id]
+        stats = _build_node_gswarm(self._values, list(peers), None) if peers else None
+        if stats is None:
+            self._stats.pop(node_id, None)
+            return
+        if eoa:
+            stats["eoa"] = eoa
+        if tgid:
+            stats["tgid"] = tgid
+        if alert is not None:
+            stats["alert"] = bool(alert)
+        self._stats[node_id] = stats
+
+    def configure(self, node_configs: Dict[str, Dict[str, Any]]) -> None:
+        """Синхронизировать peers/атрибуты нод; пересчитываются только изменившиеся ноды."""
+        for node_id, cfg in node_configs.items():
+            peers = tuple(dict.fromkeys(p for p in (cfg.get("peer_ids") or []) if p))
+            key = (peers, cfg.get("eoa") or None, cfg.get("tgid") or None, cfg.get("alert"))
+            old = self._node_cfg.get(node_id)
+            if old == key:
+                continue
+            for pid in set(old[0] if old else ()) - set(peers):
+                self._unlink(pid, node_id)
+            for pid in peers:
+                self._peer_nodes.setdefault(pid, set()).add(node_id)
+            self._node_cfg[node_id] = key
+            self._rebuild(node_id)
+            self._dirty.add(node_id)
+
+    def prune(self, node_ids) -> None:
+        """Выкинуть ноды, которых больше нет среди источников G-Swarm."""
+        keep = set(node_ids)
+        for node_id in [n for n in self._node_cfg if n not in keep]:
+            self.drop_node(node_id)
+
+    def apply(self, per_peer: Dict[str, Dict[str, Any]], node_ids) -> None:
+        """Влить результат проверки нод node_ids: peer без данных в per_peer — missing."""
+        seen: set = set()
+        for node_id in node_ids:
+            cfg = self._node_cfg.get(node_id)
+            if not cfg:
+                continue
+            for pid in cfg[0]:
+                if pid in seen:
+                    continue
+                seen.add(pid)
+                old = self._values.get(pid)
+                new = _keep_rewards(old, per_peer.get(pid) or None)
+                if new != old:
+                    self._set_value(pid, old, new)
+
+    def apply_peers(self, per_peer: Dict[str, Dict[str, Any]]) -> None:
+        """Влить данные части peers по мере их готовности (без missing-семантики apply)."""
+        for pid, new in per_peer.items():
+            if pid not in self._peer_nodes:
+                continue
+            old = self._values.get(pid)
+            new = _keep_rewards(old, new or None)
+            if new != old:
+                self._set_value(pid, old, new)
+
+    def _set_value(self, pid: str, old: Dict[str, Any] | None, new: Dict[str, Any] | None) -> None:
+        if new is None:
+            self._values.pop(pid, None)
+        else:
+            self._values[pid] = new
+        old_w, old_r = _peer_wr(old)
+        new_w, new_r = _peer_wr(new)
+        for node_id in self._peer_nodes.get(pid, ()):
+            self._dirty.add(node_id)
+            stats = self._stats.get(node_id)
+            if stats is None or old is None or new is None:
+                # peer появился/пропал: меняются matched/missing — пересобрать эту ноду
+                self._rebuild(node_id)
+                continue
+            stats["per_peer"][pid] = new
+            tot = stats["totals"]
+            tot["wins"] += new_w - old_w
+            tot["rewards"] += new_r - old_r
+            tot["ranked"] += (new_w > 0) - (old_w > 0)
+
+    def stats(self, node_id: str) -> Optional[Dict[str, Any]]:
+        return self._stats.get(node_id)
+
+    def pop_dirty(self) -> set:
+        dirty, self._dirty = self._dirty, set()
+        return dirty
+
+    def mark_dirty(self, node_ids) -> None:
+        self._dirty.update(n for n in node_ids if n in self._node_cfg)
+
+    def drop_node(self, node_id: str) -> None:
+        cfg = self._node_cfg.pop(node_id, None)
+        self._stats.pop(node_id, None)
+        self._dirty.discard(node_id)
+        if cfg:
+            for pid in cfg[0]:
+                self._unlink(pid, node_id)
+
+    def rename_node(self, old_id: str, new_id: str) -> None:
+        cfg = self._node_cfg.pop(old_id, None)
+        if cfg is None:
+            return
+        self._node_cfg[new_id] = cfg
+        if old_id in self._stats:
+            self._stats[new_id] = self._stats.pop(old_id)
+        if old_id in self._dirty:
+            self._dirty.discard(old_id)
+            self._dirty.add(new_id)
+        for pid in cfg[0]:
+            owners = self._peer_nodes.get(pid)
+            if owners is not None:
+                owners.discard(old_id)
+                owners.add(new_id)
+
+PEER_INDEX = PeerNodeIndex()
+
+def _stats_totals(stats: Dict[str, Any] | None) -> tuple[Optional[int], Optional[int]]:
+    """(wins, rewards) для индексируемых колонок gswarm_wins/gswarm_rewards."""
+    tot = (stats or {}).get("totals") or {}
+    if not tot:
+        return None, None
+    return int(tot.get("wins", 0) or 0), int(tot.get("rewards", 0) or 0)
+
+# ── Рейтинг peers ────────────────────────────────────────────────────────────
+# Отсортированный набор ключей (-wins, -rewards, peer_id): лучший peer первый.
+# Обновляется точечно при сохранении статов ноды, без пересортировки всего набора
+# на каждом refresh. Равные (wins, rewards) делят одно место.
+#
+# Один плоский list + bisect.insort стоил бы O(n) на вставку/удаление (сдвиг хвоста
+# массива), поэтому ключи лежат блоками (как в sortedcontainers): bisect по
+# максимумам блоков — O(log n), сдвиг внутри блока ограничен константой
+# _SortedKeys.LOAD, а позицию (место в рейтинге) даёт дерево Фенвика по длинам
+# блоков — тоже O(log n). Деление/слияние блоков перестраивает дерево за O(n/LOAD),
+# но случается не чаще раза на ~LOAD обновлений.
+class _SortedKeys:
+    LOAD = 256  # целевой размер блока; блок делится при 2*LOAD, сливается при LOAD/4
+
+    def __init__(self) -> None:
+        self._lists: List[List[tuple]] = []
+        self._maxes: List[tuple] = []
+        self._tree: List[int] = [0]  # Фенвик по len(блока), индексы с 1
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def _rebuild(self) -> None:
+        tree = [0] + [len(b) for b in self._lists]
+        n = len(tree)
+        for i in range(1, n):
+            j = i + (i & -i)
+            if j < n:
+                tree[j] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, pos: int, delta: int) -> None:
+        tree, i = self._tree, pos + 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def _prefix(self, pos: int) -> int:
+        """Сколько ключей в блоках [0, pos)."""
+        tree, s = self._tree, 0
+        while pos > 0:
+            s += tree[pos]
+            pos -= pos & -pos
+        return s
+
+    def _locate(self, idx: int) -> tuple[int, int]:
+        """Глобальный индекс → (блок, смещение в блоке); спуск по дереву Фенвика."""
+        tree, pos, step = self._tree, 0, 1 << (len(self._tree).bit_length())
+        while step:
+            nxt = pos + step
+            if nxt < len(tree) and tree[nxt] <= idx:
+                pos = nxt
+                idx -= tree[nxt]
+            step >>= 1
+        return pos, idx
+
+    def add(self, key: tuple) -> None:
+        lists, maxes = self._lists, self._maxes
+        self._len += 1
+        if not lists:
+            lists.append([key])
+            maxes.append(key)
+            self._rebuild()
+            return
+        pos = bisect.bisect_left(maxes, key)
+        if pos == len(lists):
+            pos -= 1
+            lists[pos].append(key)
+            maxes[pos] = key
+        else:
+            bisect.insort(lists[pos], key)
+        block = lists[pos]
+        if len(block) > 2 * self.LOAD:
+            half = self.LOAD
+            lists[pos:pos + 1] = [block[:half], block[half:]]
+            maxes[pos:pos + 1] = [block[half - 1], block[-1]]
+            self._rebuild()
+        else:
+            self._tree_add(pos, 1)
+
+    def remove(self, key: tuple) -> bool:
+        lists, maxes = self._lists, self._maxes
+        pos = bisect.bisect_left(maxes, key)
+        if pos == len(lists):
+            return False
+        block = lists[pos]
+        i = bisect.bisect_left(block, key)
+        if i == len(block) or block[i] != key:
+            return False
+        del block[i]
+        self._len -= 1
+        if len(block) < self.LOAD // 4 and len(lists) > 1:
+            # маленький блок сливаем с соседом (или удаляем пустой), чтобы блоков было O(n/LOAD)
+            if block:
+                j = pos - 1 if pos > 0 else pos + 1
+                lo, hi = min(pos, j), max(pos, j)
+                merged = lists[lo] + lists[hi]
+                lists[lo:hi + 1] = [merged]
+                maxes[lo:hi + 1] = [merged[-1]]
+                if len(merged) > 2 * self.LOAD:
+                    half = len(merged) // 2
+                    lists[lo:lo + 1] = [merged[:half], merged[half:]]
+                    maxes[lo:lo + 1] = [merged[half - 1], merged[-1]]
+            else:
+                del lists[pos]
+                del maxes[pos]
+            self._rebuild()
+            return True
+        if not block:
+            del lists[pos]
+            del maxes[pos]
+            self._rebuild()
+            return True
+        if i == len(block):
+            maxes[pos] = block[-1]
+        self._tree_add(pos, -1)
+        return True
+
+    def bisect_left(self, key: tuple) -> int:
+        pos = bisect.bisect_left(self._maxes, key)
+        if pos == len(self._lists):
+            return self._len
+        return self._prefix(pos) + bisect.bisect_left(self._lists[pos], key)
+
+    def islice(self, start: int, stop: int):
+        """Ключи с глобальными индексами [start, stop) по порядку."""
+        start, stop = max(0, start), min(stop, self._len)
+        if start >= stop:
+            return
+        pos, off = self._locate(start)
+        left = stop - start
+        for block in itertools.islice(self._lists, pos, None):
+            chunk = block[off:off + left]
+            yield from chunk
+            left -= len(chunk)
+            if left <= 0:
+                return
+            off = 0
+
+class RankIndex:
+    def __init__(self) -> None:
+        self._keys = _SortedKeys()
+        self._by_peer: Dict[str, tuple] = {}
+        self._owners: Dict[str, set] = {}        # peer_id -> {node_id}
+        self._node_peers: Dict[str, set] = {}    # node_id -> {peer_id}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _remove(self, pid: str) -> None:
+        key = self._by_peer.pop(pid, None)
+        if key is not None:
+            self._keys.remove(key)
+
+    def update(self, pid: str, wins: int, rewards: int) -> None:
+        key = (-int(wins or 0), -int(rewards or 0), pid)
+        if self._by_peer.get(pid) == key:
+            return
+        self._remove(pid)
+        self._keys.add(key)
+        self._by_peer[pid] = key
+
+    def set_node(self, node_id: str, per_peer: Dict[str, Dict[str, Any]] | None) -> None:
+        """Заменить peers ноды; peers, ушедшие из ноды, выпадают из рейтинга."""
+        per_peer = per_peer or {}
+        new_ids = set(per_peer)
+        for pid in self._node_peers.get(node_id, set()) - new_ids:
+            owners = self._owners.get(pid)
+            if owners:
+                owners.discard(node_id)
+                if not owners:
+                    del self._owners[pid]
+                    self._remove(pid)
+        for pid, data in per_peer.items():
+            data = data or {}
+            self._owners.setdefault(pid, set()).add(node_id)
+            self.update(pid, data.get("wins", 0), data.get("rewards", 0))
+        if new_ids:
+            self._node_peers[node_id] = new_ids
+        else:
+            self._node_peers.pop(node_id, None)
+
+    def drop_node(self, node_id: str) -> None:
+        self.set_node(node_id, None)
+
+    def rename_node(self, old_id: str, new_id: str) -> None:
+        peers = self._node_peers.pop(old_id, None)
+        if not peers:
+            return
+        self._node_peers[new_id] = peers
+        for pid in peers:
+            owners = self._owners.get(pid)
+            if owners is not None:
+                owners.discard(old_id)
+                owners.add(new_id)
+
+    def clear(self) -> None:
+        self.__init__()
+
+    def _place(self, key: tuple) -> tuple[int, float]:
+        n = len(self._keys)
+        rank = self._keys.bisect_left(key[:2]) + 1
+        # percentile — доля peers с результатом не лучше данного
+        return rank, round(100.0 * (n - rank + 1) / n, 1)
+
+    def rank(self, pid: str) -> Optional[Dict[str, Any]]:
+        key = self._by_peer.get(pid)
+        if key is None:
+            return None
+        rank, pct = self._place(key)
+        return {"rank": rank, "percentile": pct, "of": len(self._keys)}
+
+    def top(self, limit: int, offset: int = 0) -> List[Dict[str, Any]]:
+        out: List[Dict[str, Any]] = []
+        for key in self._keys.islice(offset, offset + limit):
+            rank, pct = self._place(key)
+            pid = key[2]
+            out.append({
+                "rank": rank,
+                "percentile": pct,
+                "peer_id": pid,
+                "wins": -key[0],
+                "rewards": -key[1],
+                "nodes": sorted(self._owners.get(pid, ())),
+            })
+        return out
+
+RANK_INDEX = RankIndex()
+LEADERBOARD_MAX = 500
+
+async def load_rank_index() -> None:
+    """Построить индекс заново из сохранённых gswarm_stats (старт / массовое удаление).
+
+    Заодно засевает PEER_INDEX последними сохранёнными значениями peers, чтобы первый
+    refresh после рестарта считал дельты от них, а не переписывал все ноды.
+    """
+    async with aiosqlite.connect(DB) as db:
+        db.row_factory = aiosqlite.Row
+        rows = await db.execute_fetchall(
+            "SELECT node_id, gswarm_stats FROM nodes WHERE gswarm_stats IS NOT NULL"
+        )
+    RANK_INDEX.clear()
+    for r in rows:
+        try:
+            stats = json.loads(r["gswarm_stats"])
+        except Exception:
+            continue
+        if isinstance(stats, dict):
+            RANK_INDEX.set_node(r["node_id"], stats.get("per_peer"))
+            PEER_INDEX.seed(stats.get("per_peer"))
+    logger.info("[GSWARM] rank index: %d peers", len(RANK_INDEX))
+
+def _annotate_ranks(stats: Dict[str, Any]) -> None:
+    """Добавить в stats рейтинг peers среди всех отслеживаемых (monitor_rank/percentile)."""
+    per_peer = stats.get("per_peer")
+    if not isinstance(per_peer, dict):
+        return
+    best = None
+    for pid, data in per_peer.items():
+        place = RANK_INDEX.rank(pid)
+        if not place or not isinstance(data, dict):
+            continue
+        data["monitor_rank"] = place["rank"]
+        data["percentile"] = place["percentile"]
+        if best is None or place["rank"] < best["rank"]:
+            best = place
+    if best:
+        stats["rank"] = best
+
 async def _persist_gswarm_result(result: Dict[str, Any], node_configs: Dict[str, Dict[str, Any]]) -> tuple[Dict[str, Dict[str, Any]], int]:
     if not node_configs:
         return {}, 0
@@ -601,40 +1693,100 @@ async def _persist_gswarm_result(result: Dict[str, Any], node_configs: Dict[str,
     return node_stats, updated_count
 
 
-async def _persist_gswarm_result_overwrite(result: Dict[str, Any], node_configs: Dict[str, Dict[str, Any]]) -> tuple[Dict[str, Dict[str, Any]], int]:
+# значение gswarm_digest для «статов нет» (NULL в колонке = дайджест ещё не считался)
+_GSWARM_DIGEST_EMPTY = "-"
+
+def _stats_digest(stats: Dict[str, Any] | None) -> str:
+    """Дайджест содержимого статов без last_check (меняется на каждой проверке)."""
+    if not stats:
+        return _GSWARM_DIGEST_EMPTY
+    body = {k: v for k, v in stats.items() if k != "last_check"}
+    raw = json.dumps(body, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+async def _persist_gswarm_result_overwrite(result: Dict[str, Any], node_configs: Dict[str, Dict[str, Any]]) -> tuple[Dict[str, Dict[str, Any]], int, int]:
     """Persist G‑Swarm stats with overwrite semantics.
 
-    - Always replace previous stats with the newest snapshot.
+    - Replace previous stats with the newest snapshot, but only when its digest differs
+      from the stored gswarm_digest; unchanged rows just get gswarm_checked=now.
     - If no data for a node (e.g., empty peers), set gswarm_stats=NULL but update gswarm_updated.
     - Do not touch gswarm_eoa/gswarm_tgid/gswarm_peer_ids here (managed by heartbeat/env).
+    - Aggregation goes through PEER_INDEX: only nodes with a changed peer (or config) are
+      re-digested and written, nodes sharing a changed peer included; the rest of
+      node_configs just get gswarm_checked.
+
+    Returns (node_stats, written, skipped).
     """
     if not node_configs:
-        return {}, 0
+        return {}, 0, 0
 
     per_peer = result.get("per_peer", {}) or {}
     last_check = result.get("ts")
     eoa_peer_map = result.get("eoa_peers", {}) or {}
     _apply_auto_peers(node_configs, eoa_peer_map)
     now_ts = int(time.time())
-    node_stats = _aggregate_nodes(per_peer, node_configs, last_check)
+    PEER_INDEX.configure(node_configs)
+    PEER_INDEX.apply(per_peer, node_configs)
+    dirty = PEER_INDEX.pop_dirty()
+    node_stats: Dict[str, Dict[str, Any]] = {}
+    for node_id in node_configs:
+        stats = PEER_INDEX.stats(node_id)
+        if stats is not None:
+            stats["last_check"] = last_check
+            node_stats[node_id] = stats
+
+    try:
+        written, skipped = await _write_gswarm_stats(dirty, node_configs, now_ts)
+    except Exception:
+        PEER_INDEX.mark_dirty(dirty)  # не потерять изменения до следующего refresh
+        raise
 
+    if written:
+        bump_nodes_version()
+    logger.debug("[GSWARM] persist: written=%d skipped=%d", written, skipped)
+    return node_stats, written, skipped
+
+async def _write_gswarm_stats(dirty: set, node_configs: Dict[str, Dict[str, Any]], now_ts: int) -> tuple[int, int]:
     async with aiosqlite.connect(DB) as db:
-        updated_count = 0
+        ids = list(dirty)
+        stored: Dict[str, Any] = {}
+        for i in range(0, len(ids), 500):
+            part = ids[i:i + 500]
+            placeholders = ",".join("?" * len(part))
+            cur = await db.execute(
+                f"SELECT node_id, gswarm_digest FROM nodes WHERE node_id IN ({placeholders})", part
+            )
+            stored.update({row[0]: row[1] for row in await cur.fetchall()})
+
+        written = 0
+        skipped: List[str] = [node_id for node_id in node_configs if node_id not in dirty]
+        for node_id in ids:
+            if node_id not in stored:
+                continue
+            stats = PEER_INDEX.stats(node_id)
+            digest = _stats_digest(stats)
+            if stored[node_id] == digest:
+                if node_id in node_configs:
+                    skipped.append(node_id)
+                continue
 
-        for node_id, cfg in node_configs.items():
-            stats = node_stats.get(node_id)
             if stats is None:
                 await db.execute(
                     """
                     UPDATE nodes
                     SET gswarm_stats=NULL,
-                        gswarm_updated=?
+                        gswarm_updated=?,
+                        gswarm_checked=?,
+                        gswarm_digest=?,
+                        gswarm_wins=NULL,
+                        gswarm_rewards=NULL
                     WHERE node_id=?
                     """,
-                    (now_ts, node_id),
+                    (now_ts, now_ts, digest, node_id),
                 )
                 logger.info("[GSWARM] update: node=%s cleared=1 peers=0 wins=0 rewards=0", node_id)
-                updated_count += 1
+                RANK_INDEX.drop_node(node_id)
+                written += 1
                 continue
 
             payload = json.dumps(stats, ensure_ascii=False)
@@ -642,23 +1794,126 @@ async def _persist_gswarm_result_overwrite(result: Dict[str, Any], node_configs:
                 """
                 UPDATE nodes
                 SET gswarm_stats=?,
-                    gswarm_updated=?
+                    gswarm_updated=?,
+                    gswarm_checked=?,
+                    gswarm_digest=?,
+                    gswarm_wins=?,
+                    gswarm_rewards=?
                 WHERE node_id=?
                 """,
-                (payload, now_ts, node_id),
+                (payload, now_ts, now_ts, digest, *_stats_totals(stats), node_id),
             )
+            RANK_INDEX.set_node(node_id, stats.get("per_peer"))
             tot = (stats or {}).get("totals") or {}
             wins = int(tot.get("wins", 0) or 0)
             rewards = int(tot.get("rewards", 0) or 0)
             peers_cnt = int(tot.get("peers", 0) or 0)
             logger.info("[GSWARM] update: node=%s cleared=0 peers=%s wins=%s rewards=%s", node_id, peers_cnt, wins, rewards)
-            updated_count += 1
+            written += 1
 
+        if skipped:
+            await db.executemany(
+                "UPDATE nodes SET gswarm_checked=? WHERE node_id=?",
+                [(now_ts, node_id) for node_id in skipped],
+            )
         await db.commit()
+    return written, len(skipped)
 
-    return node_stats, updated_count
+async def _checkpoint(cursor: Dict[str, Any]) -> None:
+    """Сохранить курсор цикла refresh в снимок чекера (GSWARM_STATE_FILE)."""
+    await _gswarm_call(save_state, cursor)
+
+async def _stream_gswarm_result(node_configs: Dict[str, Dict[str, Any]], peer_groups: Dict[str | None, List[str]], **kwargs) -> tuple[Dict[str, Any], int, int]:
+    """Проход чекера с сохранением по ходу: готовые peers вливаются в PEER_INDEX, и
+    изменившиеся ноды пишутся в БД партиями (GSWARM_STREAM_BATCH / GSWARM_STREAM_FLUSH_SEC).
 
-async def refresh_gswarm_stats():
+    В конце весь результат проходит через _persist_gswarm_result_overwrite — он отмечает
+    missing peers и gswarm_checked у остальных нод. При ошибке чекера уже полученные peers
+    остаются сохранёнными, исключение пробрасывается дальше.
+
+    Returns (result, written, skipped) — result в формате run_once + off-chain.
+    """
+    offchain: Dict[str, Dict[str, int]] = {}
+    if OFFCHAIN.enabled and peer_groups:
+        try:
+            offchain = await OFFCHAIN.fetch_groups(peer_groups)
+        except Exception as exc:
+            logger.warning("[GSWARM] off-chain fetch failed: %s", exc)
+
+    result: Dict[str, Any] = {"ok": True, "ts": None, "per_peer": {}, "eoa_peers": {}}
+    per_peer = result["per_peer"]
+    rewards_failed: List[str] = []
+    batch: Dict[str, Dict[str, Any]] = {}
+    written = 0
+    last_flush = time.monotonic()
+
+    async def flush() -> None:
+        nonlocal batch, written, last_flush
+        last_flush = time.monotonic()
+        if not batch:
+            return
+        sub = {pid: offchain[pid] for pid in batch if pid in offchain}
+        if sub:
+            merge_offchain({"per_peer": batch}, sub)
+        per_peer.update(batch)
+        PEER_INDEX.apply_peers(batch)
+        batch = {}
+        dirty = PEER_INDEX.pop_dirty()
+        if not dirty:
+            return
+        for node_id in dirty:
+            stats = PEER_INDEX.stats(node_id)
+            if stats is not None:
+                stats["last_check"] = result["ts"]
+        try:
+            done, _ = await _write_gswarm_stats(dirty, {}, int(time.time()))
+        except Exception:
+            PEER_INDEX.mark_dirty(dirty)
+            raise
+        if done:
+            written += done
+            bump_nodes_version()
+
+    try:
+        async for ev in _gswarm_stream(offchain_peer_map=peer_groups, **kwargs):
+            if ev[0] == "start":
+                result["ts"] = ev[1]["ts"]
+                result["eoa_peers"] = ev[1]["eoa_peers"]
+                # peers по EOA известны с самого начала — индекс настраивается до первых данных
+                _apply_auto_peers(node_configs, result["eoa_peers"])
+                PEER_INDEX.configure(node_configs)
+                continue
+            _, pid, data, rewards_ok = ev
+            batch[pid] = data
+            if not rewards_ok:
+                rewards_failed.append(pid)
+            if len(batch) >= GSWARM_STREAM_BATCH or time.monotonic() - last_flush >= GSWARM_STREAM_FLUSH_SEC:
+                await flush()
+    except Exception:
+        await flush()
+        raise
+    await flush()
+
+    # off-chain peers, которых нет on-chain
+    rest = {pid: off for pid, off in offchain.items() if pid not in per_peer}
+    if rest:
+        merge_offchain(result, rest)
+    result["totals"] = {
+        "wins": sum(int(v.get("wins", 0) or 0) for v in per_peer.values()),
+        "rewards": sum(int(v.get("rewards", 0) or 0) for v in per_peer.values()),
+        "peers": len(per_peer),
+    }
+    if rewards_failed:
+        result["rewards_failed"] = rewards_failed
+    _, done, skipped = await _persist_gswarm_result_overwrite(result, node_configs)
+    return result, written + done, skipped
+
+async def refresh_gswarm_stats(resume: Optional[Dict[str, Any]] = None, checkpoint: bool = False):
+    """Цикл refresh. resume — курсор незавершённого цикла из снимка: ноды до after
+    пропускаются, peers, опрошенные после started, берутся из снимка.
+
+    checkpoint — писать курсор в снимок; это делает только gswarm_loop, разовый цикл
+    (админка при выключенном цикле) курсор цикла не трогает."""
     logger.info("[GSWARM] refresh: collecting sources…")
     eoas, node_configs = await _gswarm_sources()
     try:
@@ -669,17 +1924,24 @@ async def refresh_gswarm_stats():
     except Exception:
         pass
 
+    PEER_INDEX.prune(node_configs)
     if not node_configs and not eoas:
         logger.info("[GSWARM] refresh: nothing to do (no node configs / EOAs)")
         return
 
-    loop = asyncio.get_running_loop()
+    started = float((resume or {}).get("started") or time.time())
 
     if GSWARM_INCREMENTAL:
         # Persist per node as soon as its snapshot is ready
         total_updated = 0
+        total_skipped = 0
         total_peers = 0
-        items = list((node_configs or {}).items())
+        # порядок по node_id — курсор «после какой ноды» переживает рестарт
+        items = sorted((node_configs or {}).items())
+        after = (resume or {}).get("after")
+        if after:
+            items = [(node_id, cfg) for node_id, cfg in items if node_id > after]
+            logger.info("[GSWARM] resuming cycle after %s: %d nodes left", after, len(items))
         total_nodes = len(items)
         for idx, (node_id, cfg) in enumerate(items, 1):
             single_map = {node_id: cfg}
@@ -687,30 +1949,34 @@ async def refresh_gswarm_stats():
             peer_groups = _collect_peer_groups(single_map)
             extra_eoas = [cfg.get("eoa")] if cfg.get("eoa") else []
             try:
-                result = await loop.run_in_executor(
-                    None,
-                    lambda: run_once(
-                        send_telegram=GSWARM_AUTO_SEND and bool(cfg.get("alert", True)),
-                        extra_peer_ids=extra_peer_ids,
-                        extra_eoas=extra_eoas,
-                        offchain_peer_map=peer_groups,
-                    ),
+                result, updated, skipped = await _stream_gswarm_result(
+                    single_map,
+                    peer_groups,
+                    send_telegram=GSWARM_AUTO_SEND and bool(cfg.get("alert", True)),
+                    extra_peer_ids=extra_peer_ids,
+                    extra_eoas=extra_eoas,
+                    reuse_since=started,
                 )
             except Exception as exc:
                 logger.exception("[GSWARM] refresh node %s failed: %s", node_id, exc)
                 continue
 
             total_peers += len(result.get("per_peer", {}))
-            _, updated = await _persist_gswarm_result_overwrite(result, single_map)
             total_updated += updated
+            total_skipped += skipped
+            if checkpoint:
+                await _checkpoint({"started": started, "after": node_id})
             # Gentle pause between nodes to reduce 429
             if idx < total_nodes and GSWARM_NODE_PAUSE_SEC and GSWARM_NODE_PAUSE_SEC > 0:
                 await asyncio.sleep(GSWARM_NODE_PAUSE_SEC)
+        if checkpoint:
+            await _checkpoint({"started": started, "finished": time.time()})
         logger.info(
-            "[GSWARM] refresh ok (incremental): nodes=%d, peers_total=%d, updated=%d",
+            "[GSWARM] refresh ok (incremental): nodes=%d, peers_total=%d, written=%d, skipped=%d",
             len(node_configs or {}),
             total_peers,
             total_updated,
+            total_skipped,
         )
         return
 
@@ -718,38 +1984,575 @@ async def refresh_gswarm_stats():
     extra_peer_ids = sorted({pid for cfg in node_configs.values() for pid in cfg.get("peer_ids", [])})
     peer_groups = _collect_peer_groups(node_configs) if node_configs else {}
     any_alert = any(cfg.get("alert", True) for cfg in node_configs.values()) if node_configs else False
+    if checkpoint:
+        await _checkpoint({"started": started})
     try:
-        result = await loop.run_in_executor(
-            None,
-            lambda: run_once(
-                send_telegram=GSWARM_AUTO_SEND and any_alert,
-                extra_peer_ids=extra_peer_ids,
-                extra_eoas=eoas,
-                offchain_peer_map=peer_groups,
-            ),
+        result, updated_count, skipped_count = await _stream_gswarm_result(
+            node_configs,
+            peer_groups,
+            send_telegram=GSWARM_AUTO_SEND and any_alert,
+            extra_peer_ids=extra_peer_ids,
+            extra_eoas=eoas,
+            reuse_since=started,
         )
     except Exception as exc:
         logger.exception("[GSWARM] refresh failed: %s", exc)
         return
+    if checkpoint:
+        await _checkpoint({"started": started, "finished": time.time()})
 
-    _, updated_count = await _persist_gswarm_result_overwrite(result, node_configs)
-
-    logger.info("[GSWARM] refresh ok: nodes=%d, peers=%d, wins=%s, rewards=%s, updated=%d",
+    logger.info("[GSWARM] refresh ok: nodes=%d, peers=%d, wins=%s, rewards=%s, written=%d, skipped=%d",
                 len(node_configs), len(result.get("per_peer", {})),
                 result.get("totals",{}).get("wins"), result.get("totals",{}).get("rewards"),
-                updated_count)
+                updated_count, skipped_count)
+
+# Циклы refresh не идут параллельно: фоновый цикл, /api/admin/gswarm/refresh и профайлер
+# (target=refresh) берут один _REFRESH_LOCK. Пока цикл идёт, ручной запуск получает 409;
+# при включённом gswarm_loop ручной запуск не делает свой проход, а будит цикл и ждёт
+# его конца — RPC не нагружается дважды, курсор снимка ведёт только цикл.
+_REFRESH_LOCK = asyncio.Lock()
+_REFRESH_WAKE = asyncio.Event()
+_REFRESH_WAITERS: List["asyncio.Future[None]"] = []
+_REFRESH_LOOP_RUNNING = False
+
+async def run_gswarm_cycle() -> None:
+    """Один цикл refresh по запросу (админка, профайлер); 409, если цикл уже идёт."""
+    if _REFRESH_LOCK.locked():
+        raise HTTPException(409, "G-Swarm refresh already running")
+    if not _REFRESH_LOOP_RUNNING:
+        async with _REFRESH_LOCK:
+            await refresh_gswarm_stats()
+        return
+    fut = asyncio.get_running_loop().create_future()
+    _REFRESH_WAITERS.append(fut)
+    _REFRESH_WAKE.set()
+    await fut
 
-async def gswarm_loop():
-    await asyncio.sleep(5)
+async def _refresh_sleep(delay: float) -> None:
+    """Пауза gswarm_loop до следующего цикла; run_gswarm_cycle прерывает её."""
+    try:
+        await asyncio.wait_for(_REFRESH_WAKE.wait(), delay)
+    except asyncio.TimeoutError:
+        pass
+
+async def gswarm_loop(cursor: Optional[Dict[str, Any]] = None):
+    """cursor — курсор из снимка чекера: прерванный рестартом цикл продолжается,
+    а после недавно завершённого первый цикл ждёт свой обычный срок."""
+    global _REFRESH_LOOP_RUNNING
+    _REFRESH_LOOP_RUNNING = True
+    await _refresh_sleep(5)
     interval = max(60, GSWARM_REFRESH_INTERVAL)
     logger.info("[GSWARM] loop started, interval=%ss", interval)
+    resume = None
+    cursor = cursor or {}
+    max_age = GSWARM_RESUME_MAX_AGE_SEC or 2 * (interval + max(0.0, GSWARM_NODE_PAUSE_SEC))
+    # снимок старше max_age — данные устарели, начинаем цикл с нуля
+    if cursor.get("started") and time.time() - float(cursor.get("saved") or 0) <= max_age:
+        if cursor.get("finished"):
+            wait = float(cursor["finished"]) + interval - time.time()
+            if wait > 0 and not _REFRESH_WAKE.is_set():
+                logger.info("[GSWARM] warm start: last cycle finished %.0fs ago, next in %.0fs", interval - wait, wait)
+                await _refresh_sleep(wait)
+        else:
+            resume = cursor
+    while True:
+        waiters = _REFRESH_WAITERS[:]
+        _REFRESH_WAITERS.clear()
+        _REFRESH_WAKE.clear()
+        error: Optional[Exception] = None
+        async with _REFRESH_LOCK:
+            try:
+                await refresh_gswarm_stats(resume, checkpoint=True)
+            except Exception as exc:
+                logger.exception("[GSWARM] loop iteration failed: %s", exc)
+                error = exc
+        for fut in waiters:
+            if not fut.done():
+                if error is not None:
+                    fut.set_exception(error)
+                else:
+                    fut.set_result(None)
+        resume = None
+        await _refresh_sleep(interval)
+
+async def eoa_peers_loop():
+    """Фоновое пакетное обновление кэша EOA→peers — до того, как он понадобится refresh."""
+    await asyncio.sleep(1)
+    interval = max(60, GSWARM_EOA_REFRESH_INTERVAL)
     while True:
         try:
-            await refresh_gswarm_stats()
+            eoas, _ = await _gswarm_sources()
+            if eoas:
+                await _gswarm_call(refresh_eoa_peers, eoas, interval)
         except Exception as exc:
-            logger.exception("[GSWARM] loop iteration failed: %s", exc)
+            logger.exception("[GSWARM] EOA peers refresh failed: %s", exc)
         await asyncio.sleep(interval)
 
+# ── Профилирование ────────────────────────────────────────────────────────────
+# Сторожевой поток следит за «пульсом» event loop: если корутина/колбэк держит loop
+# дольше LOOP_LAG_WARN_MS, в лог уходит стек потока loop в момент блокировки.
+class LoopLagMonitor:
+    def __init__(self, threshold_ms: int):
+        self.threshold = threshold_ms / 1000.0
+        self.tick = 0.3 * self.threshold
+        self.last_beat = time.monotonic()
+        self.loop_thread_id: Optional[int] = None
+        self.stalls = 0
+        self.max_lag_ms = 0.0
+        self.last_stall: Optional[Dict[str, Any]] = None
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.loop_thread_id = threading.get_ident()
+        loop.create_task(self._beat())
+        threading.Thread(target=self._watch, name="loop-lag", daemon=True).start()
+        logger.info("[PROF] loop lag monitor: threshold=%dms", int(self.threshold * 1000))
+
+    async def _beat(self) -> None:
+        while True:
+            self.last_beat = time.monotonic()
+            await asyncio.sleep(self.tick)
+
+    def _watch(self) -> None:
+        reported_for = None
+        while True:
+            time.sleep(self.tick)
+            beat = self.last_beat
+            lag = time.monotonic() - beat - self.tick
+            if lag < self.threshold:
+                if reported_for is not None:
+                    logger.warning("[PROF] event loop unblocked after %.0f ms", self.last_stall["lag_ms"])
+                reported_for = None
+                continue
+            lag_ms = lag * 1000
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+            if reported_for == beat:
+                self.last_stall["lag_ms"] = lag_ms
+                continue
+            # новая блокировка — снимаем стек потока loop
+            reported_for = beat
+            self.stalls += 1
+            frame = sys._current_frames().get(self.loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else ""
+            self.last_stall = {"at": int(time.time()), "lag_ms": lag_ms, "stack": stack}
+            logger.warning("[PROF] event loop blocked > %.0f ms, stack:\n%s", lag_ms, stack)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "threshold_ms": int(self.threshold * 1000),
+            "stalls": self.stalls,
+            "max_lag_ms": round(self.max_lag_ms, 1),
+            "last_stall": self.last_stall,
+        }
+
+LOOP_LAG = LoopLagMonitor(LOOP_LAG_WARN_MS)
+_PROFILE_LOCK = asyncio.Lock()
+
+class StackSampler:
+    """Сэмплирующий профайлер: раз в interval снимает стеки всех потоков API-процесса
+    (loop, to_thread/executor) и считает self/total по функциям. Дочерние процессы
+    (воркер G-Swarm) в выборку не попадают."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples = 0
+        self.self_counts: Counter = Counter()
+        self.total_counts: Counter = Counter()
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f"{os.path.basename(code.co_filename)}:{frame.f_lineno} {code.co_name}")
+                    frame = frame.f_back
+                if not names:
+                    continue
+                self.samples += 1
+                self.self_counts[names[0]] += 1
+                for name in set(names):
+                    self.total_counts[name] += 1
+                self.stacks[";".join(reversed(names))] += 1
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def report(self, top: int) -> Dict[str, Any]:
+        return {
+            "samples": self.samples,
+            "interval_ms": self.interval * 1000,
+            "self": [{"frame": f, "samples": n} for f, n in self.self_counts.most_common(top)],
+            "total": [{"frame": f, "samples": n} for f, n in self.total_counts.most_common(top)],
+            # формат folded stacks — годится для flamegraph.pl / speedscope
+            "stacks": [{"stack": st, "samples": n} for st, n in self.stacks.most_common(top)],
+        }
+
+async def _profiled(mode: str, top: int, work) -> Dict[str, Any]:
+    """Выполнить await work() под выбранным профайлером и вернуть отчёт.
+
+    cprofile видит только поток event loop (SQLite/JSON/обработчики), sampling — все потоки
+    API-процесса. При GSWARM_WORKER=1 RPC-часть refresh (run_once/iter_run) идёт в
+    воркере и в профиль не попадает — видны приём событий и запись в БД; run_once в
+    потоках executor профилируется только при GSWARM_WORKER=0.
+    """
+    if mode not in ("cprofile", "sampling"):
+        raise HTTPException(400, "mode must be cprofile|sampling")
+    if _PROFILE_LOCK.locked():
+        raise HTTPException(409, "Profiling already in progress")
+    async with _PROFILE_LOCK:
+        started = time.perf_counter()
+        if mode == "cprofile":
+            prof = cProfile.Profile()
+            prof.enable()
+            try:
+                await work()
+            finally:
+                prof.disable()
+            buf = io.StringIO()
+            pstats.Stats(prof, stream=buf).sort_stats("cumulative").print_stats(top)
+            report: Dict[str, Any] = {"stats": buf.getvalue()}
+        else:
+            sampler = StackSampler()
+            sampler.start()
+            try:
+                await work()
+            finally:
+                sampler.stop()
+            report = sampler.report(top)
+    report.update({"mode": mode, "elapsed_sec": round(time.perf_counter() - started, 3), "loop_lag": LOOP_LAG.snapshot()})
+    return report
+
+# ── Федерация ─────────────────────────────────────────────────────────────────
+# Каждое изменение «федеративных» колонок (и удаление/переименование) получает
+# row_version из монотонного счётчика fed_seq — триггерами, чтобы не трогать все
+# места записи. regional отдаёт central всё, что новее подтверждённого курсора;
+# central хранит курсор на регион, так что после обрыва связи пуш продолжается
+# с места остановки (from=0 — полный переcинк, принимается всегда).
+FED_COLUMNS = (
+    "ip", "last_seen", "meta", "last_reported",
+    "gswarm_eoa", "gswarm_tgid", "gswarm_peer_ids", "gswarm_stats", "gswarm_updated",
+    "gswarm_alert", "gswarm_wins", "gswarm_rewards",
+    "progress_round", "progress_stage", "progress_changed", "progress_errors",
+    "progress_last_error", "progress_reported",
+)
+# last_state/last_computed/progress_stall_alerted — состояние оповещений central, не синкаем
+
+_FED_TRIGGERS = ("trg_nodes_ver_ins", "trg_nodes_ver_upd", "trg_nodes_ver_rename", "trg_nodes_ver_del")
+
+async def _init_row_versions(db: aiosqlite.Connection) -> None:
+    """Таблицы федерации есть всегда; триггеры row_version — только у regional.
+
+    Триггеры добавляют UPDATE на каждую запись ноды, поэтому вне федерации они снимаются.
+    Если regional включили на базе, которая жила без триггеров, все строки получают
+    свежий row_version — следующий пуш отдаст central полный срез.
+    """
+    for ddl in (
+        "CREATE TABLE IF NOT EXISTS fed_seq(id INTEGER PRIMARY KEY CHECK (id = 1), v INTEGER NOT NULL)",
+        "INSERT OR IGNORE INTO fed_seq(id, v) VALUES (1, 0)",
+        "CREATE TABLE IF NOT EXISTS node_tombstones(node_id TEXT PRIMARY KEY, row_version INTEGER NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS idx_tombstones_row_version ON node_tombstones(row_version)",
+        "CREATE TABLE IF NOT EXISTS federation_regions(region TEXT PRIMARY KEY, cursor INTEGER NOT NULL DEFAULT 0, pushed_at INTEGER, applied INTEGER)",
+    ):
+        await db.execute(ddl)
+    if FEDERATION_ROLE != "regional":
+        for name in _FED_TRIGGERS:
+            await db.execute(f"DROP TRIGGER IF EXISTS {name}")
+        return
+
+    placeholders = ",".join("?" * len(_FED_TRIGGERS))
+    cur = await db.execute(
+        f"SELECT COUNT(*) FROM sqlite_master WHERE type='trigger' AND name IN ({placeholders})", _FED_TRIGGERS
+    )
+    (present,) = await cur.fetchone()
+    cols = ", ".join(("node_id",) + FED_COLUMNS)
+    bump = "UPDATE fed_seq SET v = v + 1 WHERE id = 1;"
+    for ddl in (
+        f"""CREATE TRIGGER IF NOT EXISTS trg_nodes_ver_ins AFTER INSERT ON nodes BEGIN
+              {bump}
+              UPDATE nodes SET row_version = (SELECT v FROM fed_seq WHERE id = 1) WHERE node_id = NEW.node_id;
+              DELETE FROM node_tombstones WHERE node_id = NEW.node_id;
+            END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_nodes_ver_upd AFTER UPDATE OF {cols} ON nodes BEGIN
+              {bump}
+              UPDATE nodes SET row_version = (SELECT v FROM fed_seq WHERE id = 1) WHERE node_id = NEW.node_id;
+            END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_nodes_ver_rename AFTER UPDATE OF node_id ON nodes
+            WHEN OLD.node_id <> NEW.node_id BEGIN
+              {bump}
+              INSERT OR REPLACE INTO node_tombstones(node_id, row_version) VALUES (OLD.node_id, (SELECT v FROM fed_seq WHERE id = 1));
+              DELETE FROM node_tombstones WHERE node_id = NEW.node_id;
+            END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_nodes_ver_del AFTER DELETE ON nodes BEGIN
+              {bump}
+              INSERT OR REPLACE INTO node_tombstones(node_id, row_version) VALUES (OLD.node_id, (SELECT v FROM fed_seq WHERE id = 1));
+            END""",
+    ):
+        await db.execute(ddl)
+    # строки без row_version, а если триггеров не было — все (их правки мимо счётчика)
+    where = "" if present < len(_FED_TRIGGERS) else " WHERE row_version IS NULL"
+    await db.execute(f"UPDATE nodes SET row_version = (SELECT v FROM fed_seq WHERE id = 1) + rowid{where}")
+    await db.execute("UPDATE fed_seq SET v = MAX(v, (SELECT COALESCE(MAX(row_version), 0) FROM nodes)) WHERE id = 1")
+
+def federation_ok(h: Optional[str]) -> bool:
+    if not FEDERATION_TOKEN or not h:
+        return False
+    p = h.split()
+    return len(p) == 2 and p[0].lower() == "bearer" and secrets.compare_digest(p[1], FEDERATION_TOKEN)
+
+_FED_HTTP: Optional[httpx.AsyncClient] = None
+
+def _fed_http() -> httpx.AsyncClient:
+    global _FED_HTTP
+    if _FED_HTTP is None:
+        _FED_HTTP = httpx.AsyncClient(
+            base_url=FEDERATION_CENTRAL_URL,
+            timeout=20,
+            headers={"Authorization": f"Bearer {FEDERATION_TOKEN}"},
+        )
+    return _FED_HTTP
+
+async def _fed_changes(cursor: int, limit: int) -> List[Dict[str, Any]]:
+    """Изменения новее cursor в порядке row_version: строки и надгробия вперемешку."""
+    cols = ", ".join(FED_COLUMNS)
+    async with aiosqlite.connect(DB) as db:
+        db.row_factory = aiosqlite.Row
+        rows = await db.execute_fetchall(
+            f"SELECT node_id, row_version, {cols} FROM nodes WHERE row_version > ? ORDER BY row_version LIMIT ?",
+            (cursor, limit),
+        )
+        tombs = await db.execute_fetchall(
+            "SELECT node_id, row_version FROM node_tombstones WHERE row_version > ? ORDER BY row_version LIMIT ?",
+            (cursor, limit),
+        )
+    items = [{"v": r["row_version"], "row": {k: r[k] for k in ("node_id",) + FED_COLUMNS}} for r in rows]
+    items += [{"v": t["row_version"], "deleted": t["node_id"]} for t in tombs]
+    items.sort(key=lambda it: it["v"])
+    return items[:limit]
+
+async def _fed_head() -> int:
+    async with aiosqlite.connect(DB) as db:
+        cur = await db.execute("SELECT v FROM fed_seq WHERE id = 1")
+        row = await cur.fetchone()
+    return int(row[0]) if row else 0
+
+async def federation_push_once(cursor: int) -> tuple[int, bool]:
+    """Отправить одну пачку дельт; вернуть (новый курсор, есть ли ещё)."""
+    batch = max(1, FEDERATION_BATCH)
+    items = await _fed_changes(cursor, batch)
+    if not items:
+        return cursor, False
+    to = items[-1]["v"]
+    body = gzip.compress(_dumps_bytes({
+        "region": FEDERATION_REGION,
+        "from": cursor,
+        "to": to,
+        "items": items,
+    }))
+    resp = await _fed_http().post(
+        "/api/federation/push",
+        content=body,
+        headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+    )
+    if resp.status_code == 409:
+        # central подтвердил другой курсор (рестарт/обрыв посреди пуша) — продолжаем с него
+        remote = int(resp.json().get("cursor") or 0)
+        logger.warning("[FED] cursor mismatch: local=%s central=%s", cursor, remote)
+        return (remote if remote <= await _fed_head() else 0), True
+    resp.raise_for_status()
+    logger.info("[FED] pushed %d changes (%d bytes gz) cursor %s -> %s", len(items), len(body), cursor, to)
+    return to, len(items) >= batch
+
+async def federation_push_loop():
+    await asyncio.sleep(2)
+    interval = max(1, FEDERATION_PUSH_INTERVAL)
+    cursor: Optional[int] = None
+    delay = interval
+    logger.info("[FED] regional %r -> %s, interval=%ss", FEDERATION_REGION, FEDERATION_CENTRAL_URL, interval)
+    while True:
+        try:
+            if cursor is None:
+                resp = await _fed_http().get("/api/federation/cursor", params={"region": FEDERATION_REGION})
+                resp.raise_for_status()
+                cursor = int(resp.json().get("cursor") or 0)
+                if cursor > await _fed_head():
+                    # локальная БД моложе подтверждённого курсора — полный пересинк
+                    cursor = 0
+                logger.info("[FED] resume from cursor=%s", cursor)
+            cursor, more = await federation_push_once(cursor)
+            delay = interval
+            if more:
+                continue
+        except Exception as exc:
+            logger.warning("[FED] push failed: %s (retry in %ss)", exc, delay)
+            cursor = None
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 300)
+            continue
+        await asyncio.sleep(interval)
+
+@app.get("/api/federation/cursor")
+async def federation_cursor(
+    region: str = Query(...),
+    authorization: Optional[str] = Header(default=None),
+):
+    if FEDERATION_ROLE != "central":
+        raise HTTPException(404, "Federation central disabled")
+    if not federation_ok(authorization):
+        raise HTTPException(401, "Unauthorized")
+    async with aiosqlite.connect(DB) as db:
+        cur = await db.execute("SELECT cursor FROM federation_regions WHERE region=?", (region,))
+        row = await cur.fetchone()
+    return {"region": region, "cursor": int(row[0]) if row else 0}
+
+@app.post("/api/federation/push")
+async def federation_push(req: Request, authorization: Optional[str] = Header(default=None)):
+    if FEDERATION_ROLE != "central":
+        raise HTTPException(404, "Federation central disabled")
+    if not federation_ok(authorization):
+        raise HTTPException(401, "Unauthorized")
+    raw = await req.body()
+    if (req.headers.get("content-encoding") or "").lower() == "gzip":
+        try:
+            raw = gzip.decompress(raw)
+        except OSError:
+            raise HTTPException(400, "Bad gzip body")
+    try:
+        data = json.loads(raw)
+        region = str(data["region"]).strip()
+        from_v = int(data["from"])
+        to_v = int(data["to"])
+        items = list(data.get("items") or [])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(400, "Malformed federation payload")
+    if not region:
+        raise HTTPException(400, "region required")
+
+    cols = ("node_id",) + FED_COLUMNS
+    insert_sql = (
+        f"INSERT INTO nodes({', '.join(cols)}, region, last_state, last_computed) "
+        f"VALUES({', '.join('?' * len(cols))}, ?, 'DOWN', 'UP') "
+        f"ON CONFLICT(node_id) DO UPDATE SET region=excluded.region, "
+        + ", ".join(f"{c}=excluded.{c}" for c in FED_COLUMNS)
+    )
+    touched: Dict[str, Optional[Dict[str, Any]]] = {}
+    async with aiosqlite.connect(DB) as db:
+        cur = await db.execute("SELECT cursor FROM federation_regions WHERE region=?", (region,))
+        row = await cur.fetchone()
+        current = int(row[0]) if row else 0
+        if from_v != current and from_v != 0:
+            return JSONResponse({"ok": False, "cursor": current}, status_code=409)
+        for it in items:
+            if it.get("deleted"):
+                node_id = str(it["deleted"])
+                await db.execute("DELETE FROM nodes WHERE node_id=? AND region=?", (node_id, region))
+                touched[node_id] = None
+                continue
+            r = it.get("row") or {}
+            node_id = str(r.get("node_id") or "").strip()
+            if not node_id:
+                continue
+            await db.execute(insert_sql, (*(r.get(c) for c in cols), region))
+            touched[node_id] = r
+        await db.execute(
+            """
+            INSERT INTO federation_regions(region, cursor, pushed_at, applied) VALUES(?, ?, ?, ?)
+            ON CONFLICT(region) DO UPDATE SET cursor=excluded.cursor, pushed_at=excluded.pushed_at,
+                applied=federation_regions.applied + excluded.applied
+            """,
+            (region, to_v, int(time.time()), len(items)),
+        )
+        await db.commit()
+
+    for node_id, r in touched.items():
+        stats = None
+        if r and r.get("gswarm_stats"):
+            try:
+                stats = json.loads(r["gswarm_stats"])
+            except Exception:
+                stats = None
+        RANK_INDEX.set_node(node_id, (stats or {}).get("per_peer") if isinstance(stats, dict) else None)
+        if r:
+            FLEET.observe(node_id, r.get("meta"), r.get("last_reported"), r.get("last_seen"))
+        else:
+            FLEET.drop(node_id)
+            _forget_node_state([node_id])
+    if touched:
+        bump_nodes_version()
+    return {"ok": True, "cursor": to_v, "applied": len(items)}
+
+# ── Удалённое восстановление ────────────────────────────────────────────────
+# Решение принимается централизованно по состоянию из heartbeat: агент выполняет
+# действия сразу после отправки и сообщает результат следующим heartbeat'ом.
+# Состояние — в памяти процесса (после рестарта отсчёт начинается заново).
+_REMEDIATION: Dict[str, Dict[str, Any]] = {}
+
+def _meta_reason(meta: Optional[str]) -> Optional[str]:
+    for part in (meta or "").split(","):
+        key, _, value = part.strip().partition("=")
+        if key == "reason" and value:
+            return value.strip()
+    return None
+
+def _remediation_actions_for(reason: Optional[str]) -> List[str]:
+    if reason == "empty_screen_no_runtime":
+        return ["kill-empty-screen", "restart-launcher"]
+    return ["restart-launcher"]
+
+def plan_remediation(node_id: str, reported: str, meta: Optional[str], action_results: Any) -> List[Dict[str, Any]]:
+    """Действия для агента с учётом grace-периода и экспоненциального backoff на узел."""
+    now = int(time.time())
+    state = _REMEDIATION.setdefault(node_id, {"down_since": None, "attempts": 0, "next_at": 0})
+    if isinstance(action_results, dict):
+        action_results = [action_results]
+    for action_result in action_results if isinstance(action_results, list) else []:
+        if not isinstance(action_result, dict) or not action_result.get("id"):
+            continue
+        state["last_result"] = {
+            "id": str(action_result.get("id")),
+            "type": str(action_result.get("type") or ""),
+            "ok": bool(action_result.get("ok")),
+            "detail": str(action_result.get("detail") or "")[:200],
+            "ts": now,
+        }
+        logger.info(
+            "[REMEDIATE] node=%s result id=%s type=%s ok=%s detail=%s",
+            node_id, state["last_result"]["id"], state["last_result"]["type"],
+            state["last_result"]["ok"], state["last_result"]["detail"],
+        )
+    if reported == "UP":
+        state.update(down_since=None, attempts=0, next_at=0)
+        return []
+    if state["down_since"] is None:
+        state["down_since"] = now
+    if not REMEDIATION_ENABLED:
+        return []
+    if now - state["down_since"] < REMEDIATION_GRACE_SEC or now < state["next_at"]:
+        return []
+
+    state["attempts"] += 1
+    backoff = min(REMEDIATION_BACKOFF_SEC * (2 ** (state["attempts"] - 1)), REMEDIATION_BACKOFF_MAX_SEC)
+    state["next_at"] = now + backoff
+    reason = _meta_reason(meta)
+    actions = [{"id": secrets.token_hex(6), "type": t} for t in _remediation_actions_for(reason)]
+    state["last_actions"] = {"types": [a["type"] for a in actions], "reason": reason, "ts": now}
+    logger.info(
+        "[REMEDIATE] node=%s reason=%s attempt=%d actions=%s next_in=%ss",
+        node_id, reason, state["attempts"], ",".join(a["type"] for a in actions), backoff,
+    )
+    return actions
+
 def auth_ok(h: Optional[str]) -> bool:
     if not h:
         return False
@@ -765,52 +2568,199 @@ def admin_ok(h: Optional[str]) -> bool:
     return len(p) == 2 and p[0].lower() == "bearer" and p[1] == ADMIN_TOKEN
 
 # ── Публичное API ─────────────────────────────────────────────────────────────
+# ── Расписание heartbeat ─────────────────────────────────────────────────────
+# Таймеры агентов срабатывают на границе минуты, и весь парк приходит одной пачкой,
+# которую upsert() всё равно обрабатывает по одному. В ответе сервер называет агенту,
+# через сколько секунд бить в следующий раз: у каждой ноды свой слот внутри интервала
+# (хэш node_id), так что нагрузка размазывается равномерно. Когда heartbeat-ов в работе
+# (от чтения тела до записи) больше HEARTBEAT_MAX_INFLIGHT, новые получают 429 с
+# Retry-After сразу, не читая тело.
+_HB_INFLIGHT = 0
+HEARTBEAT_OVERLOAD_RATIO = 0.75   # доля лимита, после которой агентам советуют пропустить цикл
+
+def _beat_slot_ms(node_id: str, period_ms: int) -> int:
+    digest = hashlib.blake2b(node_id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % period_ms
+
+def _beat_interval(value: Any) -> int:
+    try:
+        interval = int(value)
+    except (TypeError, ValueError):
+        return HEARTBEAT_INTERVAL_SEC
+    return min(3600, max(5, interval))
+
+def beat_schedule(node_id: str, interval: int, now: float, overload: bool) -> int:
+    """Секунд до следующего heartbeat ноды: до её слота, но не ближе четверти интервала."""
+    period_ms = interval * 1000
+    wait_ms = (_beat_slot_ms(node_id, period_ms) - int(now * 1000) % period_ms) % period_ms
+    if wait_ms < period_ms // 4:
+        wait_ms += period_ms
+    if overload:
+        wait_ms += period_ms  # перегрузка: пропустить один цикл
+    return max(1, round(wait_ms / 1000))
+
+def _heartbeat_retry_after(key: str) -> int:
+    base = max(1, HEARTBEAT_RETRY_AFTER)
+    # [base, 2·base): повторы разных нод (по IP — тело ещё не прочитано) расходятся во времени
+    return base + _beat_slot_ms(key, base * 1000) // 1000
+
+# ── Быстрый путь heartbeat ──────────────────────────────────────────────────
+# G-Swarm поля (eoa/peer_ids/tgid) у ноды почти не меняются: запоминаем отпечаток
+# сырых значений из последнего записанного heartbeat и при совпадении не разбираем
+# их заново и не переписываем в БД. Кэш в памяти: после рестарта, переименования или
+# удаления первый heartbeat ноды идёт полным путём.
+_json_loads = orjson.loads if orjson is not None else json.loads
+_GSWARM_FP: Dict[str, tuple] = {}   # node_id -> (отпечаток, eoa, peer_ids, tgid)
+
+def _forget_node_state(node_ids) -> None:
+    """Сбросить in-memory состояние heartbeat удалённых нод (отпечаток G-Swarm, ремедиация)."""
+    for node_id in node_ids:
+        _GSWARM_FP.pop(node_id, None)
+        _REMEDIATION.pop(node_id, None)
+        _HB_VISIBLE.pop(node_id, None)
+
+def _gswarm_fingerprint(data: Dict[str, Any]) -> Optional[bytes]:
+    fields = (data.get("gswarm_eoa"), data.get("gswarm_peer_ids"), data.get("gswarm_tgid"), data.get("gswarm"))
+    try:
+        return hashlib.blake2b(_dumps_bytes(fields), digest_size=16).digest()
+    except (TypeError, ValueError):
+        return None
+
+async def _read_body_limited(req: Request, limit: int) -> bytes:
+    """Тело запроса не длиннее limit байт (по Content-Length и по факту), иначе 413."""
+    declared = req.headers.get("content-length") or ""
+    if limit > 0 and declared.isdigit() and int(declared) > limit:
+        raise HTTPException(413, f"Payload too large (max {limit} bytes)")
+    chunks: List[bytes] = []
+    size = 0
+    async for chunk in req.stream():
+        size += len(chunk)
+        if limit > 0 and size > limit:
+            raise HTTPException(413, f"Payload too large (max {limit} bytes)")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
 @app.post("/api/heartbeat")
 async def heartbeat(req: Request, authorization: Optional[str] = Header(default=None)):
+    global _HB_INFLIGHT
     if not auth_ok(authorization):
         raise HTTPException(401, "Unauthorized")
-    raw = await req.body()
+    # допуск — до чтения тела: при перегрузке не тратим время на приём и разбор JSON
+    if HEARTBEAT_MAX_INFLIGHT > 0 and _HB_INFLIGHT >= HEARTBEAT_MAX_INFLIGHT:
+        retry_after = _heartbeat_retry_after(client_ip(req))
+        raise HTTPException(
+            429,
+            {"error": "heartbeat ingest overloaded", "retry_after": retry_after},
+            headers={"Retry-After": str(retry_after)},
+        )
+    _HB_INFLIGHT += 1
+    try:
+        return await _heartbeat_ingest(req)
+    finally:
+        _HB_INFLIGHT -= 1
+
+async def _heartbeat_ingest(req: Request) -> Dict[str, Any]:
+    """Разбор и запись heartbeat; слот _HB_INFLIGHT уже занят вызывающим."""
+    raw = await _read_body_limited(req, HEARTBEAT_MAX_BYTES)
     try:
-        data = json.loads(raw.decode("utf-8"))
-    except UnicodeDecodeError as exc:
-        logger.warning("Heartbeat decode error: %s", exc)
-        raise HTTPException(400, "Invalid JSON encoding (expected UTF-8)")
-    except json.JSONDecodeError as exc:
+        data = _json_loads(raw)
+    except ValueError as exc:  # json/orjson.JSONDecodeError, UnicodeDecodeError
         logger.warning("Heartbeat JSON error: %s", exc)
+        if isinstance(exc, UnicodeDecodeError) or "utf-8" in str(exc).lower():
+            raise HTTPException(400, "Invalid JSON encoding (expected UTF-8)")
+        raise HTTPException(400, "Malformed JSON payload")
+    if not isinstance(data, dict):
         raise HTTPException(400, "Malformed JSON payload")
     node_id = str(data.get("node_id", "")).strip()
     if not node_id:
         raise HTTPException(400, "node_id required")
-    ip = str(data.get("ip", "")).strip()
+    ip = str(data.get("ip") or "").strip() or client_ip(req)
     meta = str(data.get("meta", "")) if data.get("meta") else None
     reported = str(data.get("status", "UP")).strip().upper()
     if reported not in ("UP", "DOWN"):
         reported = "DOWN"
 
-    gswarm_envelope = data.get("gswarm") if isinstance(data.get("gswarm"), dict) else None
-    gswarm_eoa = data.get("gswarm_eoa") or (gswarm_envelope.get("eoa") if gswarm_envelope else None)
-    if isinstance(gswarm_eoa, str):
-        gswarm_eoa = gswarm_eoa.strip() or None
-    peer_input = data.get("gswarm_peer_ids")
-    if peer_input is None and gswarm_envelope:
-        peer_input = gswarm_envelope.get("peer_ids")
-    gswarm_peer_ids = parse_peer_ids(peer_input)
-    tgid_input = data.get("gswarm_tgid")
-    if tgid_input is None and gswarm_envelope:
-        tgid_input = gswarm_envelope.get("tgid") or gswarm_envelope.get("telegram_id")
-    if isinstance(tgid_input, int):
-        gswarm_tgid = str(tgid_input)
-    elif isinstance(tgid_input, str):
-        gswarm_tgid = tgid_input.strip() or None
+    fingerprint = _gswarm_fingerprint(data)
+    known = _GSWARM_FP.get(node_id)
+    gswarm_unchanged = fingerprint is not None and known is not None and known[0] == fingerprint
+    if gswarm_unchanged:
+        # tgid нужен, если строки уже нет и upsert уйдёт в полный INSERT
+        _, gswarm_eoa, gswarm_peer_ids, gswarm_tgid = known
     else:
-        gswarm_tgid = None
+        gswarm_envelope = data.get("gswarm") if isinstance(data.get("gswarm"), dict) else None
+        gswarm_eoa = data.get("gswarm_eoa") or (gswarm_envelope.get("eoa") if gswarm_envelope else None)
+        if isinstance(gswarm_eoa, str):
+            gswarm_eoa = gswarm_eoa.strip() or None
+        peer_input = data.get("gswarm_peer_ids")
+        if peer_input is None and gswarm_envelope:
+            peer_input = gswarm_envelope.get("peer_ids")
+        gswarm_peer_ids = parse_peer_ids(peer_input)
+        tgid_input = data.get("gswarm_tgid")
+        if tgid_input is None and gswarm_envelope:
+            tgid_input = gswarm_envelope.get("tgid") or gswarm_envelope.get("telegram_id")
+        if isinstance(tgid_input, int):
+            gswarm_tgid = str(tgid_input)
+        elif isinstance(tgid_input, str):
+            gswarm_tgid = tgid_input.strip() or None
+        else:
+            gswarm_tgid = None
 
-    await upsert(node_id, ip, meta, reported, gswarm_eoa, gswarm_peer_ids, gswarm_tgid)
-    return {"ok": True}
+    progress = parse_progress(data.get("progress"))
+
+    await upsert(
+        node_id, ip, meta, reported, gswarm_eoa, gswarm_peer_ids, gswarm_tgid, progress,
+        gswarm_unchanged=gswarm_unchanged,
+    )
+    if not gswarm_unchanged and fingerprint is not None:
+        _GSWARM_FP[node_id] = (fingerprint, gswarm_eoa, gswarm_peer_ids, gswarm_tgid)
+    if not gswarm_unchanged and gswarm_eoa and gswarm_peer_ids:
+        # агент видит peers, которых нет в кэше EOA→peers — следующий refresh перечитает EOA.
+        # На быстром пути (отпечаток тот же) peers уже сверены прошлым heartbeat
+        if REFRESH_WORKER is not None:
+            REFRESH_WORKER.notify("note_reported_peers", gswarm_eoa, gswarm_peer_ids)
+        else:
+            note_reported_peers(gswarm_eoa, gswarm_peer_ids)
+    actions = plan_remediation(node_id, reported, meta, data.get("action_results"))
+    # свой слот ещё занят — он входит в счёт
+    overload = HEARTBEAT_MAX_INFLIGHT > 0 and _HB_INFLIGHT >= HEARTBEAT_MAX_INFLIGHT * HEARTBEAT_OVERLOAD_RATIO
+    interval = _beat_interval(data.get("beat_interval"))
+    return {
+        "ok": True,
+        "actions": actions,
+        "next_beat": beat_schedule(node_id, interval, time.time(), overload),
+        "overload": overload,
+    }
 
 @app.get("/api/nodes")
-async def api_nodes():
-    return JSONResponse(await list_nodes())
+async def api_nodes(
+    limit: Optional[int] = Query(None, ge=1, le=NODES_PAGE_MAX, description="Размер страницы; без него — весь список"),
+    cursor: Optional[str] = Query(None, description="next_cursor из предыдущей страницы"),
+    status: Optional[str] = Query(None, description="UP | DOWN"),
+    q: Optional[str] = Query(None, description="Поиск по node_id / ip / meta"),
+    sort: Optional[str] = Query(None, description="node_id | age | wins | rewards | status (по умолчанию node_id)"),
+    order: Optional[str] = Query(None, description="asc | desc"),
+    full: bool = Query(False, description="Полные G-Swarm stats (per_peer, peer_ids) в каждой ноде"),
+):
+    # без пагинации/фильтров/сортировки — прежний формат (массив всех узлов)
+    if limit is None and not (cursor or status or q or sort or order):
+        body = await cached_nodes_body(("all", full), lambda: list_nodes(full))
+    else:
+        params = (limit or NODES_PAGE_MAX, cursor, status, q, sort, order, full)
+        body = await cached_nodes_body(params, lambda: query_nodes(*params))
+    return Response(content=body, media_type="application/json")
+
+@app.get("/api/nodes/{node_id}/gswarm")
+async def api_node_gswarm(node_id: str):
+    """Детали G-Swarm одной ноды (per_peer с рейтингом, peer_ids, missing_peers) — для раскрытой строки."""
+    body = await cached_nodes_body(("gswarm", node_id), lambda: node_gswarm_detail(node_id))
+    if body == b"null":
+        raise HTTPException(404, "Node not found")
+    return Response(content=body, media_type="application/json")
+
+@app.get("/api/summary")
+async def api_summary():
+    """Сводка по флоту: статусы, теги meta, причины DOWN — для шапки дашборда и статус-страницы."""
+    return Response(content=_dumps_bytes(FLEET.snapshot()), media_type="application/json")
 
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
@@ -842,18 +2792,28 @@ async def gswarm_check(
         extra_eoas, node_configs = await _gswarm_sources()
     extra_peer_ids = sorted({pid for cfg in node_configs.values() for pid in cfg.get("peer_ids", [])}) if node_configs else []
     peer_groups = _collect_peer_groups(node_configs) if node_configs else {}
-    result = await asyncio.to_thread(
+    result = await _gswarm_call(
         run_once,
         send_telegram=send,
         extra_peer_ids=extra_peer_ids,
         extra_eoas=extra_eoas,
         offchain_peer_map=peer_groups,
     )
+    result = await _with_offchain(result, peer_groups)
     if include_nodes and node_configs:
-        node_stats, _ = await _persist_gswarm_result_overwrite(result, node_configs)
+        node_stats, written, skipped = await _persist_gswarm_result_overwrite(result, node_configs)
         result["nodes"] = node_stats
+        result["persist"] = {"written": written, "skipped": skipped}
     return result
 
+@app.get("/api/gswarm/leaderboard")
+async def gswarm_leaderboard(
+    limit: int = Query(50, ge=1, le=LEADERBOARD_MAX),
+    offset: int = Query(0, ge=0),
+):
+    """Топ peers по (wins, rewards) среди всех отслеживаемых нод — прямо из индекса."""
+    return {"total": len(RANK_INDEX), "offset": offset, "items": RANK_INDEX.top(limit, offset)}
+
 @app.post("/api/nodes/gswarm/alert")
 async def set_gswarm_alert(
     payload: Dict[str, Any],
@@ -880,6 +2840,7 @@ async def set_gswarm_alert(
             (1 if enabled else 0, node_id)
         )
         await db.commit()
+    bump_nodes_version()
     return {"ok": True, "node_id": node_id, "enabled": enabled}
 
 # ── Админ-API ─────────────────────────────────────────────────────────────────
@@ -905,6 +2866,14 @@ async def admin_rename(
             raise HTTPException(409, "new_id already exists")
         await db.execute("UPDATE nodes SET node_id=? WHERE node_id=?", (new_id, old_id))
         await db.commit()
+    if old_id in _REMEDIATION:
+        _REMEDIATION[new_id] = _REMEDIATION.pop(old_id)
+    RANK_INDEX.rename_node(old_id, new_id)
+    PEER_INDEX.rename_node(old_id, new_id)
+    FLEET.rename(old_id, new_id)
+    _GSWARM_FP.pop(old_id, None)
+    _HB_VISIBLE.pop(old_id, None)
+    bump_nodes_version()
     return {"ok": True, "renamed": True, "old_id": old_id, "new_id": new_id}
 
 @app.post("/api/admin/delete")
@@ -920,6 +2889,11 @@ async def admin_delete(
     async with aiosqlite.connect(DB) as db:
         await db.execute("DELETE FROM nodes WHERE node_id=?", (node_id,))
         await db.commit()
+    _forget_node_state([node_id])
+    RANK_INDEX.drop_node(node_id)
+    PEER_INDEX.drop_node(node_id)
+    FLEET.drop(node_id)
+    bump_nodes_version()
     return {"ok": True, "deleted": node_id}
 
 @app.post("/api/admin/prune")
@@ -935,15 +2909,64 @@ async def admin_prune(
 
     cutoff_ts = int(time.time()) - cutoff_days * 86400
     async with aiosqlite.connect(DB) as db:
-        cur = await db.execute("SELECT COUNT(*) FROM nodes WHERE last_seen < ?", (cutoff_ts,))
-        (cnt_before,) = await cur.fetchone()
+        cur = await db.execute("SELECT node_id FROM nodes WHERE last_seen < ?", (cutoff_ts,))
+        pruned = [row[0] for row in await cur.fetchall()]
+        cnt_before = len(pruned)
         await db.execute("DELETE FROM nodes WHERE last_seen < ?", (cutoff_ts,))
         await db.commit()
+    _forget_node_state(pruned)
+    if cnt_before:
+        await load_rank_index()
+        await load_fleet_summary()
+        bump_nodes_version()
     return {"ok": True, "deleted": int(cnt_before), "cutoff_days": cutoff_days}
 
+@app.post("/api/admin/profile")
+async def admin_profile(
+    authorization: Optional[str] = Header(default=None),
+    seconds: Optional[float] = Query(None, gt=0, description="Длительность захвата для target=time (по умолчанию 10)"),
+    mode: str = Query("sampling", description="sampling | cprofile"),
+    target: str = Query("time", description="time — N секунд текущей нагрузки, refresh — ближайший цикл refresh_gswarm_stats"),
+    top: int = Query(40, ge=1, le=500),
+):
+    if not admin_ok(authorization):
+        raise HTTPException(401, "Unauthorized")
+    if target == "refresh":
+        if seconds is not None:
+            # цикл refresh нельзя оборвать посередине без потери записи — длительность задаёт он сам
+            raise HTTPException(400, "seconds is not supported with target=refresh")
+        if _REFRESH_LOCK.locked():
+            raise HTTPException(409, "G-Swarm refresh already running")
+        # профилируется ближайший цикл gswarm_loop (или разовый, если цикл выключен)
+        work = run_gswarm_cycle
+    elif target == "time":
+        duration = min(seconds if seconds is not None else 10, PROFILE_MAX_SEC)
+
+        async def work():
+            await asyncio.sleep(duration)
+    else:
+        raise HTTPException(400, "target must be time|refresh")
+    report = await _profiled(mode, top, work)
+    report["target"] = target
+    return report
+
+@app.get("/api/admin/loop-lag")
+async def admin_loop_lag(authorization: Optional[str] = Header(default=None)):
+    if not admin_ok(authorization):
+        raise HTTPException(401, "Unauthorized")
+    return LOOP_LAG.snapshot()
+
+@app.get("/api/admin/gswarm/worker")
+async def admin_gswarm_worker(authorization: Optional[str] = Header(default=None)):
+    if not admin_ok(authorization):
+        raise HTTPException(401, "Unauthorized")
+    if REFRESH_WORKER is None:
+        return {"enabled": False}
+    return {"enabled": True, **REFRESH_WORKER.stats()}
+
 @app.post("/api/admin/gswarm/refresh")
 async def admin_gswarm_refresh(authorization: Optional[str] = Header(default=None)):
     if not admin_ok(authorization):
         raise HTTPException(401, "Unauthorized")
-    await refresh_gswarm_stats()
+    await run_gswarm_cycle()
     return {"ok": True}
@@ -4,12 +4,16 @@
 import os
 import json
 import time
+import queue
 import random
+import asyncio
 import logging
+import threading
 from datetime import datetime
-from typing import Dict, List, Tuple
+from typing import Any, AsyncIterator, Dict, Iterator, List, Tuple
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from web3 import Web3
+
+from integrations.gswarm_rpc import Coordinator, RawRpc
 
 log = logging.getLogger("gensyn-monitor")
 
@@ -20,13 +24,25 @@ _RPC_URLS = [u.strip() for u in os.environ.get("RPC_URLS", "").split(",") if u.s
 _SWARM_COORDINATOR = os.environ.get(
     "SWARM_COORDINATOR_ADDR", "0xFaD7C5e93f28257429569B854151A1B8DCD404c2"
 ).strip()
+# raw — свой eth_call-кодек (gswarm_rpc), web3 — полноценный Contract (web3 импортируется только тогда)
+_RPC_CODEC = os.environ.get("GSWARM_RPC_CODEC", "raw").strip().lower()
 
 # ограничения и паузы
 _MAX_WORKERS = int(os.environ.get("GSWARM_MAX_WORKERS", "2"))  # поменьше, чтобы не ловить 429
-_EOA_PAUSE = int(os.environ.get("GSWARM_EOA_PAUSE_SEC", "60"))  # пауза между EOA
-_REWARDS_CHUNK = int(os.environ.get("GSWARM_REWARDS_CHUNK", "20"))  # размер чанка для getTotalRewards
-_CHUNK_PAUSE = float(os.environ.get("GSWARM_CHUNK_PAUSE_SEC", "20"))  # пауза между чанками rewards
+_EOA_PAUSE = int(os.environ.get("GSWARM_EOA_PAUSE_SEC", "60"))  # пауза между запросами getPeerId
+_EOA_PEERS_TTL = float(os.environ.get("GSWARM_EOA_PEERS_TTL_SEC", "86400"))  # TTL кэша EOA→peers
+_EOA_BULK = int(os.environ.get("GSWARM_EOA_BULK", "50"))  # EOA в одном getPeerId
+_EOA_CACHE_FILE = os.environ.get("GSWARM_EOA_CACHE_FILE", "data/gswarm_eoa_peers.json").strip()  # пусто = только в памяти
+_REWARDS_CHUNK = int(os.environ.get("GSWARM_REWARDS_CHUNK", "20"))  # стартовый размер чанка для getTotalRewards
+_REWARDS_CHUNK_MAX = int(os.environ.get("GSWARM_REWARDS_CHUNK_MAX", "200"))  # потолок адаптивного чанка
+_REWARDS_TARGET = float(os.environ.get("GSWARM_REWARDS_TARGET_SEC", "3"))  # целевая латентность чанка
+_CHUNK_PAUSE = float(os.environ.get("GSWARM_CHUNK_PAUSE_SEC", "20"))  # макс. пауза между чанками rewards
+_BISECT_MAX_CALLS = int(os.environ.get("GSWARM_BISECT_MAX_CALLS", "16"))  # вызовов на поиск «плохих» peers в чанке
+_CHUNK_STATE_FILE = os.environ.get("GSWARM_CHUNK_STATE_FILE", "data/gswarm_chunks.json").strip()  # пусто = не сохранять
 _PER_CALL_JITTER = float(os.environ.get("GSWARM_PER_CALL_JITTER_SEC", "0.05"))  # микропаузка в воркерах
+_STATE_FILE = os.environ.get("GSWARM_STATE_FILE", "data/gswarm_state.json").strip()  # пусто = без warm-start
+_STATE_PEER_MAX_AGE = float(os.environ.get("GSWARM_STATE_PEER_MAX_AGE_SEC", "86400"))  # старше — из снимка выкидываем
+_STATE_SAVE_EVERY = 5.0  # сек: как часто стриминговый проход сбрасывает снимок на диск
 
 # ретраи на 429/таймауты
 _RETRY_MAX = int(os.environ.get("GSWARM_RETRY_MAX", "3"))
@@ -47,18 +63,27 @@ _ABI = [
      "stateMutability":"view","type":"function"},
 ]
 
-_W3_CACHED: Web3 | None = None
+_W3_CACHED: Any = None             # RawRpc | Web3
+_RPC_PREFERRED: str | None = None   # endpoint, к которому подключились до рестарта (из снимка)
+
+def _connect(url: str):
+    if _RPC_CODEC == "web3":
+        from web3 import Web3
+        return Web3(Web3.HTTPProvider(url, request_kwargs={"timeout": 15}))
+    return RawRpc(url, timeout=15)
 
-def _w3() -> Web3:
+def _w3():
     global _W3_CACHED
     if _W3_CACHED is not None:
         return _W3_CACHED
     urls = _RPC_URLS if _RPC_URLS else [_RPC_URL]
+    if _RPC_PREFERRED in urls:
+        urls = [_RPC_PREFERRED] + [u for u in urls if u != _RPC_PREFERRED]
     last_err = None
     for i, url in enumerate(urls, 1):
         try:
             log.info("[GSWARM-mini] RPC try %d/%d: %s", i, len(urls), url)
-            w = Web3(Web3.HTTPProvider(url, request_kwargs={"timeout": 15}))
+            w = _connect(url)
             if w.is_connected():
                 _W3_CACHED = w
                 log.info("[GSWARM-mini] RPC connected: %s", url)
@@ -70,14 +95,31 @@ def _w3() -> Web3:
             log.error("[GSWARM-mini] RPC error: %s :: %s", url, e)
     raise RuntimeError(f"RPC недоступен: {urls[-1]}") from last_err
 
-def _contract(w3: Web3):
+def _contract(w3):
+    if isinstance(w3, RawRpc):
+        return Coordinator(w3, _SWARM_COORDINATOR)
     return w3.eth.contract(address=w3.to_checksum_address(_SWARM_COORDINATOR), abi=_ABI)
 
+def _address_arg(w3, addr: str) -> str:
+    # RawRpc кодирует hex как есть; web3 требует checksum-адрес
+    return addr if isinstance(w3, RawRpc) else w3.to_checksum_address(addr)
+
+def _rpc_endpoint(w3) -> str | None:
+    return getattr(w3, "endpoint_uri", None) or getattr(getattr(w3, "provider", None), "endpoint_uri", None)
+
 # ===== утиль =====
 def _is_rate_limited(err: Exception) -> bool:
     s = str(err)
     return "429" in s or "Too Many Requests" in s
 
+def _is_size_limit(err: Exception) -> bool:
+    s = str(err).lower()
+    return any(m in s for m in ("413", "too large", "exceeds", "size limit", "out of gas", "gas required"))
+
+def _is_permanent(err: Exception) -> bool:
+    # повтор того же запроса не поможет — лучше сразу делить чанк
+    return _is_size_limit(err) or "revert" in str(err).lower()
+
 def _call_with_retry(fn, desc: str, *args, **kwargs):
     delay = _RETRY_BASE
     for attempt in range(1, _RETRY_MAX + 1):
@@ -94,43 +136,372 @@ def _call_with_retry(fn, desc: str, *args, **kwargs):
                 delay *= 1.7
                 continue
             log.warning("[GSWARM-mini] %s failed (attempt %d/%d): %s", desc, attempt, _RETRY_MAX, e)
-            if attempt >= _RETRY_MAX:
+            if attempt >= _RETRY_MAX or _is_permanent(e):
                 raise
     # сюда не дойдём
     raise RuntimeError(f"{desc} exhausted retries")
 
-# ===== низкоуровневые вызовы =====
-def _fetch_peers(c, w3: Web3, eoa: str) -> List[str]:
-    eoa_cs = w3.to_checksum_address(eoa)
+def _write_json_atomic(path: str, obj) -> None:
+    d = os.path.dirname(path)
+    if d:
+        os.makedirs(d, exist_ok=True)
+    # свой tmp на поток: снимки пишутся и из executor'а run_once, и из event loop
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, separators=(",", ":"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+# ===== warm-start снимок (GSWARM_STATE_FILE) =====
+# Последний рабочий RPC endpoint, свежие результаты по peers и курсор цикла refresh
+# (его ведёт app.py). После рестарта цикл продолжается с места остановки, а peers,
+# уже опрошенные в этом цикле, повторно не запрашиваются. Кэш EOA→peers и размеры
+# чанков живут в своих файлах (GSWARM_EOA_CACHE_FILE, GSWARM_CHUNK_STATE_FILE).
+_PEER_RESULTS: Dict[str, List] = {}   # peer -> [wins, ts_wins, rewards, ts_rewards]; ts=0 — нет значения
+_STATE_CURSOR: Dict = {}
+_STATE_LOADED: Dict | None = None   # курсор, прочитанный при старте процесса
+_STATE_LOCK = threading.Lock()
+_STATE_SAVE_LOCK = threading.Lock()
+
+def load_state() -> Dict:
+    """Поднять снимок при старте; возвращает курсор refresh и saved — время записи ({} если снимка нет).
+
+    Файл читается один раз на процесс: повторный вызов (API спрашивает курсор у воркера,
+    который уже поднял снимок при запуске) отдаёт прочитанный тогда курсор.
+    """
+    global _RPC_PREFERRED, _STATE_LOADED
+    if _STATE_LOADED is not None:
+        return dict(_STATE_LOADED)
+    _STATE_LOADED = {}
+    if not _STATE_FILE or not os.path.exists(_STATE_FILE):
+        return {}
     try:
-        res = _call_with_retry(c.functions.getPeerId([eoa_cs]).call, "getPeerId", )
-        peers = res[0] if res and len(res) > 0 else []
-        peers = [p.strip() for p in peers if p and p.strip()]
-        log.info("[GSWARM-mini] EOA %s -> peers: %d", eoa, len(peers))
-        return peers
+        with open(_STATE_FILE, "r", encoding="utf-8") as f:
+            raw = json.load(f)
     except Exception as e:
-        log.error("[GSWARM-mini] getPeerId failed for %s: %s", eoa, e)
-        return []
+        log.warning("[GSWARM-mini] state %s unreadable: %s", _STATE_FILE, e)
+        return {}
+    now = time.time()
+    with _STATE_LOCK:
+        _RPC_PREFERRED = raw.get("rpc") or None
+        _PEER_RESULTS.clear()
+        for peer, v in (raw.get("peers") or {}).items():
+            try:
+                wins, ts_w, rewards, ts_r = int(v[0]), float(v[1]), int(v[2]), float(v[3])
+            except (TypeError, ValueError, IndexError):
+                continue
+            if now - max(ts_w, ts_r) <= _STATE_PEER_MAX_AGE:
+                _PEER_RESULTS[str(peer)] = [wins, ts_w, rewards, ts_r]
+        _STATE_CURSOR.clear()
+        _STATE_CURSOR.update(raw.get("cursor") or {})
+        cursor = dict(_STATE_CURSOR, saved=raw.get("saved"))
+    _STATE_LOADED = cursor
+    log.info("[GSWARM-mini] state loaded: peers=%d, rpc=%s, cursor=%s", len(_PEER_RESULTS), _RPC_PREFERRED, cursor)
+    return cursor
 
-def _fetch_rewards_batch(c, peers: List[str]) -> Dict[str, int]:
-    if not peers:
+def save_state(cursor: Dict | None = None) -> None:
+    """Записать снимок атомарно; cursor (если передан) заменяет сохранённый курсор."""
+    if not _STATE_FILE:
+        return
+    now = time.time()
+    with _STATE_LOCK:
+        if cursor is not None:
+            _STATE_CURSOR.clear()
+            _STATE_CURSOR.update(cursor)
+        for peer in [p for p, v in _PEER_RESULTS.items() if now - max(v[1], v[3]) > _STATE_PEER_MAX_AGE]:
+            del _PEER_RESULTS[peer]
+        snapshot = {
+            "saved": int(now),
+            "rpc": _rpc_endpoint(_W3_CACHED) or _RPC_PREFERRED,
+            "cursor": dict(_STATE_CURSOR),
+            "peers": {p: list(v) for p, v in _PEER_RESULTS.items()},
+        }
+    try:
+        with _STATE_SAVE_LOCK:
+            _write_json_atomic(_STATE_FILE, snapshot)
+    except Exception as e:
+        log.warning("[GSWARM-mini] state save failed: %s", e)
+
+def _record_results(values: Dict[str, int], slot: int) -> None:
+    """Запомнить свежие значения: slot 0 — wins, 2 — rewards."""
+    now = time.time()
+    with _STATE_LOCK:
+        for peer, value in values.items():
+            entry = _PEER_RESULTS.setdefault(peer, [0, 0.0, 0, 0.0])
+            entry[slot] = int(value)
+            entry[slot + 1] = now
+
+def _reuse_results(peers: List[str], slot: int, since: float | None) -> Dict[str, int]:
+    """Значения, полученные не раньше since (в текущем цикле) — их не запрашиваем повторно."""
+    if since is None:
         return {}
-    out: Dict[str, int] = {}
-    # чанкование + паузы между чанками
-    for i in range(0, len(peers), _REWARDS_CHUNK):
-        chunk = peers[i:i+_REWARDS_CHUNK]
+    with _STATE_LOCK:
+        return {
+            p: _PEER_RESULTS[p][slot]
+            for p in peers
+            if p in _PEER_RESULTS and _PEER_RESULTS[p][slot + 1] >= since
+        }
+
+# ===== кэш EOA → peers =====
+# Набор peers у EOA меняется редко: держим его с длинным TTL (и на диске), досрочно
+# сбрасываем, когда heartbeat присылает peers, которых нет в кэше для этого EOA.
+_EOA_CACHE: Dict[str, Dict] | None = None   # eoa_norm -> {"peers": [...], "ts": epoch}
+_EOA_LOCK = threading.Lock()
+_EOA_INVALIDATE_MIN_AGE = 600
+
+def _eoa_cache() -> Dict[str, Dict]:
+    global _EOA_CACHE
+    if _EOA_CACHE is None:
+        _EOA_CACHE = {}
+        if _EOA_CACHE_FILE and os.path.exists(_EOA_CACHE_FILE):
+            try:
+                with open(_EOA_CACHE_FILE, "r", encoding="utf-8") as f:
+                    raw = json.load(f)
+                _EOA_CACHE = {
+                    str(k).lower(): {"peers": list(v.get("peers") or []), "ts": float(v.get("ts") or 0)}
+                    for k, v in raw.items() if isinstance(v, dict)
+                }
+            except Exception as e:
+                log.warning("[GSWARM-mini] EOA cache %s unreadable: %s", _EOA_CACHE_FILE, e)
+    return _EOA_CACHE
+
+def _save_eoa_cache() -> None:
+    if not _EOA_CACHE_FILE:
+        return
+    with _EOA_LOCK:
+        snapshot = dict(_eoa_cache())
+    try:
+        _write_json_atomic(_EOA_CACHE_FILE, snapshot)
+    except Exception as e:
+        log.warning("[GSWARM-mini] EOA cache save failed: %s", e)
+
+def cached_eoa_peers(eoa: str, max_age: float | None = None) -> List[str] | None:
+    """peers EOA из кэша, если запись не старше max_age (по умолчанию TTL); иначе None."""
+    key = (eoa or "").strip().lower()
+    ttl = _EOA_PEERS_TTL if max_age is None else max_age
+    with _EOA_LOCK:
+        entry = _eoa_cache().get(key)
+    if not entry or time.time() - entry["ts"] > ttl:
+        return None
+    return list(entry["peers"])
+
+def invalidate_eoa(eoa: str) -> bool:
+    key = (eoa or "").strip().lower()
+    with _EOA_LOCK:
+        entry = _eoa_cache().get(key)
+        if not entry or not entry["ts"]:
+            return False
+        entry["ts"] = 0.0
+    log.info("[GSWARM-mini] EOA %s peers cache invalidated", eoa)
+    return True
+
+def note_reported_peers(eoa: str, peers: List[str]) -> bool:
+    """Heartbeat сообщил peers ноды с этим EOA: если их нет в кэше — сбросить запись."""
+    if not eoa or not peers:
+        return False
+    key = eoa.strip().lower()
+    with _EOA_LOCK:
+        entry = _eoa_cache().get(key)
+        known = set(entry["peers"]) if entry and entry["ts"] else None
+        age = time.time() - entry["ts"] if known is not None else 0
+    # только что перечитанную запись не сбрасываем: peer мог ещё не попасть в контракт
+    if known is None or set(peers) <= known or age < _EOA_INVALIDATE_MIN_AGE:
+        return False
+    return invalidate_eoa(eoa)
+
+def refresh_eoa_peers(eoas: List[str], ahead: float = 0) -> Dict[str, List[str]]:
+    """EOA→peers: свежие записи из кэша, остальные — пакетным getPeerId([...]).
+
+    ahead — обновить и записи, которые истекут в ближайшие N секунд (фоновый проход).
+    """
+    out: Dict[str, List[str]] = {}
+    stale: List[str] = []
+    max_age = max(0.0, _EOA_PEERS_TTL - ahead)
+    for eoa in dict.fromkeys(e.strip() for e in eoas if e and e.strip()):
+        peers = cached_eoa_peers(eoa, max_age)
+        if peers is None:
+            stale.append(eoa)
+        else:
+            out[eoa.lower()] = peers
+    if not stale:
+        return out
+
+    w3 = _w3()
+    c = _contract(w3)
+    step = max(1, _EOA_BULK)
+    fetched = 0
+    for i in range(0, len(stale), step):
+        batch = stale[i:i+step]
+        try:
+            res = _call_with_retry(
+                c.functions.getPeerId([_address_arg(w3, e) for e in batch]).call,
+                f"getPeerId[{len(batch)} EOAs]",
+            )
+        except Exception as e:
+            log.error("[GSWARM-mini] bulk getPeerId failed (%d EOAs): %s", len(batch), e)
+            # отдаём что было в кэше, пусть и просроченное
+            for eoa in batch:
+                with _EOA_LOCK:
+                    entry = _eoa_cache().get(eoa.lower())
+                if entry:
+                    out[eoa.lower()] = list(entry["peers"])
+        else:
+            now = time.time()
+            with _EOA_LOCK:
+                cache = _eoa_cache()
+                for eoa, peers in zip(batch, res or []):
+                    clean = list(dict.fromkeys(p.strip() for p in (peers or []) if p and p.strip()))
+                    cache[eoa.lower()] = {"peers": clean, "ts": now}
+                    out[eoa.lower()] = clean
+            fetched += len(batch)
+        if i + step < len(stale) and _EOA_PAUSE > 0:
+            log.info("[GSWARM-mini] pause between getPeerId batches: sleeping %ds", _EOA_PAUSE)
+            time.sleep(_EOA_PAUSE)
+    if fetched:
+        _save_eoa_cache()
+    log.info("[GSWARM-mini] EOA peers: cached=%d, fetched=%d", len(out) - fetched, fetched)
+    return out
+
+# ===== адаптивный размер чанка rewards =====
+# Выученный размер хранится на endpoint RPC: растёт, пока чанки проходят быстрее
+# _REWARDS_TARGET, сжимается при медленных ответах и ошибках лимита размера.
+_CHUNK_SIZES: Dict[str, int] | None = None
+
+def _load_chunk_sizes() -> Dict[str, int]:
+    global _CHUNK_SIZES
+    if _CHUNK_SIZES is None:
+        _CHUNK_SIZES = {}
+        if _CHUNK_STATE_FILE and os.path.exists(_CHUNK_STATE_FILE):
+            try:
+                with open(_CHUNK_STATE_FILE, "r", encoding="utf-8") as f:
+                    raw = json.load(f)
+                _CHUNK_SIZES = {str(k): int(v) for k, v in raw.items() if int(v) > 0}
+            except Exception as e:
+                log.warning("[GSWARM-mini] chunk state %s unreadable: %s", _CHUNK_STATE_FILE, e)
+    return _CHUNK_SIZES
+
+def _save_chunk_sizes() -> None:
+    if not _CHUNK_STATE_FILE or _CHUNK_SIZES is None:
+        return
+    try:
+        _write_json_atomic(_CHUNK_STATE_FILE, _CHUNK_SIZES)
+    except Exception as e:
+        log.warning("[GSWARM-mini] chunk state save failed: %s", e)
+
+def _endpoint_of(c) -> str:
+    return str(getattr(c, "endpoint_uri", None) or _rpc_endpoint(getattr(c, "w3", None)) or _RPC_URL)
+
+def _rewards_call(c, chunk: List[str], desc: str) -> Dict[str, int]:
+    vals = _call_with_retry(c.functions.getTotalRewards(chunk).call, desc)
+    return {p: int(v) for p, v in zip(chunk, vals)}
+
+def _chunk_pause(latency: float | None) -> float:
+    """Пауза после вызова getTotalRewards: быстрый провайдер — короткая, медленный/упавший — полная."""
+    if _CHUNK_PAUSE <= 0:
+        return 0.0
+    ratio = 1.0 if latency is None else min(1.0, latency / max(_REWARDS_TARGET, 0.001))
+    return _CHUNK_PAUSE * ratio
+
+def _rewards_bisect(c, chunk: List[str], out: Dict[str, int], failed: List[str]) -> None:
+    """Делим пополам чанк, упавший из-за содержимого (revert, лимит размера/газа), чтобы найти «плохие» peers.
+
+    Делится только такая ошибка: транспортные сбои, таймауты, 5xx и 429 делением не обойти —
+    тогда все ещё не прочитанные peers чанка сразу отмечаются неудачными. Не больше
+    _BISECT_MAX_CALLS вызовов на чанк, между вызовами — та же пауза, что между чанками.
+    """
+    mid = len(chunk) // 2
+    pending = [chunk[mid:], chunk[:mid]]  # стек: первая половина — первой
+    calls = 0
+    latency: float | None = None
+    while pending:
+        part = pending.pop()
+        if calls >= _BISECT_MAX_CALLS:
+            log.warning("[GSWARM-mini] getTotalRewards bisect: budget of %d calls exhausted", _BISECT_MAX_CALLS)
+            failed.extend(part)
+            for rest in reversed(pending):
+                failed.extend(rest)
+            return
+        pause = _chunk_pause(latency)
+        if pause > 0:
+            time.sleep(pause)
+        calls += 1
+        t0 = time.monotonic()
         try:
-            vals = _call_with_retry(c.functions.getTotalRewards(chunk).call,
-                                    f"getTotalRewards[{i}:{i+len(chunk)}]")
-            out.update({p: int(v) for p, v in zip(chunk, vals)})
-            log.info("[GSWARM-mini] getTotalRewards chunk ok: %d peers (offset %d)", len(chunk), i)
+            out.update(_rewards_call(c, part, f"getTotalRewards[bisect {len(part)}]"))
+            latency = time.monotonic() - t0
+        except Exception as e:
+            latency = None
+            if not _is_permanent(e) or _is_rate_limited(e):
+                # дело не в составе чанка — делить дальше бессмысленно
+                failed.extend(part)
+                for rest in reversed(pending):
+                    failed.extend(rest)
+                return
+            if len(part) == 1:
+                failed.append(part[0])
+                continue
+            m = len(part) // 2
+            pending += [part[m:], part[:m]]
+
+def _iter_rewards_chunks(c, peers: List[str]) -> Iterator[Tuple[List[str], Dict[str, int]]]:
+    """getTotalRewards чанками адаптивного размера; отдаёт (чанк, значения) по мере готовности.
+
+    peers чанка, которые не удалось получить даже поодиночке, в значения не попадают
+    (а не получают 0 всем чанком).
+    """
+    if not peers:
+        return
+    sizes = _load_chunk_sizes()
+    endpoint = _endpoint_of(c)
+    cap = max(1, _REWARDS_CHUNK_MAX)
+    size = min(cap, max(1, sizes.get(endpoint, _REWARDS_CHUNK)))
+    start_size = size
+    failed: List[str] = []
+    i = 0
+    while i < len(peers):
+        chunk = peers[i:i+size]
+        vals: Dict[str, int] = {}
+        t0 = time.monotonic()
+        latency = None
+        try:
+            vals.update(_rewards_call(c, chunk, f"getTotalRewards[{i}:{i+len(chunk)}]"))
+            latency = time.monotonic() - t0
+            log.info("[GSWARM-mini] getTotalRewards chunk ok: %d peers (offset %d) in %.2fs",
+                     len(chunk), i, latency)
+            if latency > _REWARDS_TARGET:
+                size = max(1, size * 3 // 4)
+            elif len(chunk) == size:
+                size = min(cap, size + max(1, size // 4))
         except Exception as e:
             log.error("[GSWARM-mini] getTotalRewards chunk failed (%d peers @%d): %s", len(chunk), i, e)
-            for p in chunk:
-                out[p] = 0
-        if i + _REWARDS_CHUNK < len(peers) and _CHUNK_PAUSE > 0:
-            log.info("[GSWARM-mini] sleeping %.1fs between rewards chunks", _CHUNK_PAUSE)
-            time.sleep(_CHUNK_PAUSE)
+            if _is_rate_limited(e):
+                size = max(1, size // 2)
+                failed.extend(chunk)
+            elif _is_permanent(e) and len(chunk) > 1:
+                if _is_size_limit(e):
+                    size = max(1, len(chunk) // 2)
+                _rewards_bisect(c, chunk, vals, failed)
+            else:
+                # транспорт/таймаут/5xx (или один peer): делением не помочь — чанк целиком в failed
+                failed.extend(chunk)
+        i += len(chunk)
+        yield chunk, vals
+        if i < len(peers) and _CHUNK_PAUSE > 0:
+            pause = _chunk_pause(latency)
+            log.info("[GSWARM-mini] sleeping %.1fs between rewards chunks (next chunk=%d)", pause, size)
+            time.sleep(pause)
+    if failed:
+        log.warning("[GSWARM-mini] getTotalRewards: %d peers unresolved: %s", len(failed), ", ".join(failed[:10]))
+    if size != sizes.get(endpoint):
+        sizes[endpoint] = size
+        _save_chunk_sizes()
+        log.info("[GSWARM-mini] rewards chunk for %s: %d -> %d", endpoint, start_size, size)
+
+def _fetch_rewards_batch(c, peers: List[str]) -> Dict[str, int]:
+    out: Dict[str, int] = {}
+    for _, vals in _iter_rewards_chunks(c, peers):
+        out.update(vals)
     return out
 
 def _wins_votes_one(c, peer: str) -> Tuple[int, int]:
@@ -158,11 +529,15 @@ def _fetch_wins_votes_parallel(c, peers: List[str], max_workers: int = _MAX_WORK
             # микропаузка между постановкой задач
             if _PER_CALL_JITTER > 0:
                 time.sleep(_PER_CALL_JITTER)
-        for p, fut in zip(peers, as_completed({f: pid for pid, f in zip(peers, futs)})):
+        # результат привязываем к peer через сам future: as_completed отдаёт их
+        # в порядке завершения, а не постановки
+        owner = dict(zip(futs, peers))
+        for fut in as_completed(owner):
+            p = owner[fut]
             try:
                 w, v = fut.result()
             except Exception as e:
-                log.error("[GSWARM-mini] wins/votes future error: %s", e)
+                log.error("[GSWARM-mini] wins/votes future error for %s: %s", p, e)
                 w, v = 0, 0
             wins_map[p] = w
             votes_map[p] = v
@@ -173,7 +548,7 @@ def _fetch_wins_votes_parallel(c, peers: List[str], max_workers: int = _MAX_WORK
 def get_gswarm_basic_for_eoa(eoa: str) -> dict:
     w3 = _w3()
     c = _contract(w3)
-    peers = _fetch_peers(c, w3, eoa)
+    peers = refresh_eoa_peers([eoa]).get(eoa.strip().lower(), [])
     rewards_map = _fetch_rewards_batch(c, peers)
     # enforce single-thread wins/votes by default (can override via GSWARM_MAX_WORKERS)
     _mw = int(os.environ.get("GSWARM_MAX_WORKERS", "1"))
@@ -192,38 +567,150 @@ def get_gswarm_basic_for_eoa(eoa: str) -> dict:
              eoa, totals["wins"], totals["rewards"], totals["votes"], len(peers))
     return {"peers": items, "totals": totals, "total_nodes": len(peers)}
 
-# ===== совместимость с app.py =====
-def run_once(include_nodes: bool = False, send: bool = False, send_telegram: bool = False, **kwargs):
-    _ = (include_nodes, send, send_telegram)
+# ===== потоковый проход =====
+def _iter_peer_results(peers: List[str], reuse_since: float | None, max_workers: int) -> Iterator[Tuple[str, Dict[str, int], bool]]:
+    """(peer, {"wins", "rewards"}, rewards_ok) по мере готовности обоих значений.
+
+    wins/votes считаются пулом воркеров, rewards — чанками в отдельном потоке; события
+    сходятся в очередь и привязаны к peer явно, поэтому max_workers можно поднимать.
+    Уже опрошенное в этом цикле (reuse_since) берётся из снимка и отдаётся сразу.
+    """
+    wins_map = _reuse_results(peers, 0, reuse_since)
+    rewards_map = _reuse_results(peers, 2, reuse_since)
+    wins_todo = [p for p in peers if p not in wins_map]
+    rewards_todo = [p for p in peers if p not in rewards_map]
+    if len(wins_todo) < len(peers) or len(rewards_todo) < len(peers):
+        log.info("[GSWARM-mini] reused from this cycle: wins=%d, rewards=%d",
+                 len(peers) - len(wins_todo), len(peers) - len(rewards_todo))
+    rewards_failed: set = set()
+    rewards_pending = set(rewards_todo)
+    remaining = set(peers)
+
+    def ready(pid: str):
+        if pid in remaining and pid in wins_map and pid not in rewards_pending:
+            remaining.discard(pid)
+            ok = pid not in rewards_failed
+            data = {"wins": int(wins_map[pid] or 0)}
+            # rewards не получены — ключа нет, потребитель оставляет прежнее значение, а не 0
+            if ok:
+                data["rewards"] = int(rewards_map.get(pid, 0) or 0)
+            return pid, data, ok
+        return None
+
+    for pid in peers:
+        item = ready(pid)
+        if item:
+            yield item
+    if not remaining:
+        return
+
+    c = _contract(_w3())
+    events: "queue.Queue[tuple]" = queue.Queue()
+
+    def rewards_worker() -> None:
+        try:
+            for chunk, vals in _iter_rewards_chunks(c, rewards_todo):
+                events.put(("rewards", chunk, vals))
+                if stop.is_set():
+                    return
+        except Exception as e:
+            events.put(("error", e))
+        finally:
+            events.put(("rewards_done",))
+
+    def on_wins(pid: str, fut) -> None:
+        if fut.cancelled():
+            return
+        try:
+            wins = fut.result()[0]
+        except Exception as e:
+            log.error("[GSWARM-mini] wins/votes future error for %s: %s", pid, e)
+            wins = 0
+        events.put(("wins", pid, wins))
+
+    ex = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="gswarm-wins")
+    stop = threading.Event()
+
+    def submit_wins() -> None:
+        for pid in wins_todo:
+            if stop.is_set():
+                return
+            try:
+                fut = ex.submit(_wins_votes_one, c, pid)
+            except RuntimeError:  # пул уже закрыт — потребитель ушёл
+                return
+            fut.add_done_callback(lambda f, pid=pid: on_wins(pid, f))
+            # микропаузка между постановкой задач
+            if _PER_CALL_JITTER > 0:
+                time.sleep(_PER_CALL_JITTER)
+
+    log.info("[GSWARM-mini] streaming peers=%d: wins=%d (workers=%d), rewards=%d",
+             len(peers), len(wins_todo), max_workers, len(rewards_todo))
+    last_save = time.monotonic()
+    try:
+        if rewards_todo:
+            threading.Thread(target=rewards_worker, name="gswarm-rewards", daemon=True).start()
+        if wins_todo:
+            threading.Thread(target=submit_wins, name="gswarm-submit", daemon=True).start()
+        while remaining:
+            ev = events.get()
+            if ev[0] == "wins":
+                _, pid, wins = ev
+                wins_map[pid] = wins
+                _record_results({pid: wins}, 0)
+                touched = [pid]
+            elif ev[0] == "rewards":
+                _, chunk, vals = ev
+                rewards_map.update(vals)
+                _record_results(vals, 2)
+                rewards_failed.update(p for p in chunk if p not in vals)
+                rewards_pending.difference_update(chunk)
+                touched = chunk
+            elif ev[0] == "rewards_done":
+                # чанки кончились раньше, чем все peers получили значение — считаем их неудачными
+                rewards_failed.update(rewards_pending)
+                touched, rewards_pending = list(rewards_pending), set()
+            else:
+                raise ev[1]
+            for pid in touched:
+                item = ready(pid)
+                if item:
+                    yield item
+            if time.monotonic() - last_save >= _STATE_SAVE_EVERY:
+                save_state()
+                last_save = time.monotonic()
+    finally:
+        stop.set()
+        ex.shutdown(wait=False, cancel_futures=True)
+        save_state()
+
+def iter_run(**kwargs) -> Iterator[tuple]:
+    """Потоковая версия run_once. События:
+
+    ("start", {"ts", "eoa_peers", "peers"}) — один раз, после разрешения EOA→peers;
+    ("peer", peer_id, {"wins", "rewards"}, rewards_ok) — по мере готовности каждого peer.
+    """
     ts = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
     extra_peer_ids: List[str] = list(dict.fromkeys((kwargs.get("extra_peer_ids") or [])))
     extra_eoas: List[str] = list(dict.fromkeys((kwargs.get("extra_eoas") or [])))
     offchain_peer_map: Dict | None = kwargs.get("offchain_peer_map") or {}
+    reuse_since: float | None = kwargs.get("reuse_since")  # начало цикла: опрошенное с тех пор не повторяем
 
-    log.info("[GSWARM-mini] run_once: start ts=%s", ts)
-    log.info("[GSWARM-mini] run_once: extra_eoas=%d, extra_peer_ids=%d, groups=%d",
+    log.info("[GSWARM-mini] run: start ts=%s", ts)
+    log.info("[GSWARM-mini] run: extra_eoas=%d, extra_peer_ids=%d, groups=%d",
              len(extra_eoas), len(extra_peer_ids), len(offchain_peer_map or {}))
 
     eoa_peers: Dict[str, List[str]] = {}
     all_peers: List[str] = []
 
-    # обрабатываем EOA последовательно, с паузой между ними
-    for idx, eoa in enumerate(extra_eoas, 1):
+    # peers по EOA — из кэша, промахи одним пакетным getPeerId
+    if extra_eoas:
         try:
-            basic = get_gswarm_basic_for_eoa(eoa)
+            eoa_peers = refresh_eoa_peers(extra_eoas)
         except Exception as e:
-            log.error("[GSWARM-mini] basic build failed for %s: %s", eoa, e)
-            basic = {"peers": [], "totals": {"wins": 0, "rewards": 0, "votes": 0}}
-        peers = [p["peer"] for p in basic.get("peers", []) if p.get("peer")]
-        eoa_norm = (eoa or "").strip().lower()
-        if eoa_norm:
-            eoa_peers[eoa_norm] = list(dict.fromkeys(peers))
-        all_peers.extend(peers)
-
-        # пауза между EOA
-        if idx < len(extra_eoas) and _EOA_PAUSE > 0:
-            log.info("[GSWARM-mini] pause between EOAs: sleeping %ds (idx=%d/%d)", _EOA_PAUSE, idx, len(extra_eoas))
-            time.sleep(_EOA_PAUSE)
+            log.error("[GSWARM-mini] EOA peers lookup failed: %s", e)
+        for peers in eoa_peers.values():
+            all_peers.extend(peers)
 
     if offchain_peer_map:
         for gkey, plist in offchain_peer_map.items():
@@ -245,43 +732,76 @@ def run_once(include_nodes: bool = False, send: bool = False, send_telegram: boo
         peers_unique.append(p)
 
     log.info("[GSWARM-mini] total unique peers to query: %d", len(peers_unique))
-
+    yield ("start", {"ts": ts, "eoa_peers": eoa_peers, "peers": len(peers_unique)})
     if not peers_unique:
-        out = {
-            "ok": True,
-            "ts": ts,
-            "per_peer": {},
-            "eoa_peers": eoa_peers,
-            "totals": {"wins": 0, "rewards": 0, "peers": 0},
-        }
-        log.info("[GSWARM-mini] run_once: nothing to query, done")
-        return out
-
-    # единичный проход по всем уникальным peers: wins/votes + rewards с чанкованием
-    w3 = _w3()
-    c = _contract(w3)
+        log.info("[GSWARM-mini] run: nothing to query, done")
+        return
 
     _mw = int(os.environ.get("GSWARM_MAX_WORKERS", "1"))
-    wins_map, _votes_map = _fetch_wins_votes_parallel(c, peers_unique, max_workers=_mw)
-    rewards_map = _fetch_rewards_batch(c, peers_unique)
-
-    per_peer: Dict[str, Dict] = {}
-    tot_wins = 0
-    tot_rewards = 0
-    for pid in peers_unique:
-        w = int(wins_map.get(pid, 0) or 0)
-        r = int(rewards_map.get(pid, 0) or 0)
-        per_peer[pid] = {"wins": w, "rewards": r}
-        tot_wins += w
-        tot_rewards += r
-
-    out = {
-        "ok": True,
-        "ts": ts,
-        "per_peer": per_peer,
-        "eoa_peers": eoa_peers,
-        "totals": {"wins": tot_wins, "rewards": tot_rewards, "peers": len(peers_unique)},
+    for pid, data, ok in _iter_peer_results(peers_unique, reuse_since, _mw):
+        yield ("peer", pid, data, ok)
+
+async def aiter_run(**kwargs) -> AsyncIterator[tuple]:
+    """iter_run в фоновом потоке: события приходят в event loop по мере готовности."""
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+    done = object()
+
+    def put(item) -> None:
+        try:
+            loop.call_soon_threadsafe(events.put_nowait, item)
+        except RuntimeError:  # loop уже закрыт
+            stop.set()
+
+    def produce() -> None:
+        gen = iter_run(**kwargs)
+        try:
+            for ev in gen:
+                if stop.is_set():
+                    break
+                put(ev)
+        except BaseException as e:
+            put(("error", e))
+        finally:
+            gen.close()
+            put(done)
+
+    loop.run_in_executor(None, produce)
+    try:
+        while True:
+            ev = await events.get()
+            if ev is done:
+                return
+            if ev[0] == "error":
+                raise ev[1]
+            yield ev
+    finally:
+        stop.set()
+
+# ===== совместимость с app.py =====
+def run_once(include_nodes: bool = False, send: bool = False, send_telegram: bool = False, **kwargs):
+    """Весь проход целиком (собирает iter_run): {"per_peer", "eoa_peers", "totals", ...}."""
+    _ = (include_nodes, send, send_telegram)
+    out: Dict[str, Any] = {"ok": True, "ts": None, "per_peer": {}, "eoa_peers": {}}
+    rewards_failed: List[str] = []
+    for ev in iter_run(**kwargs):
+        if ev[0] == "start":
+            out["ts"] = ev[1]["ts"]
+            out["eoa_peers"] = ev[1]["eoa_peers"]
+            continue
+        _, pid, data, ok = ev
+        out["per_peer"][pid] = data
+        if not ok:
+            rewards_failed.append(pid)
+    per_peer = out["per_peer"]
+    out["totals"] = {
+        "wins": sum(v["wins"] for v in per_peer.values()),
+        "rewards": sum(v.get("rewards", 0) for v in per_peer.values()),
+        "peers": len(per_peer),
     }
+    if rewards_failed:
+        out["rewards_failed"] = rewards_failed
     log.info("[GSWARM-mini] run_once: done peers=%d, total_wins=%s, total_rewards=%s",
-             len(peers_unique), tot_wins, tot_rewards)
+             len(per_peer), out["totals"]["wins"], out["totals"]["rewards"])
     return out
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# gswarm_offchain.py — async-клиент off-chain статистики (gswarm.dev) по tgid.
+#
+# Один запрос на группу tgid (а не на каждый peer), общий пул соединений httpx,
+# условные запросы (ETag / If-None-Match) и TTL-кэш ответов. Если сервис недоступен,
+# отдаём последний удачный ответ из кэша.
+
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote
+
+import httpx
+
+log = logging.getLogger("gensyn-monitor")
+
+# ===== ENV =====
+# Шаблон URL с плейсхолдером {tgid}; пусто = off-chain отключён
+_OFFCHAIN_URL = os.environ.get("GSWARM_OFFCHAIN_URL", "").strip()
+_OFFCHAIN_TTL = float(os.environ.get("GSWARM_OFFCHAIN_TTL_SEC", "300"))
+_OFFCHAIN_TIMEOUT = float(os.environ.get("GSWARM_OFFCHAIN_TIMEOUT_SEC", "10"))
+_OFFCHAIN_CONCURRENCY = int(os.environ.get("GSWARM_OFFCHAIN_CONCURRENCY", "4"))
+_OFFCHAIN_TOKEN = os.environ.get("GSWARM_OFFCHAIN_TOKEN", "").strip()
+
+_PEER_KEYS = ("peerId", "peer_id", "peer", "id")
+_LIST_KEYS = ("peers", "nodes", "data", "items", "results")
+_NUM_FIELDS = ("wins", "rewards", "votes", "rank")
+
+
+def _to_int(value: Any) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        try:
+            return int(float(value))
+        except (TypeError, ValueError):
+            return None
+
+
+def _peer_entry(item: Dict[str, Any]) -> Dict[str, int]:
+    out: Dict[str, int] = {}
+    for key in _NUM_FIELDS:
+        val = _to_int(item.get(key))
+        if val is not None:
+            out[key] = val
+    return out
+
+
+def parse_offchain(payload: Any) -> Dict[str, Dict[str, int]]:
+    """Нормализовать ответ в {peer_id: {wins, rewards, votes, rank}}.
+
+    Понимает список объектов, обёртку {"peers": [...]} (или nodes/data/items/results)
+    и словарь {peer_id: {...}}.
+    """
+    items: Any = payload
+    if isinstance(payload, dict):
+        for key in _LIST_KEYS:
+            if isinstance(payload.get(key), (list, dict)):
+                items = payload[key]
+                break
+    out: Dict[str, Dict[str, int]] = {}
+    if isinstance(items, dict):
+        for pid, item in items.items():
+            if isinstance(item, dict) and str(pid).strip():
+                out[str(pid).strip()] = _peer_entry(item)
+        return out
+    if isinstance(items, list):
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            pid = next((str(item[k]).strip() for k in _PEER_KEYS if item.get(k)), "")
+            if pid:
+                out[pid] = _peer_entry(item)
+    return out
+
+
+class OffchainClient:
+    """Off-chain статистика по группам tgid с пулом соединений и кэшем."""
+
+    def __init__(
+        self,
+        url_template: str = _OFFCHAIN_URL,
+        ttl: float = _OFFCHAIN_TTL,
+        timeout: float = _OFFCHAIN_TIMEOUT,
+        concurrency: int = _OFFCHAIN_CONCURRENCY,
+        token: str = _OFFCHAIN_TOKEN,
+    ):
+        self.url_template = url_template
+        self.ttl = ttl
+        self.timeout = timeout
+        self.token = token
+        self._sem = asyncio.Semaphore(max(1, concurrency))
+        self._client: Optional[httpx.AsyncClient] = None
+        # tgid -> {"ts": время проверки, "etag": str|None, "per_peer": {...}}
+        self._cache: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.url_template)
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None:
+            headers = {"Accept": "application/json"}
+            if self.token:
+                headers["Authorization"] = f"Bearer {self.token}"
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                headers=headers,
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def fetch_group(self, tgid: str) -> Dict[str, Dict[str, int]]:
+        cached = self._cache.get(tgid)
+        now = time.monotonic()
+        if cached and now - cached["ts"] < self.ttl:
+            return cached["per_peer"]
+
+        url = self.url_template.replace("{tgid}", quote(tgid, safe=""))
+        headers = {"If-None-Match": cached["etag"]} if cached and cached.get("etag") else {}
+        async with self._sem:
+            try:
+                resp = await self._http().get(url, headers=headers)
+            except httpx.HTTPError as exc:
+                log.warning("[GSWARM-offchain] tgid=%s request failed: %s", tgid, exc)
+                return cached["per_peer"] if cached else {}
+
+        if resp.status_code == 304 and cached:
+            cached["ts"] = now
+            log.info("[GSWARM-offchain] tgid=%s not modified (%d peers)", tgid, len(cached["per_peer"]))
+            return cached["per_peer"]
+        if resp.status_code != 200:
+            log.warning("[GSWARM-offchain] tgid=%s HTTP %s", tgid, resp.status_code)
+            return cached["per_peer"] if cached else {}
+        try:
+            per_peer = parse_offchain(resp.json())
+        except ValueError as exc:
+            log.warning("[GSWARM-offchain] tgid=%s bad JSON: %s", tgid, exc)
+            return cached["per_peer"] if cached else {}
+
+        self._cache[tgid] = {"ts": now, "etag": resp.headers.get("etag"), "per_peer": per_peer}
+        log.info("[GSWARM-offchain] tgid=%s fetched: %d peers", tgid, len(per_peer))
+        return per_peer
+
+    async def fetch_groups(self, groups: Dict[Optional[str], List[str]]) -> Dict[str, Dict[str, int]]:
+        """Один запрос на tgid; результат ограничен peers этой группы."""
+        if not self.enabled:
+            return {}
+        keys = [k for k in groups if k]
+        results = await asyncio.gather(*(self.fetch_group(k) for k in keys))
+        merged: Dict[str, Dict[str, int]] = {}
+        for key, per_peer in zip(keys, results):
+            wanted = set(groups.get(key) or [])
+            for pid, data in per_peer.items():
+                if wanted and pid not in wanted:
+                    continue
+                merged[pid] = data
+        return merged
+
+
+def merge_offchain(result: Dict[str, Any], offchain: Dict[str, Dict[str, int]]) -> Dict[str, Any]:
+    """Влить off-chain данные в per_peer результата run_once.
+
+    wins/rewards — максимум из on-chain и off-chain (on-chain при ошибках даёт 0),
+    rank берётся из off-chain; исходные off-chain значения — в per_peer[pid]["offchain"].
+    """
+    if not offchain:
+        return result
+    per_peer = result.setdefault("per_peer", {})
+    for pid, off in offchain.items():
+        entry = per_peer.get(pid)
+        onchain = entry is not None
+        entry = entry if onchain else {"wins": 0, "rewards": 0}
+        for key in ("wins", "rewards"):
+            if key in off:
+                entry[key] = max(int(entry.get(key, 0) or 0), off[key])
+        if off.get("rank"):
+            entry["rank"] = off["rank"]
+        entry["offchain"] = off
+        entry["src"] = "onchain+offchain" if onchain else "offchain"
+        per_peer[pid] = entry
+    totals = result.setdefault("totals", {})
+    totals["wins"] = sum(int(v.get("wins", 0) or 0) for v in per_peer.values())
+    totals["rewards"] = sum(int(v.get("rewards", 0) or 0) for v in per_peer.values())
+    totals["peers"] = len(per_peer)
+    return result
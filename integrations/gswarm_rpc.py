@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# gswarm_rpc.py — минимальный eth_call к SwarmCoordinator без web3.
+#
+# Селекторы посчитаны заранее (первые 4 байта keccak256 сигнатуры), ABI-кодек
+# покрывает ровно четыре функции из gswarm_checker._ABI. Интерфейс повторяет
+# web3-контракт в том объёме, который нужен чекеру: c.functions.<fn>(arg).call().
+
+import itertools
+from typing import Any, Callable, Dict, List
+
+import httpx
+
+SELECTORS: Dict[str, str] = {
+    "getPeerId": "b894a469",          # getPeerId(address[]) -> string[][]
+    "getTotalWins": "099c4002",       # getTotalWins(string) -> uint256
+    "getVoterVoteCount": "dfb3c7df",  # getVoterVoteCount(string) -> uint256
+    "getTotalRewards": "80c3d97f",    # getTotalRewards(string[]) -> int256[]
+}
+
+_WORD = 32
+_MOD = 1 << 256
+
+
+class RpcError(RuntimeError):
+    """Ошибка JSON-RPC/HTTP; текст содержит код, по нему чекер узнаёт 429 и лимиты размера."""
+
+
+# ===== кодирование аргументов =====
+def _word(n: int) -> bytes:
+    return (n % _MOD).to_bytes(_WORD, "big")
+
+def _pad(b: bytes) -> bytes:
+    return b + b"\0" * (-len(b) % _WORD)
+
+def _enc_string(s: str) -> bytes:
+    raw = s.encode("utf-8")
+    return _word(len(raw)) + _pad(raw)
+
+def _enc_address(addr: str) -> bytes:
+    h = addr[2:] if addr[:2].lower() == "0x" else addr
+    if len(h) != 40:
+        raise ValueError(f"bad address: {addr!r}")
+    return bytes(12) + bytes.fromhex(h)
+
+def _enc_array(items: List[bytes], dynamic: bool) -> bytes:
+    if not dynamic:
+        return _word(len(items)) + b"".join(items)
+    # элементы динамические: сначала смещения (от начала области элементов), потом данные
+    heads, tail = [], b""
+    for it in items:
+        heads.append(_word(_WORD * len(items) + len(tail)))
+        tail += it
+    return _word(len(items)) + b"".join(heads) + tail
+
+def encode_call(fn: str, arg: Any) -> str:
+    """calldata для вызова fn с единственным (динамическим) аргументом."""
+    if fn == "getPeerId":
+        body = _enc_array([_enc_address(a) for a in arg], dynamic=False)
+    elif fn in ("getTotalWins", "getVoterVoteCount"):
+        body = _enc_string(arg)
+    elif fn == "getTotalRewards":
+        body = _enc_array([_enc_string(s) for s in arg], dynamic=True)
+    else:
+        raise ValueError(f"unsupported function: {fn}")
+    # один динамический аргумент: в голове только смещение его данных
+    return "0x" + SELECTORS[fn] + (_word(_WORD) + body).hex()
+
+
+# ===== декодирование результата =====
+def _uint(data: bytes, pos: int) -> int:
+    if pos + _WORD > len(data):
+        raise RpcError(f"ABI decode: short result ({len(data)} bytes)")
+    return int.from_bytes(data[pos:pos + _WORD], "big")
+
+def _int(data: bytes, pos: int) -> int:
+    v = _uint(data, pos)
+    return v - _MOD if v >> 255 else v
+
+def _string(data: bytes, pos: int) -> str:
+    n = _uint(data, pos)
+    return data[pos + _WORD:pos + _WORD + n].decode("utf-8", "replace")
+
+def _array(data: bytes, pos: int, item: Callable[[bytes, int, int], Any]) -> List[Any]:
+    """Массив по адресу pos (слово длины); item(data, base, i) читает i-й элемент."""
+    n = _uint(data, pos)
+    base = pos + _WORD
+    return [item(data, base, i) for i in range(n)]
+
+def _dyn(read: Callable[[bytes, int], Any]) -> Callable[[bytes, int, int], Any]:
+    # элемент динамического типа: в слоте i лежит смещение от base
+    return lambda data, base, i: read(data, base + _uint(data, base + _WORD * i))
+
+def decode_result(fn: str, result: str) -> Any:
+    data = bytes.fromhex(result[2:] if result[:2] == "0x" else result)
+    if not data:
+        raise RpcError(f"{fn}: empty eth_call result (no contract at address or revert)")
+    if fn in ("getTotalWins", "getVoterVoteCount"):
+        return _uint(data, 0)
+    start = _uint(data, 0)
+    if fn == "getTotalRewards":
+        return _array(data, start, lambda d, base, i: _int(d, base + _WORD * i))
+    if fn == "getPeerId":
+        return _array(data, start, _dyn(lambda d, pos: _array(d, pos, _dyn(_string))))
+    raise ValueError(f"unsupported function: {fn}")
+
+
+# ===== транспорт =====
+class RawRpc:
+    """JSON-RPC поверх одного httpx.Client (пул соединений общий для воркеров)."""
+
+    def __init__(self, url: str, timeout: float = 15) -> None:
+        self.endpoint_uri = url
+        self._http = httpx.Client(timeout=timeout)
+        self._ids = itertools.count(1)
+
+    def request(self, method: str, params: List[Any]) -> Any:
+        payload = {"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": params}
+        try:
+            resp = self._http.post(self.endpoint_uri, json=payload)
+        except httpx.HTTPError as e:
+            raise RpcError(f"{method}: {type(e).__name__}: {e}") from e
+        if resp.status_code >= 400:
+            raise RpcError(f"{method}: HTTP {resp.status_code} {resp.reason_phrase}")
+        data = resp.json()
+        err = data.get("error") if isinstance(data, dict) else None
+        if err:
+            raise RpcError(f"{method}: RPC error {err.get('code')}: {err.get('message')}")
+        return data.get("result")
+
+    def is_connected(self) -> bool:
+        try:
+            return bool(self.request("eth_chainId", []))
+        except RpcError:
+            return False
+
+    def eth_call(self, to: str, data: str) -> str:
+        return self.request("eth_call", [{"to": to, "data": data}, "latest"])
+
+
+class _Call:
+    __slots__ = ("_rpc", "_to", "_fn", "_arg")
+
+    def __init__(self, rpc: RawRpc, to: str, fn: str, arg: Any) -> None:
+        self._rpc, self._to, self._fn, self._arg = rpc, to, fn, arg
+
+    def call(self) -> Any:
+        return decode_result(self._fn, self._rpc.eth_call(self._to, encode_call(self._fn, self._arg)))
+
+
+class _Functions:
+    def __init__(self, rpc: RawRpc, to: str) -> None:
+        self._rpc, self._to = rpc, to
+
+    def __getattr__(self, fn: str) -> Callable[[Any], _Call]:
+        if fn not in SELECTORS:
+            raise AttributeError(fn)
+        return lambda arg: _Call(self._rpc, self._to, fn, arg)
+
+
+class Coordinator:
+    """SwarmCoordinator по адресу на RawRpc: c.functions.getTotalWins(peer).call()."""
+
+    def __init__(self, rpc: RawRpc, address: str) -> None:
+        self.endpoint_uri = rpc.endpoint_uri
+        self.functions = _Functions(rpc, address)
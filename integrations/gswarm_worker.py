@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# gswarm_worker.py — отдельный процесс для RPC-работы G-Swarm.
+#
+# Чекер (ABI, ретраи, чанки, логирование) живёт в дочернем процессе и не делит GIL
+# с обработкой heartbeat и сборкой JSON дашборда. Связь — через multiprocessing.Pipe:
+# API шлёт (rid, функция, args, kwargs), воркер отвечает сообщениями (rid, kind, value).
+# Каждая команда выполняется в своём потоке воркера, так что длинный проход refresh не
+# задерживает фоновый проход EOA→peers или сохранение курсора. Сохраняет результаты
+# в БД по-прежнему API-процесс. Упавший воркер перезапускается с нарастающей паузой.
+
+import os
+import time
+import signal
+import asyncio
+import itertools
+import logging
+import threading
+import multiprocessing as mp
+from typing import Any, AsyncIterator, Dict
+
+log = logging.getLogger("gensyn-monitor")
+
+# функции чекера, которые API может вызвать в воркере
+_CALLS = ("run_once", "refresh_eoa_peers", "note_reported_peers", "load_state", "save_state")
+
+
+class WorkerError(RuntimeError):
+    """Ошибка команды в воркере или сам воркер недоступен/упал."""
+
+
+# ===== дочерний процесс =====
+def _serve(conn) -> None:
+    # Ctrl+C получает вся группа процессов — воркер останавливает родитель (terminate / EOF)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
+    from integrations import gswarm_checker as checker
+
+    send_lock = threading.Lock()
+    stops: Dict[int, threading.Event] = {}
+
+    def send(msg) -> None:
+        with send_lock:
+            conn.send(msg)
+
+    def handle(rid: int, name: str, args: tuple, kwargs: dict) -> None:
+        try:
+            if name == "iter_run":
+                stop = stops[rid]
+                for ev in checker.iter_run(**kwargs):
+                    if stop.is_set():
+                        break
+                    send((rid, "event", ev))
+                send((rid, "done", None))
+            else:
+                send((rid, "done", getattr(checker, name)(*args, **kwargs)))
+        except Exception as e:
+            log.exception("[GSWARM-worker] %s failed", name)
+            send((rid, "error", f"{type(e).__name__}: {e}"))
+        finally:
+            if name == "iter_run":
+                stops.pop(rid, None)
+
+    # снимок читает только тот процесс, где живёт состояние чекера; API получает курсор
+    # вызовом load_state, который файл уже не перечитывает
+    checker.load_state()
+    log.info("[GSWARM-worker] started pid=%d", os.getpid())
+    while True:
+        try:
+            rid, name, args, kwargs = conn.recv()
+        except (EOFError, OSError):
+            break  # API-процесс закрыл канал или умер
+        if name == "cancel":
+            stop = stops.get(rid)
+            if stop is not None:
+                stop.set()
+            continue
+        if name != "iter_run" and name not in _CALLS:
+            send((rid, "error", f"unknown call: {name}"))
+            continue
+        if name == "iter_run":  # остановка нужна только потоковому проходу
+            stops[rid] = threading.Event()
+        threading.Thread(target=handle, args=(rid, name, args, kwargs), name=f"gswarm-{name}", daemon=True).start()
+    log.info("[GSWARM-worker] channel closed, exiting")
+
+
+# ===== сторона API =====
+class RefreshWorker:
+    """Супервизор воркера: запуск, перезапуск после падения, async-вызовы команд."""
+
+    def __init__(self, restart_delay: float = 5.0, restart_delay_max: float = 300.0) -> None:
+        self.restart_delay = max(0.1, restart_delay)
+        self.restart_delay_max = max(self.restart_delay, restart_delay_max)
+        self.restarts = 0
+        self._delay = self.restart_delay
+        self._proc = None
+        self._conn = None
+        self._started_at = 0.0
+        self._closed = False
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, asyncio.Queue] = {}
+
+    @property
+    def alive(self) -> bool:
+        return self._proc is not None and self._proc.is_alive() and self._conn is not None
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._spawn()
+
+    def _spawn(self) -> None:
+        # spawn, а не fork: у API-процесса уже есть потоки и event loop
+        ctx = mp.get_context("spawn")
+        parent, child = ctx.Pipe()
+        proc = ctx.Process(target=_serve, args=(child,), name="gswarm-worker", daemon=True)
+        proc.start()
+        child.close()
+        self._proc, self._conn, self._started_at = proc, parent, time.monotonic()
+        threading.Thread(target=self._read, args=(proc, parent), name="gswarm-worker-reader", daemon=True).start()
+
+    def _read(self, proc, conn) -> None:
+        loop = self._loop
+        while True:
+            try:
+                msg = conn.recv()
+            except (EOFError, OSError):
+                break
+            loop.call_soon_threadsafe(self._dispatch, msg)
+        proc.join(timeout=5)
+        try:
+            loop.call_soon_threadsafe(self._on_exit, proc)
+        except RuntimeError:  # loop уже закрыт — процесс завершается
+            pass
+
+    def _dispatch(self, msg) -> None:
+        rid, kind, value = msg
+        q = self._pending.get(rid)
+        if q is not None:  # нет получателя — команду отменили, хвост событий выбрасываем
+            q.put_nowait((kind, value))
+
+    def _on_exit(self, proc) -> None:
+        if proc is not self._proc:
+            return
+        self._conn = None
+        for q in self._pending.values():
+            q.put_nowait(("error", f"worker exited (code {proc.exitcode})"))
+        if self._closed:
+            return
+        # быстро упавший воркер перезапускаем всё реже, проживший долго — сразу с базовой паузой
+        if time.monotonic() - self._started_at > 60:
+            self._delay = self.restart_delay
+        log.error("[GSWARM-worker] exited with code %s, restarting in %.0fs", proc.exitcode, self._delay)
+        self._loop.call_later(self._delay, self._restart)
+        self._delay = min(self._delay * 2, self.restart_delay_max)
+
+    def _restart(self) -> None:
+        if self._closed or self.alive:
+            return
+        self.restarts += 1
+        self._spawn()
+
+    def _send(self, rid: int, name: str, args: tuple = (), kwargs: dict | None = None) -> None:
+        if not self.alive:
+            raise WorkerError("G-Swarm worker is not running")
+        try:
+            self._conn.send((rid, name, args, kwargs or {}))
+        except (OSError, ValueError) as e:
+            raise WorkerError(f"G-Swarm worker channel failed: {e}") from e
+
+    async def call(self, name: str, *args, **kwargs) -> Any:
+        """Вызвать функцию чекера в воркере и дождаться результата."""
+        rid = next(self._ids)
+        q = self._pending[rid] = asyncio.Queue()
+        try:
+            self._send(rid, name, args, kwargs)
+            kind, value = await q.get()
+        finally:
+            self._pending.pop(rid, None)
+        if kind == "error":
+            raise WorkerError(f"{name}: {value}")
+        return value
+
+    def notify(self, name: str, *args) -> None:
+        """Вызов без ожидания ответа; если воркер недоступен — молча пропускается."""
+        try:
+            self._send(next(self._ids), name, args)
+        except WorkerError:
+            pass
+
+    async def aiter_run(self, **kwargs) -> AsyncIterator[tuple]:
+        """Аналог gswarm_checker.aiter_run: события прохода приходят из воркера."""
+        rid = next(self._ids)
+        q = self._pending[rid] = asyncio.Queue()
+        finished = False
+        try:
+            self._send(rid, "iter_run", (), kwargs)
+            while True:
+                kind, value = await q.get()
+                if kind == "event":
+                    yield value
+                    continue
+                finished = True
+                if kind == "error":
+                    raise WorkerError(f"iter_run: {value}")
+                return
+        finally:
+            self._pending.pop(rid, None)
+            if not finished:
+                try:
+                    self._send(rid, "cancel")
+                except WorkerError:
+                    pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "alive": self.alive,
+            "pid": self._proc.pid if self._proc is not None else None,
+            "restarts": self.restarts,
+            "pending": len(self._pending),
+        }
+
+    async def close(self) -> None:
+        self._closed = True
+        proc, conn = self._proc, self._conn
+        self._conn = None
+        if conn is not None:
+            conn.close()  # воркер получит EOF и выйдет сам
+        if proc is not None:
+            await asyncio.to_thread(proc.join, 5)
+            if proc.is_alive():
+                proc.terminate()
@@ -0,0 +1,62 @@
+import os
+import sys
+
+# app читает конфиг при импорте: фоновые циклы, воркер и файлы снимков чекера выключены
+for _k, _v in (("TELEGRAM_BOT_TOKEN", "test"), ("TELEGRAM_CHAT_ID", "1"), ("SHARED_SECRET", "secret")):
+    os.environ.setdefault(_k, _v)
+os.environ.setdefault("DB_PATH", os.path.join(os.path.dirname(__file__), ".unused.db"))
+os.environ.update(
+    GSWARM_REFRESH_INTERVAL="0",
+    GSWARM_EOA_REFRESH_INTERVAL="0",
+    GSWARM_WORKER="0",
+    GSWARM_STATE_FILE="",
+    GSWARM_EOA_CACHE_FILE="",
+    GSWARM_CHUNK_STATE_FILE="",
+    GSWARM_CHUNK_PAUSE_SEC="0",
+    GSWARM_PER_CALL_JITTER_SEC="0",
+    LOOP_LAG_WARN_MS="0",
+    LOG_LEVEL="WARNING",
+)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+
+import httpx
+import pytest
+
+
+@pytest.fixture
+def app_db(tmp_path, monkeypatch):
+    """app с чистой БД и свежими in-memory индексами."""
+    import app
+
+    monkeypatch.setattr(app, "DB", str(tmp_path / "monitor.db"))
+    monkeypatch.setattr(app, "PEER_INDEX", app.PeerNodeIndex())
+    monkeypatch.setattr(app, "RANK_INDEX", app.RankIndex())
+    monkeypatch.setattr(app, "_HB_VISIBLE", {})
+    monkeypatch.setattr(app, "FLEET", app.FleetSummary())
+    monkeypatch.setattr(app, "_REMEDIATION", {})
+    # примитивы asyncio привязываются к loop первого asyncio.run — у каждого теста свои
+    monkeypatch.setattr(app, "_PROFILE_LOCK", asyncio.Lock())
+    monkeypatch.setattr(app, "_REFRESH_LOCK", asyncio.Lock())
+    monkeypatch.setattr(app, "_REFRESH_WAKE", asyncio.Event())
+    monkeypatch.setattr(app, "_REFRESH_WAITERS", [])
+    monkeypatch.setattr(app, "_REFRESH_LOOP_RUNNING", False)
+    app.bump_nodes_version()  # ответы /api/nodes от прошлой БД
+    asyncio.run(app.init_db())
+    return app
+
+
+@pytest.fixture
+def api(app_db):
+    """Прогнать async-сценарий с httpx-клиентом поверх ASGI-приложения: api(scenario).
+
+    scenario(client) — корутина-функция; api возвращает её результат.
+    """
+    def run(scenario):
+        async def go():
+            transport = httpx.ASGITransport(app=app_db.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await scenario(client)
+        return asyncio.run(go())
+    return run
@@ -0,0 +1,26 @@
+def _post(api, params):
+    return api(lambda client: client.post("/api/admin/profile", params=params, headers={"Authorization": "Bearer adm"}))
+
+
+def test_refresh_target_rejects_seconds(app_db, api, monkeypatch):
+    app = app_db
+    monkeypatch.setattr(app, "ADMIN_TOKEN", "adm")
+    calls = []
+
+    async def fake_refresh():
+        calls.append(1)
+
+    monkeypatch.setattr(app, "refresh_gswarm_stats", fake_refresh)
+    resp = _post(api, {"target": "refresh", "seconds": 30})
+    assert resp.status_code == 400 and not calls
+    resp = _post(api, {"target": "refresh", "mode": "cprofile"})
+    assert resp.status_code == 200 and calls == [1]
+    assert resp.json()["target"] == "refresh"
+
+
+def test_time_target_honours_seconds(app_db, api, monkeypatch):
+    app = app_db
+    monkeypatch.setattr(app, "ADMIN_TOKEN", "adm")
+    resp = _post(api, {"seconds": 0.2})
+    assert resp.status_code == 200
+    assert 0.2 <= resp.json()["elapsed_sec"] < 2
@@ -0,0 +1,200 @@
+import asyncio
+import gzip
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _triggers(app):
+    async def go():
+        async with app.aiosqlite.connect(app.DB) as db:
+            rows = await db.execute_fetchall("SELECT name FROM sqlite_master WHERE type='trigger' AND name LIKE 'trg_nodes_ver_%'")
+        return {r[0] for r in rows}
+    return asyncio.run(go())
+
+
+def test_triggers_only_on_regional(app_db, monkeypatch):
+    app = app_db
+    assert _triggers(app) == set()
+
+    async def versions():
+        async with app.aiosqlite.connect(app.DB) as db:
+            rows = await db.execute_fetchall("SELECT row_version FROM nodes")
+            head = await db.execute_fetchall("SELECT v FROM fed_seq")
+        return [r[0] for r in rows], head[0][0]
+
+    async def add_node():
+        async with app.aiosqlite.connect(app.DB) as db:
+            await db.execute("INSERT INTO nodes(node_id, last_seen, row_version) VALUES ('n1', 1, 3)")
+            await db.commit()
+
+    asyncio.run(add_node())
+    _, head = asyncio.run(versions())
+
+    # включили regional: правки без триггеров мимо счётчика — строки переверсионируются
+    monkeypatch.setattr(app, "FEDERATION_ROLE", "regional")
+    asyncio.run(app.init_db())
+    assert _triggers(app) == set(app._FED_TRIGGERS)
+    rows, new_head = asyncio.run(versions())
+    assert rows[0] > head and new_head >= rows[0]
+
+    monkeypatch.setattr(app, "FEDERATION_ROLE", "")
+    asyncio.run(app.init_db())
+    assert _triggers(app) == set()
+
+
+def _serve(tmp_path, name, port, **env):
+    full = dict(
+        os.environ,
+        DB_PATH=str(tmp_path / f"{name}.db"),
+        FEDERATION_TOKEN="fed-token",
+        FEDERATION_PUSH_INTERVAL="1",
+        **env,
+    )
+    log = open(tmp_path / f"{name}.log", "w")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=ROOT, env=full, stdout=log, stderr=subprocess.STDOUT,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 20
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{url}/api/nodes", timeout=1).status_code == 200:
+                return proc, url
+        except httpx.HTTPError:
+            pass
+        if proc.poll() is not None:
+            break
+        time.sleep(0.2)
+    proc.kill()
+    pytest.fail(f"{name} did not start:\n" + (tmp_path / f"{name}.log").read_text())
+
+
+def _wait_for(fn, timeout=15):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        value = fn()
+        if value:
+            return value
+        time.sleep(0.3)
+    return None
+
+
+def test_regional_pushes_to_central(tmp_path):
+    """Два локальных процесса: heartbeat на regional появляется на central, удаление — тоже."""
+    c_port, r_port = _free_port(), _free_port()
+    central, c_url = _serve(tmp_path, "central", c_port, FEDERATION_ROLE="central")
+    regional = None
+    try:
+        regional, r_url = _serve(
+            tmp_path, "regional", r_port,
+            FEDERATION_ROLE="regional", FEDERATION_REGION="eu", FEDERATION_CENTRAL_URL=c_url, ADMIN_TOKEN="adm",
+        )
+        secret = os.environ["SHARED_SECRET"]
+        beat = {"node_id": "fed-1", "ip": "10.1.1.1", "status": "UP", "meta": "gpu"}
+        resp = httpx.post(f"{r_url}/api/heartbeat", json=beat, headers={"Authorization": f"Bearer {secret}"})
+        assert resp.status_code == 200, resp.text
+
+        def central_node():
+            items = httpx.get(f"{c_url}/api/nodes").json()
+            items = items.get("items", items) if isinstance(items, dict) else items
+            return next((n for n in items if n["node_id"] == "fed-1"), None)
+
+        node = _wait_for(central_node)
+        assert node is not None, (tmp_path / "regional.log").read_text()
+        assert node["ip"] == "10.1.1.1"
+
+        resp = httpx.post(f"{r_url}/api/admin/delete", json={"node_id": "fed-1"}, headers={"Authorization": "Bearer adm"})
+        assert resp.status_code == 200
+        assert _wait_for(lambda: central_node() is None) is not None
+    finally:
+        for proc in (regional, central):
+            if proc is not None:
+                proc.terminate()
+                proc.wait(timeout=10)
+
+
+def _push(app, api, body):
+    async def scenario(client):
+        return await client.post("/api/federation/push", json=body, headers={"Authorization": "Bearer fed"})
+    return api(scenario)
+
+
+def _row(node_id, **extra):
+    return {"node_id": node_id, "ip": "10.2.0.1", "last_seen": 1, "last_reported": "UP", **extra}
+
+
+def test_central_applies_deltas_and_rejects_cursor_mismatch(app_db, api, monkeypatch):
+    app = app_db
+    monkeypatch.setattr(app, "FEDERATION_ROLE", "central")
+    monkeypatch.setattr(app, "FEDERATION_TOKEN", "fed")
+    items = [{"v": 1, "row": _row("a")}, {"v": 2, "row": _row("b", meta="gpu")}]
+    resp = _push(app, api, {"region": "eu", "from": 0, "to": 2, "items": items})
+    assert resp.json() == {"ok": True, "cursor": 2, "applied": 2}
+
+    # пачка не с подтверждённого курсора: central отвечает своим курсором и ничего не применяет
+    resp = _push(app, api, {"region": "eu", "from": 5, "to": 6, "items": [{"v": 6, "deleted": "a"}]})
+    assert resp.status_code == 409 and resp.json()["cursor"] == 2
+
+    resp = _push(app, api, {"region": "eu", "from": 2, "to": 4, "items": [{"v": 3, "row": _row("b", meta="cpu")}, {"v": 4, "deleted": "a"}]})
+    assert resp.json()["cursor"] == 4
+    nodes = asyncio.run(app.list_nodes())
+    assert [(n["node_id"], n["meta"], n["region"]) for n in nodes] == [("b", "cpu", "eu")]
+    assert app.FLEET.snapshot()["tags"] == {"cpu": {"total": 1, "UP": 0, "DOWN": 1}}
+
+    # удаление чужого региона не трогает ноду
+    resp = _push(app, api, {"region": "us", "from": 0, "to": 1, "items": [{"v": 1, "deleted": "b"}]})
+    assert resp.status_code == 200
+    assert [n["node_id"] for n in asyncio.run(app.list_nodes())] == ["b"]
+
+
+def test_regional_pushes_only_newer_rows_and_follows_central_cursor(app_db, monkeypatch):
+    app = app_db
+    monkeypatch.setattr(app, "FEDERATION_ROLE", "regional")
+    monkeypatch.setattr(app, "FEDERATION_BATCH", 10)
+    asyncio.run(app.init_db())
+
+    async def add(*node_ids):
+        async with app.aiosqlite.connect(app.DB) as db:
+            for node_id in node_ids:
+                await db.execute("INSERT INTO nodes(node_id, ip, last_seen) VALUES (?, '10.0.0.1', 1)", (node_id,))
+            await db.commit()
+
+    asyncio.run(add("a", "b"))
+    head = asyncio.run(app._fed_head())
+    asyncio.run(add("c"))
+    pushed, answers = [], []
+
+    def handler(request):
+        body = json.loads(gzip.decompress(request.content))
+        pushed.append(body)
+        return answers.pop(0)
+
+    monkeypatch.setattr(app, "_fed_http", lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://central"))
+
+    answers.append(httpx.Response(200, json={"ok": True}))
+    cursor, more = asyncio.run(app.federation_push_once(head))
+    assert [it["row"]["node_id"] for it in pushed[-1]["items"]] == ["c"]
+    assert pushed[-1]["from"] == head and cursor == pushed[-1]["to"] and not more
+
+    # central подтвердил меньший курсор — продолжаем с него
+    answers.append(httpx.Response(409, json={"ok": False, "cursor": 1}))
+    assert asyncio.run(app.federation_push_once(head)) == (1, True)
+    # курсор central новее локальной БД — полный пересинк
+    answers.append(httpx.Response(409, json={"ok": False, "cursor": cursor + 100}))
+    assert asyncio.run(app.federation_push_once(1)) == (0, True)
@@ -0,0 +1,77 @@
+import random
+
+import app
+
+
+def _recount(nodes, now):
+    """Сводка полным проходом — то, что FleetSummary должна держать дельтами."""
+    status = {"UP": 0, "DOWN": 0}
+    tags, reasons = {}, {}
+    for meta, reported, last_seen in nodes.values():
+        node_tags, reason = app.parse_meta_tags(meta)
+        up = now - last_seen <= app.THRESHOLD and reported == "UP"
+        key = "UP" if up else "DOWN"
+        status[key] += 1
+        for tag in node_tags:
+            bucket = tags.setdefault(tag, {"total": 0, "UP": 0, "DOWN": 0})
+            bucket["total"] += 1
+            bucket[key] += 1
+        if not up:
+            why = (reason or "unspecified") if reported == "DOWN" else "no_heartbeat"
+            reasons[why] = reasons.get(why, 0) + 1
+    return {"total": len(nodes), "status": status, "tags": tags, "reasons": reasons}
+
+
+def test_deltas_match_full_recount():
+    rnd = random.Random(44)
+    fleet = app.FleetSummary()
+    nodes = {}
+    now = 1_000_000
+    metas = ["gpu", "gpu,fsn1", "cpu,reason=stale_log", "reason=oom", "", None]
+    for step in range(3000):
+        now += rnd.choice((0, 1, 7, app.THRESHOLD // 2))
+        node_id = f"n{rnd.randrange(40)}"
+        op = rnd.random()
+        if op < 0.7:
+            meta, reported = rnd.choice(metas), rnd.choice(("UP", "UP", "DOWN"))
+            last_seen = now - rnd.choice((0, 0, app.THRESHOLD + 5))
+            fleet.observe(node_id, meta, reported, last_seen, now)
+            nodes[node_id] = (meta, reported, last_seen)
+        elif op < 0.85:
+            fleet.drop(node_id)
+            nodes.pop(node_id, None)
+        else:
+            new_id = f"n{rnd.randrange(40)}"
+            if new_id in nodes or node_id not in nodes:
+                continue
+            fleet.rename(node_id, new_id, now)
+            nodes[new_id] = nodes.pop(node_id)
+        if step % 50 == 0:
+            snap = fleet.snapshot(now)
+            assert {k: snap[k] for k in ("total", "status", "tags", "reasons")} == _recount(nodes, now)
+
+
+def test_up_node_expires_to_no_heartbeat():
+    fleet = app.FleetSummary()
+    fleet.observe("n1", "gpu", "UP", 1000, now=1000)
+    fleet.observe("n1", "gpu", "UP", 1050, now=1050)   # свежий heartbeat отодвигает срок
+    assert fleet.snapshot(1000 + app.THRESHOLD + 1)["status"] == {"UP": 1, "DOWN": 0}
+    snap = fleet.snapshot(1050 + app.THRESHOLD + 1)
+    assert snap["status"] == {"UP": 0, "DOWN": 1}
+    assert snap["reasons"] == {"no_heartbeat": 1}
+    assert snap["tags"]["gpu"] == {"total": 1, "UP": 0, "DOWN": 1}
+
+
+def test_summary_endpoint_follows_heartbeats(app_db, api):
+    app = app_db
+
+    async def scenario(client):
+        auth = {"Authorization": f"Bearer {app.SHARED}"}
+        await client.post("/api/heartbeat", json={"node_id": "a", "status": "UP", "meta": "gpu,fsn1"}, headers=auth)
+        await client.post("/api/heartbeat", json={"node_id": "b", "status": "DOWN", "meta": "gpu,reason=stale_log"}, headers=auth)
+        return (await client.get("/api/summary")).json()
+
+    snap = api(scenario)
+    assert snap["total"] == 2 and snap["status"] == {"UP": 1, "DOWN": 1}
+    assert snap["tags"]["gpu"] == {"total": 2, "UP": 1, "DOWN": 1}
+    assert snap["reasons"] == {"stale_log": 1}
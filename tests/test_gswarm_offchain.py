@@ -0,0 +1,155 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from integrations import gswarm_offchain
+from integrations.gswarm_offchain import OffchainClient, merge_offchain
+
+
+class _MockOffchain(BaseHTTPRequestHandler):
+    """Мини-gswarm.dev: /group/<tgid> отдаёт peers группы с ETag и 304 на If-None-Match."""
+
+    groups = {}
+    etag = '"v1"'
+    status = 200
+    seen = []  # (path, If-None-Match, код ответа)
+
+    def do_GET(self):
+        tgid = self.path.rsplit("/", 1)[-1]
+        inm = self.headers.get("If-None-Match")
+        if self.status != 200:
+            code, body = self.status, b"{}"
+        elif inm == self.etag:
+            code, body = 304, b""
+        else:
+            code, body = 200, json.dumps({"peers": self.groups.get(tgid, [])}).encode()
+        self.seen.append((self.path, inm, code))
+        self.send_response(code)
+        if code in (200, 304):
+            self.send_header("ETag", self.etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    _MockOffchain.groups = {
+        "42": [{"peerId": "QmA", "wins": 7, "rewards": 50, "rank": 3}, {"peerId": "QmB", "wins": 1, "rewards": 900}],
+        "43": [{"peerId": "QmC", "wins": 2, "rewards": 2}],
+    }
+    _MockOffchain.etag, _MockOffchain.status, _MockOffchain.seen = '"v1"', 200, []
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _MockOffchain)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_port}/group/{{tgid}}"
+    srv.shutdown()
+    srv.server_close()
+
+
+def _fetch(client, *tgids):
+    async def go():
+        try:
+            return [await client.fetch_group(t) for t in tgids]
+        finally:
+            await client.aclose()
+    return asyncio.run(go())
+
+
+def test_etag_revalidation_returns_cached_body(server):
+    client = OffchainClient(url_template=server, ttl=0)
+    first, second = _fetch(client, "42", "42")
+    assert first == second == {"QmA": {"wins": 7, "rewards": 50, "rank": 3}, "QmB": {"wins": 1, "rewards": 900}}
+    assert [(inm, code) for _, inm, code in _MockOffchain.seen] == [(None, 200), ('"v1"', 304)]
+
+
+def test_changed_etag_refetches(server):
+    client = OffchainClient(url_template=server, ttl=0)
+
+    async def go():
+        try:
+            await client.fetch_group("42")
+            _MockOffchain.etag = '"v2"'
+            _MockOffchain.groups["42"] = [{"peerId": "QmA", "wins": 8}]
+            return await client.fetch_group("42")
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(go()) == {"QmA": {"wins": 8}}
+    assert [code for _, _, code in _MockOffchain.seen] == [200, 200]
+
+
+def test_ttl_skips_requests_until_expired(server, monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(gswarm_offchain.time, "monotonic", lambda: clock[0])
+    client = OffchainClient(url_template=server, ttl=60)
+
+    async def go():
+        try:
+            await client.fetch_group("42")
+            clock[0] = 159.0
+            await client.fetch_group("42")       # в пределах TTL — без запроса
+            clock[0] = 161.0
+            await client.fetch_group("42")       # TTL истёк — условный запрос, 304
+            clock[0] = 200.0
+            await client.fetch_group("42")       # 304 продлил TTL
+        finally:
+            await client.aclose()
+
+    asyncio.run(go())
+    assert [code for _, _, code in _MockOffchain.seen] == [200, 304]
+
+
+def test_server_error_keeps_last_good_answer(server):
+    client = OffchainClient(url_template=server, ttl=0)
+
+    async def go():
+        try:
+            good = await client.fetch_group("42")
+            _MockOffchain.status = 503
+            return good, await client.fetch_group("42"), await client.fetch_group("43")
+        finally:
+            await client.aclose()
+
+    good, after_error, never_fetched = asyncio.run(go())
+    assert after_error == good and never_fetched == {}
+
+
+def test_fetch_groups_one_request_per_tgid(server):
+    client = OffchainClient(url_template=server, ttl=60)
+
+    async def go():
+        try:
+            return await client.fetch_groups({"42": ["QmA"], "43": [], None: ["QmX"]})
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(go()) == {"QmA": {"wins": 7, "rewards": 50, "rank": 3}, "QmC": {"wins": 2, "rewards": 2}}
+    assert sorted(path for path, _, _ in _MockOffchain.seen) == ["/group/42", "/group/43"]
+
+
+def test_merge_takes_max_of_onchain_and_offchain():
+    result = {
+        "per_peer": {
+            "QmA": {"wins": 5, "rewards": 100},
+            "QmB": {"wins": 3},                # rewards не прочитались on-chain
+            "QmD": {"wins": 4, "rewards": 4},  # off-chain о нём не знает
+        },
+    }
+    offchain = {
+        "QmA": {"wins": 7, "rewards": 50, "rank": 3},
+        "QmB": {"wins": 1, "rewards": 900},
+        "QmC": {"wins": 2, "rewards": 2},
+    }
+    merged = merge_offchain(result, offchain)["per_peer"]
+    assert (merged["QmA"]["wins"], merged["QmA"]["rewards"], merged["QmA"]["rank"]) == (7, 100, 3)
+    assert (merged["QmB"]["wins"], merged["QmB"]["rewards"]) == (3, 900)
+    assert merged["QmC"]["src"] == "offchain" and merged["QmA"]["src"] == "onchain+offchain"
+    assert merged["QmA"]["offchain"] == offchain["QmA"]
+    assert merged["QmD"] == {"wins": 4, "rewards": 4}
+    assert result["totals"] == {"wins": 16, "rewards": 1006, "peers": 4}
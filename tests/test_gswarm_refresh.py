@@ -0,0 +1,158 @@
+import asyncio
+
+import pytest
+
+
+def test_manual_refresh_is_rejected_while_cycle_runs(app_db, monkeypatch):
+    app = app_db
+    monkeypatch.setattr(app, "ADMIN_TOKEN", "adm")
+    release = asyncio.Event()
+    calls = []
+
+    async def slow_refresh(resume=None, checkpoint=False):
+        calls.append(resume)
+        await release.wait()
+
+    monkeypatch.setattr(app, "refresh_gswarm_stats", slow_refresh)
+
+    async def go():
+        running = asyncio.ensure_future(app.run_gswarm_cycle())
+        await asyncio.sleep(0)
+        for call in (
+            app.admin_gswarm_refresh(authorization="Bearer adm"),
+            app.admin_profile(authorization="Bearer adm", seconds=None, mode="sampling", target="refresh", top=5),
+            app.run_gswarm_cycle(),
+        ):
+            with pytest.raises(app.HTTPException) as exc:
+                await call
+            assert exc.value.status_code == 409
+        release.set()
+        await running
+
+    asyncio.run(go())
+    assert calls == [None]
+
+
+def test_manual_refresh_wakes_the_loop_instead_of_running_its_own(app_db, monkeypatch):
+    app = app_db
+    monkeypatch.setattr(app, "GSWARM_REFRESH_INTERVAL", 3600)
+    calls = []
+
+    async def fake_refresh(resume=None, checkpoint=False):
+        calls.append(resume)
+        await asyncio.sleep(0.01)
+
+    monkeypatch.setattr(app, "refresh_gswarm_stats", fake_refresh)
+
+    async def go():
+        loop_task = asyncio.ensure_future(app.gswarm_loop())
+        await asyncio.sleep(0)
+        try:
+            # первый цикл не ждёт стартовой паузы, второй — интервала в час
+            await asyncio.wait_for(app.run_gswarm_cycle(), 2)
+            assert len(calls) == 1
+            await asyncio.wait_for(app.run_gswarm_cycle(), 2)
+            assert len(calls) == 2
+            # оба запроса, пришедшие до начала цикла, ждут один и тот же цикл
+            await asyncio.wait_for(asyncio.gather(app.run_gswarm_cycle(), app.run_gswarm_cycle()), 2)
+            assert len(calls) == 3
+        finally:
+            loop_task.cancel()
+
+    asyncio.run(go())
+
+
+@pytest.fixture
+def two_nodes(app_db, monkeypatch):
+    """refresh_gswarm_stats по двум нодам без RPC: записывает курсоры и пройденные ноды."""
+    app = app_db
+    configs = {"n1": {"peer_ids": ["QmA"]}, "n2": {"peer_ids": ["QmB"]}}
+    seen = {"checkpoints": [], "nodes": [], "reuse_since": []}
+
+    async def sources():
+        return [], {k: dict(v) for k, v in configs.items()}
+
+    async def stream(single_map, peer_groups, **kwargs):
+        seen["nodes"] += list(single_map)
+        seen["reuse_since"].append(kwargs["reuse_since"])
+        return {"per_peer": {}}, 0, 0
+
+    async def checkpoint(cursor):
+        seen["checkpoints"].append(cursor)
+
+    monkeypatch.setattr(app, "_gswarm_sources", sources)
+    monkeypatch.setattr(app, "_stream_gswarm_result", stream)
+    monkeypatch.setattr(app, "_checkpoint", checkpoint)
+    monkeypatch.setattr(app, "GSWARM_NODE_PAUSE_SEC", 0)
+    monkeypatch.setattr(app, "GSWARM_INCREMENTAL", True)
+    return app, seen
+
+
+def test_only_the_loop_cycle_writes_the_cursor(two_nodes):
+    app, seen = two_nodes
+    asyncio.run(app.refresh_gswarm_stats())
+    assert seen["nodes"] == ["n1", "n2"] and seen["checkpoints"] == []
+
+    asyncio.run(app.refresh_gswarm_stats(checkpoint=True))
+    cursors = seen["checkpoints"]
+    assert [c.get("after") for c in cursors] == ["n1", "n2", None]
+    assert "finished" in cursors[-1] and len({c["started"] for c in cursors}) == 1
+
+
+def test_resume_skips_done_nodes_and_reuses_peers(two_nodes):
+    app, seen = two_nodes
+    asyncio.run(app.refresh_gswarm_stats({"started": 1234.0, "after": "n1"}, checkpoint=True))
+    assert seen["nodes"] == ["n2"]
+    assert seen["reuse_since"] == [1234.0]
+    assert seen["checkpoints"][0] == {"started": 1234.0, "after": "n2"}
+
+
+class _Stop(Exception):
+    pass
+
+
+def _loop_once(app, monkeypatch, cursor):
+    """Прогнать gswarm_loop до конца первого цикла: (паузы, resume первого цикла)."""
+    sleeps, resumes = [], []
+
+    async def fake_sleep(delay):
+        if resumes:
+            raise _Stop
+        sleeps.append(delay)
+
+    async def fake_refresh(resume=None, checkpoint=False):
+        assert checkpoint
+        resumes.append(resume)
+
+    monkeypatch.setattr(app, "_refresh_sleep", fake_sleep)
+    monkeypatch.setattr(app, "refresh_gswarm_stats", fake_refresh)
+    with pytest.raises(_Stop):
+        asyncio.run(app.gswarm_loop(cursor))
+    return sleeps, resumes[0]
+
+
+def test_loop_resume_window_covers_node_pause(app_db, monkeypatch):
+    app = app_db
+    monkeypatch.setattr(app, "GSWARM_REFRESH_INTERVAL", 120)
+    monkeypatch.setattr(app, "GSWARM_NODE_PAUSE_SEC", 80)
+    now = app.time.time()
+    cursor = {"started": now - 900, "after": "n1", "saved": now - 300}
+    # 300 с > интервала, но < 2 × (120 + 80): цикл продолжается
+    _, resume = _loop_once(app, monkeypatch, dict(cursor))
+    assert resume["after"] == "n1"
+
+    _, resume = _loop_once(app, monkeypatch, dict(cursor, saved=now - 500))
+    assert resume is None
+
+    monkeypatch.setattr(app, "GSWARM_RESUME_MAX_AGE_SEC", 600)
+    _, resume = _loop_once(app, monkeypatch, dict(cursor, saved=now - 500))
+    assert resume["after"] == "n1"
+
+
+def test_loop_waits_after_recently_finished_cycle(app_db, monkeypatch):
+    app = app_db
+    monkeypatch.setattr(app, "GSWARM_REFRESH_INTERVAL", 120)
+    now = app.time.time()
+    sleeps, resume = _loop_once(app, monkeypatch, {"started": now - 100, "finished": now - 30, "saved": now - 30})
+    assert resume is None
+    assert sleeps[0] == 5 and 85 <= sleeps[1] <= 90
@@ -0,0 +1,147 @@
+import asyncio
+import json
+
+import pytest
+
+from integrations import gswarm_checker as checker
+
+
+class _RateLimited(Exception):
+    pass
+
+
+@pytest.fixture
+def fake_rpc(monkeypatch):
+    """Чекер без RPC: wins = len(peer), rewards = 10*len(peer); чанк с "bad" отвечает 429."""
+    monkeypatch.setattr(checker, "_w3", lambda: None)
+    monkeypatch.setattr(checker, "_contract", lambda w3: None)
+    monkeypatch.setattr(checker, "_endpoint_of", lambda c: "stub")
+    monkeypatch.setattr(checker, "_REWARDS_CHUNK", 2)
+    monkeypatch.setattr(checker, "_wins_votes_one", lambda c, peer: (len(peer), 0))
+
+    def rewards_call(c, chunk, desc):
+        if any("bad" in p for p in chunk):
+            raise _RateLimited("429 Too Many Requests")
+        return {p: 10 * len(p) for p in chunk}
+
+    monkeypatch.setattr(checker, "_rewards_call", rewards_call)
+    monkeypatch.setattr(checker, "_is_rate_limited", lambda e: isinstance(e, _RateLimited))
+    checker._PEER_RESULTS.clear()
+
+
+def test_failed_rewards_chunk_has_no_rewards_key(fake_rpc):
+    peers = ["aa", "bbb", "bad1", "cc"]
+    got = {pid: (data, ok) for pid, data, ok in checker._iter_peer_results(peers, None, 2)}
+
+    assert set(got) == set(peers)
+    assert got["bad1"] == ({"wins": 4}, False)
+    assert got["aa"] == ({"wins": 2, "rewards": 20}, True)
+    # чанк [bad1, cc] упал целиком по 429 — у cc тоже нет значения, но и нуля нет
+    assert got["cc"] == ({"wins": 2}, False)
+
+    # run_once: размер чанка уже подстроился, состав чанков другой — проверяем инвариант
+    out = checker.run_once(extra_peer_ids=peers)
+    assert "bad1" in out["rewards_failed"]
+    for pid, data in out["per_peer"].items():
+        assert ("rewards" in data) == (pid not in out["rewards_failed"])
+
+
+def test_failed_rewards_keep_previous_value(app_db, monkeypatch):
+    app = app_db
+    old_stats = {
+        "per_peer": {"QmA": {"wins": 1, "rewards": 500}, "QmB": {"wins": 2, "rewards": 70}},
+        "totals": {"wins": 3, "rewards": 570, "peers": 2, "ranked": 2},
+    }
+
+    async def scenario():
+        async with app.aiosqlite.connect(app.DB) as db:
+            await db.execute(
+                "INSERT INTO nodes(node_id, ip, last_seen, gswarm_peer_ids, gswarm_stats) VALUES (?,?,?,?,?)",
+                ("n1", "1.1.1.1", 0, json.dumps(["QmA", "QmB"]), json.dumps(old_stats)),
+            )
+            await db.commit()
+        await app.load_rank_index()
+
+        async def stream(**kwargs):
+            yield ("start", {"ts": "2026-01-01 00:00:00", "eoa_peers": {}, "peers": 2})
+            yield ("peer", "QmA", {"wins": 5}, False)              # rewards не получены
+            yield ("peer", "QmB", {"wins": 6, "rewards": 90}, True)
+
+        monkeypatch.setattr(app, "_gswarm_stream", stream)
+        _, configs = await app._gswarm_sources()
+        await app._stream_gswarm_result(configs, {})
+        async with app.aiosqlite.connect(app.DB) as db:
+            rows = await db.execute_fetchall("SELECT gswarm_stats, gswarm_rewards FROM nodes WHERE node_id='n1'")
+        return json.loads(rows[0][0]), rows[0][1]
+
+    stats, rewards_col = asyncio.run(scenario())
+    assert stats["per_peer"]["QmA"] == {"wins": 5, "rewards": 500}
+    assert stats["per_peer"]["QmB"]["rewards"] == 90
+    assert stats["totals"]["rewards"] == 590
+    assert rewards_col == 590
+
+
+def _bisect_rpc(monkeypatch, error_for):
+    """_rewards_call, падающий с error_for(chunk) (или отвечающий, если None); возвращает журнал вызовов."""
+    calls = []
+
+    def rewards_call(c, chunk, desc):
+        calls.append(list(chunk))
+        err = error_for(chunk)
+        if err is not None:
+            raise err
+        return {p: 1 for p in chunk}
+
+    monkeypatch.setattr(checker, "_rewards_call", rewards_call)
+    monkeypatch.setattr(checker, "_endpoint_of", lambda c: "stub")
+    monkeypatch.setattr(checker, "_load_chunk_sizes", lambda: {})
+    monkeypatch.setattr(checker, "_save_chunk_sizes", lambda: None)
+    return calls
+
+
+def _fetch(monkeypatch, peers, size):
+    monkeypatch.setattr(checker, "_REWARDS_CHUNK", size)
+    monkeypatch.setattr(checker, "_REWARDS_CHUNK_MAX", size)
+    vals = {}
+    for _, got in checker._iter_rewards_chunks(None, peers):
+        vals.update(got)
+    return vals
+
+
+def test_bisect_isolates_reverting_peer(monkeypatch):
+    calls = _bisect_rpc(monkeypatch, lambda ch: RuntimeError("execution reverted") if "p5" in ch else None)
+    peers = [f"p{i}" for i in range(8)]
+    vals = _fetch(monkeypatch, peers, 8)
+    assert set(vals) == set(peers) - {"p5"}
+    assert len(calls) <= 2 * 3 + 1   # чанк + по два вызова на уровень log2(8)
+
+
+def test_transport_error_does_not_bisect(monkeypatch):
+    calls = _bisect_rpc(monkeypatch, lambda ch: ConnectionError("read timed out"))
+    peers = [f"p{i}" for i in range(200)]
+    assert _fetch(monkeypatch, peers, 200) == {}
+    assert calls == [peers]
+
+
+def test_bisect_stops_on_transport_error_midway(monkeypatch):
+    state = {"n": 0}
+
+    def error_for(chunk):
+        state["n"] += 1
+        return RuntimeError("execution reverted") if state["n"] == 1 else ConnectionError("connection reset")
+
+    calls = _bisect_rpc(monkeypatch, error_for)
+    assert _fetch(monkeypatch, [f"p{i}" for i in range(16)], 16) == {}
+    assert len(calls) == 2
+
+
+def test_bisect_call_budget_and_pause(monkeypatch):
+    monkeypatch.setattr(checker, "_BISECT_MAX_CALLS", 5)
+    monkeypatch.setattr(checker, "_CHUNK_PAUSE", 2.0)
+    sleeps = []
+    monkeypatch.setattr(checker.time, "sleep", sleeps.append)
+    calls = _bisect_rpc(monkeypatch, lambda ch: RuntimeError("execution reverted"))
+    assert _fetch(monkeypatch, [f"p{i}" for i in range(64)], 64) == {}
+    assert len(calls) == 1 + 5
+    # после упавшего вызова — полная пауза между вызовами деления
+    assert sleeps == [2.0] * 5
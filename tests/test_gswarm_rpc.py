@@ -0,0 +1,58 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from integrations import gswarm_rpc as rpc
+
+eth_abi = pytest.importorskip("eth_abi")
+eth_utils = pytest.importorskip("eth_utils")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SIGNATURES = {
+    "getPeerId": ("getPeerId(address[])", ["address[]"], ["string[][]"]),
+    "getTotalWins": ("getTotalWins(string)", ["string"], ["uint256"]),
+    "getVoterVoteCount": ("getVoterVoteCount(string)", ["string"], ["uint256"]),
+    "getTotalRewards": ("getTotalRewards(string[])", ["string[]"], ["int256[]"]),
+}
+ARGS = {
+    "getPeerId": ["0x" + "11" * 20, "0xAbCdEf0123456789aBcDeF0123456789AbCdEf01"],
+    "getTotalWins": "QmPeerWithUnicodé",
+    "getVoterVoteCount": "",
+    "getTotalRewards": ["QmA", "Qm" + "x" * 70, ""],
+}
+RESULTS = {
+    "getPeerId": [["QmA", "QmB"], [], ["Qm" + "y" * 40]],
+    "getTotalWins": 2**200 + 7,
+    "getVoterVoteCount": 0,
+    "getTotalRewards": [5, -3, 0],
+}
+
+
+def test_selectors_match_signatures():
+    for fn, (sig, _, _) in SIGNATURES.items():
+        assert rpc.SELECTORS[fn] == eth_utils.keccak(text=sig)[:4].hex()
+
+
+@pytest.mark.parametrize("fn", sorted(SIGNATURES))
+def test_codec_matches_eth_abi(fn):
+    sig, arg_types, result_types = SIGNATURES[fn]
+    expected = "0x" + rpc.SELECTORS[fn] + eth_abi.encode(arg_types, [ARGS[fn]]).hex()
+    assert rpc.encode_call(fn, ARGS[fn]).lower() == expected.lower()
+    encoded = "0x" + eth_abi.encode(result_types, [RESULTS[fn]]).hex()
+    assert rpc.decode_result(fn, encoded) == RESULTS[fn]
+
+
+def test_empty_and_short_results_raise():
+    with pytest.raises(rpc.RpcError):
+        rpc.decode_result("getTotalWins", "0x")
+    with pytest.raises(rpc.RpcError):
+        rpc.decode_result("getTotalWins", "0x" + "00" * 16)
+
+
+def test_checker_import_does_not_load_web3():
+    code = "import sys; from integrations import gswarm_checker; print('web3' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=ROOT)
+    assert out.stdout.strip() == "False"
@@ -0,0 +1,51 @@
+import json
+import time
+
+from integrations import gswarm_checker as checker
+
+
+def test_snapshot_round_trip_drops_stale_peers(tmp_path, monkeypatch):
+    state = tmp_path / "state.json"
+    monkeypatch.setattr(checker, "_STATE_FILE", str(state))
+    monkeypatch.setattr(checker, "_STATE_PEER_MAX_AGE", 3600)
+    monkeypatch.setattr(checker, "_W3_CACHED", None)
+    monkeypatch.setattr(checker, "_RPC_PREFERRED", "https://rpc.example")
+    monkeypatch.setattr(checker, "_PEER_RESULTS", {})
+    monkeypatch.setattr(checker, "_STATE_CURSOR", {})
+    now = time.time()
+    checker._record_results({"QmA": 3, "QmB": 1}, 0)
+    checker._record_results({"QmA": 40}, 2)
+    checker._PEER_RESULTS["QmOld"] = [9, now - 7200, 9, now - 7200]
+    checker.save_state({"started": now - 10, "after": "n1"})
+
+    raw = json.loads(state.read_text())
+    assert set(raw["peers"]) == {"QmA", "QmB"} and raw["rpc"] == "https://rpc.example"
+
+    # «рестарт»: пустая память, снимок читается заново
+    monkeypatch.setattr(checker, "_PEER_RESULTS", {})
+    monkeypatch.setattr(checker, "_STATE_CURSOR", {})
+    monkeypatch.setattr(checker, "_RPC_PREFERRED", None)
+    monkeypatch.setattr(checker, "_STATE_LOADED", None)
+    cursor = checker.load_state()
+    assert cursor == {"started": now - 10, "after": "n1", "saved": raw["saved"]}
+    assert checker._RPC_PREFERRED == "https://rpc.example"
+    # rewards QmB не получены — при продолжении цикла запрашиваются заново, wins — нет
+    assert checker._reuse_results(["QmA", "QmB"], 0, now - 10) == {"QmA": 3, "QmB": 1}
+    assert checker._reuse_results(["QmA", "QmB"], 2, now - 10) == {"QmA": 40}
+    assert checker._reuse_results(["QmA"], 0, now + 10) == {}
+
+
+def test_stale_snapshot_peers_are_not_loaded(tmp_path, monkeypatch):
+    state = tmp_path / "state.json"
+    old = time.time() - 7200
+    state.write_text(json.dumps({
+        "saved": int(old), "cursor": {}, "peers": {"QmOld": [1, old, 2, old], "QmBad": ["x"]},
+    }))
+    monkeypatch.setattr(checker, "_STATE_FILE", str(state))
+    monkeypatch.setattr(checker, "_STATE_PEER_MAX_AGE", 3600)
+    monkeypatch.setattr(checker, "_PEER_RESULTS", {})
+    monkeypatch.setattr(checker, "_STATE_CURSOR", {})
+    monkeypatch.setattr(checker, "_STATE_LOADED", None)
+    monkeypatch.setattr(checker, "_RPC_PREFERRED", None)
+    assert checker.load_state() == {"saved": int(old)}
+    assert checker._PEER_RESULTS == {}
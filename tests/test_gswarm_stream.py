@@ -0,0 +1,68 @@
+import asyncio
+import json
+import time
+
+from integrations import gswarm_checker as checker
+
+
+def test_results_stay_keyed_when_workers_finish_out_of_order(monkeypatch):
+    peers = [f"Qm{i}" for i in range(8)]
+    wins = {p: 100 + i for i, p in enumerate(peers)}
+
+    def wins_votes_one(c, peer):
+        time.sleep(0.01 * (len(peers) - int(peer[2:])))   # первые peers отвечают последними
+        return wins[peer], 0
+
+    monkeypatch.setattr(checker, "_w3", lambda: None)
+    monkeypatch.setattr(checker, "_contract", lambda w3: None)
+    monkeypatch.setattr(checker, "_wins_votes_one", wins_votes_one)
+    monkeypatch.setattr(checker, "_iter_rewards_chunks", lambda c, todo: iter([(list(todo), {p: 2 * wins[p] for p in todo})]))
+    monkeypatch.setattr(checker, "save_state", lambda cursor=None: None)
+    checker._PEER_RESULTS.clear()
+
+    order, got = [], {}
+    for pid, data, ok in checker._iter_peer_results(peers, None, 4):
+        order.append(pid)
+        got[pid] = (data, ok)
+    assert got == {p: ({"wins": wins[p], "rewards": 2 * wins[p]}, True) for p in peers}
+    assert order != peers   # отдавались по готовности, а не по порядку запроса
+
+    # значения этого цикла берутся из снимка без запросов
+    monkeypatch.setattr(checker, "_contract", lambda w3: (_ for _ in ()).throw(AssertionError("RPC used")))
+    again = {pid: data for pid, data, _ in checker._iter_peer_results(peers, time.time() - 60, 4)}
+    assert again == {p: got[p][0] for p in peers}
+
+
+def test_nodes_are_written_while_the_stream_runs(app_db, monkeypatch):
+    app = app_db
+    monkeypatch.setattr(app, "GSWARM_STREAM_BATCH", 1)
+
+    async def stored(node_id):
+        async with app.aiosqlite.connect(app.DB) as db:
+            rows = await db.execute_fetchall("SELECT gswarm_wins FROM nodes WHERE node_id=?", (node_id,))
+        return rows[0][0] if rows else None
+
+    seen_mid_stream = []
+
+    async def stream(**kwargs):
+        yield ("start", {"ts": "2026-01-01 00:00:00", "eoa_peers": {}, "peers": 2})
+        yield ("peer", "QmA", {"wins": 4, "rewards": 1}, True)
+        seen_mid_stream.append((await stored("n1"), await stored("n2")))
+        yield ("peer", "QmB", {"wins": 9, "rewards": 2}, True)
+
+    async def scenario():
+        async with app.aiosqlite.connect(app.DB) as db:
+            await db.executemany(
+                "INSERT INTO nodes(node_id, ip, last_seen, gswarm_peer_ids) VALUES (?, '10.0.0.1', 0, ?)",
+                [("n1", json.dumps(["QmA"])), ("n2", json.dumps(["QmB"]))],
+            )
+            await db.commit()
+        monkeypatch.setattr(app, "_gswarm_stream", stream)
+        _, configs = await app._gswarm_sources()
+        result, written, _ = await app._stream_gswarm_result(configs, {})
+        return result, written, await stored("n2")
+
+    result, written, n2 = asyncio.run(scenario())
+    assert seen_mid_stream == [(4, None)]
+    assert n2 == 9 and written >= 2
+    assert result["totals"] == {"wins": 13, "rewards": 3, "peers": 2}
@@ -0,0 +1,62 @@
+import asyncio
+import json
+import time
+
+from integrations import gswarm_checker as checker
+from integrations.gswarm_worker import RefreshWorker, WorkerError
+
+
+async def _until(cond, timeout=20.0):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < deadline, "timeout"
+        await asyncio.sleep(0.05)
+
+
+def test_worker_restarts_after_crash(tmp_path, monkeypatch):
+    state = tmp_path / "state.json"
+    state.write_text(json.dumps({"saved": 123, "cursor": {"started": 100.0, "after": "n1"}, "peers": {}}))
+    # дочерний процесс (spawn) читает конфиг чекера из окружения
+    monkeypatch.setenv("GSWARM_STATE_FILE", str(state))
+
+    async def go():
+        worker = RefreshWorker(restart_delay=0.1)
+        worker.start()
+        try:
+            assert await worker.call("load_state") == {"started": 100.0, "after": "n1", "saved": 123}
+            pid = worker.stats()["pid"]
+            worker._proc.kill()
+            await _until(lambda: worker.restarts == 1 and worker.alive)
+            assert worker.stats()["pid"] != pid
+            # новый процесс снова поднял снимок сам
+            assert (await worker.call("load_state"))["after"] == "n1"
+            try:
+                await worker.call("no_such_call")
+            except WorkerError as exc:
+                assert "unknown call" in str(exc)
+            else:
+                raise AssertionError("unknown call accepted")
+        finally:
+            await worker.close()
+        assert not worker.alive
+
+    asyncio.run(go())
+
+
+def test_notify_uses_distinct_request_ids():
+    worker = RefreshWorker()
+    sent = []
+    worker._send = lambda rid, name, args=(), kwargs=None: sent.append(rid)
+    worker.notify("note_reported_peers", "0xabc", ["QmA"])
+    worker.notify("note_reported_peers", "0xabc", ["QmB"])
+    assert len(set(sent)) == 2 and 0 not in sent
+
+
+def test_state_file_is_read_once_per_process(tmp_path, monkeypatch):
+    state = tmp_path / "state.json"
+    state.write_text(json.dumps({"saved": 5, "cursor": {"started": 1.0}, "peers": {}}))
+    monkeypatch.setattr(checker, "_STATE_FILE", str(state))
+    monkeypatch.setattr(checker, "_STATE_LOADED", None)
+    assert checker.load_state() == {"started": 1.0, "saved": 5}
+    state.write_text("garbage")
+    assert checker.load_state() == {"started": 1.0, "saved": 5}
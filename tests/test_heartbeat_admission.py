@@ -0,0 +1,33 @@
+def _post(app, api, body):
+    return api(lambda client: client.post("/api/heartbeat", content=body, headers={"Authorization": f"Bearer {app.SHARED}"}))
+
+
+def test_overloaded_ingest_rejects_before_reading_body(app_db, api, monkeypatch):
+    app = app_db
+    monkeypatch.setattr(app, "HEARTBEAT_MAX_INFLIGHT", 2)
+    monkeypatch.setattr(app, "_HB_INFLIGHT", 2)
+    read = []
+    monkeypatch.setattr(app, "_read_body_limited", lambda *a: read.append(a))
+    resp = _post(app, api, b"not even json")
+    assert resp.status_code == 429 and not read
+    assert int(resp.headers["Retry-After"]) >= 1
+    assert app._HB_INFLIGHT == 2
+
+
+def test_overload_hint_counts_own_slot(app_db, api, monkeypatch):
+    app = app_db
+    monkeypatch.setattr(app, "HEARTBEAT_MAX_INFLIGHT", 4)   # подсказка с 3 heartbeat в работе
+    body = b'{"node_id": "n1", "status": "UP"}'
+    monkeypatch.setattr(app, "_HB_INFLIGHT", 1)
+    assert _post(app, api, body).json()["overload"] is False
+    monkeypatch.setattr(app, "_HB_INFLIGHT", 2)
+    assert _post(app, api, body).json()["overload"] is True
+    assert app._HB_INFLIGHT == 2   # слот освобождён и после ответа
+
+
+def test_slot_released_on_bad_payload(app_db, api, monkeypatch):
+    app = app_db
+    monkeypatch.setattr(app, "HEARTBEAT_MAX_INFLIGHT", 4)
+    monkeypatch.setattr(app, "_HB_INFLIGHT", 0)
+    assert _post(app, api, b"{").status_code == 400
+    assert app._HB_INFLIGHT == 0
@@ -0,0 +1,66 @@
+BEAT = {"node_id": "n1", "ip": "10.0.0.1", "status": "UP", "gswarm_eoa": "0xabc", "gswarm_peer_ids": ["QmA"], "gswarm_tgid": "42"}
+
+
+async def _beat(app, client):
+    resp = await client.post("/api/heartbeat", json=BEAT, headers={"Authorization": f"Bearer {app.SHARED}"})
+    assert resp.status_code == 200, resp.text
+
+
+async def _tgid(app):
+    async with app.aiosqlite.connect(app.DB) as db:
+        rows = await db.execute_fetchall("SELECT gswarm_tgid FROM nodes WHERE node_id='n1'")
+    return rows[0][0] if rows else "<missing>"
+
+
+def test_fast_path_reinsert_keeps_tgid(app_db, api):
+    app = app_db
+    app._GSWARM_FP.clear()
+
+    async def scenario(client):
+        await _beat(app, client)
+        assert app._GSWARM_FP["n1"][3] == "42"
+        # строка пропала мимо API (например, tombstone федерации) — отпечаток в кэше остался
+        async with app.aiosqlite.connect(app.DB) as db:
+            await db.execute("DELETE FROM nodes WHERE node_id='n1'")
+            await db.commit()
+        await _beat(app, client)
+        return await _tgid(app)
+
+    assert api(scenario) == "42"
+
+
+def test_prune_forgets_fingerprint_and_remediation(app_db, api, monkeypatch):
+    app = app_db
+    monkeypatch.setattr(app, "ADMIN_TOKEN", "adm")
+    app._GSWARM_FP.clear()
+
+    async def scenario(client):
+        await _beat(app, client)
+        app._REMEDIATION["n1"] = {"down_since": 1, "attempts": 1, "next_at": 0}
+        async with app.aiosqlite.connect(app.DB) as db:
+            await db.execute("UPDATE nodes SET last_seen=0 WHERE node_id='n1'")
+            await db.commit()
+        resp = await client.post("/api/admin/prune", json=1, headers={"Authorization": "Bearer adm"})
+        assert resp.json()["deleted"] == 1
+        assert "n1" not in app._GSWARM_FP and "n1" not in app._REMEDIATION
+        await _beat(app, client)
+        return await _tgid(app)
+
+    assert api(scenario) == "42"
+
+
+def test_reported_peers_checked_only_when_fingerprint_changes(app_db, api, monkeypatch):
+    app = app_db
+    app._GSWARM_FP.clear()
+    noted = []
+    monkeypatch.setattr(app, "note_reported_peers", lambda eoa, peers: noted.append((eoa, list(peers))))
+
+    async def scenario(client):
+        await _beat(app, client)
+        await _beat(app, client)   # быстрый путь — без сверки peers
+        changed = {**BEAT, "gswarm_peer_ids": ["QmA", "QmB"]}
+        resp = await client.post("/api/heartbeat", json=changed, headers={"Authorization": f"Bearer {app.SHARED}"})
+        assert resp.status_code == 200
+
+    api(scenario)
+    assert noted == [("0xabc", ["QmA"]), ("0xabc", ["QmA", "QmB"])]
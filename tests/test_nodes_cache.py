@@ -0,0 +1,65 @@
+import asyncio
+
+
+BEAT = {"node_id": "n1", "ip": "10.0.0.1", "status": "UP", "meta": "v1"}
+
+
+async def _beat(app, client, **extra):
+    resp = await client.post("/api/heartbeat", json={**BEAT, **extra}, headers={"Authorization": f"Bearer {app.SHARED}"})
+    assert resp.status_code == 200, resp.text
+
+
+def test_repeated_heartbeat_keeps_cached_nodes(app_db, api, monkeypatch):
+    app = app_db
+    monkeypatch.setattr(app, "NODES_CACHE_TTL_SEC", 3600)
+    builds = []
+    list_nodes = app.list_nodes
+
+    async def counting(full=False):
+        builds.append(full)
+        return await list_nodes(full)
+
+    monkeypatch.setattr(app, "list_nodes", counting)
+
+    async def scenario(client):
+        await _beat(app, client)
+        first = (await client.get("/api/nodes")).json()
+        version = app._NODES_VERSION
+        await _beat(app, client)  # двигает только last_seen
+        assert app._NODES_VERSION == version
+        assert (await client.get("/api/nodes")).json() == first
+        assert len(builds) == 1
+
+        await _beat(app, client, meta="v2")
+        assert app._NODES_VERSION == version + 1
+        assert (await client.get("/api/nodes")).json()[0]["meta"] == "v2"
+        assert len(builds) == 2
+
+        # прошлый heartbeat устарел — нода снова становится UP, кэш сбрасывается
+        visible, seen = app._HB_VISIBLE["n1"]
+        app._HB_VISIBLE["n1"] = (visible, seen - app.THRESHOLD - 1)
+        await _beat(app, client, meta="v2")
+        assert app._NODES_VERSION == version + 2
+
+    api(scenario)
+
+
+def test_cache_window_expires(app_db, monkeypatch):
+    app = app_db
+    clock = [1000.0]
+    monkeypatch.setattr(app.time, "time", lambda: clock[0])
+    monkeypatch.setattr(app, "NODES_CACHE_TTL_SEC", 5)
+    calls = []
+
+    async def build():
+        calls.append(clock[0])
+        return {"n": len(calls)}
+
+    async def scenario():
+        assert await app.cached_nodes_body(("t",), build) == b'{"n":1}'
+        clock[0] = 1004.0
+        assert await app.cached_nodes_body(("t",), build) == b'{"n":1}'
+        clock[0] = 1005.0
+        assert await app.cached_nodes_body(("t",), build) == b'{"n":2}'
+
+    asyncio.run(scenario())
@@ -0,0 +1,69 @@
+import asyncio
+import json
+
+
+STATS = {
+    "per_peer": {"QmA": {"wins": 3, "rewards": 30}, "QmB": {"wins": 1, "rewards": 5}},
+    "totals": {"wins": 4, "rewards": 35, "peers": 2, "ranked": 2},
+    "missing_peers": ["QmC"],
+    "last_check": "2026-01-01 00:00:00",
+}
+
+
+def _seed(app):
+    async def go():
+        async with app.aiosqlite.connect(app.DB) as db:
+            await db.execute(
+                "INSERT INTO nodes(node_id, ip, last_seen, last_reported, gswarm_peer_ids, gswarm_stats) VALUES (?,?,?,?,?,?)",
+                ("n1", "10.0.0.1", 1, "UP", json.dumps(["QmA", "QmB", "QmC"]), json.dumps(STATS)),
+            )
+            await db.commit()
+    asyncio.run(go())
+
+
+def test_list_is_slim_and_detail_is_lazy(app_db, api):
+    app = app_db
+    _seed(app)
+
+    async def scenario(client):
+        slim = (await client.get("/api/nodes")).json()
+        full = (await client.get("/api/nodes", params={"full": 1})).json()
+        detail = await client.get("/api/nodes/n1/gswarm")
+        missing = await client.get("/api/nodes/nope/gswarm")
+        return slim, full, detail, missing
+
+    slim, full, detail, missing = api(scenario)
+    g = slim[0]["gswarm"]
+    assert g["stats"] == {"totals": STATS["totals"], "last_check": STATS["last_check"], "rank": None, "missing_count": 1}
+    assert "peer_ids" not in g and g["peers_count"] == 3
+
+    assert detail.status_code == 200
+    body = detail.json()
+    assert body["node_id"] == "n1"
+    assert body["gswarm"] == full[0]["gswarm"]
+    assert body["gswarm"]["peer_ids"] == ["QmA", "QmB", "QmC"]
+    assert set(body["gswarm"]["stats"]["per_peer"]) == {"QmA", "QmB"}
+    assert missing.status_code == 404
+
+
+def test_detail_follows_nodes_version(app_db, api, monkeypatch):
+    app = app_db
+    monkeypatch.setattr(app, "NODES_CACHE_TTL_SEC", 3600)
+    _seed(app)
+
+    async def rewrite():
+        async with app.aiosqlite.connect(app.DB) as db:
+            await db.execute("UPDATE nodes SET gswarm_peer_ids=? WHERE node_id='n1'", (json.dumps(["QmA"]),))
+            await db.commit()
+
+    async def scenario(client):
+        before = (await client.get("/api/nodes/n1/gswarm")).json()
+        await rewrite()
+        cached = (await client.get("/api/nodes/n1/gswarm")).json()
+        app.bump_nodes_version()
+        after = (await client.get("/api/nodes/n1/gswarm")).json()
+        return before, cached, after
+
+    before, cached, after = api(scenario)
+    assert before == cached
+    assert after["gswarm"]["peer_ids"] == ["QmA"]
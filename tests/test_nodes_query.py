@@ -0,0 +1,101 @@
+import asyncio
+import base64
+import json
+
+import pytest
+
+
+def _seed(app, rows):
+    async def go():
+        async with app.aiosqlite.connect(app.DB) as db:
+            await db.executemany(
+                "INSERT INTO nodes(node_id, ip, last_seen, last_reported) VALUES(?, '10.0.0.1', ?, 'UP')",
+                rows,
+            )
+            await db.commit()
+    asyncio.run(go())
+
+
+def _all_pages(app, **kwargs):
+    async def go():
+        ids, cursor = [], None
+        while True:
+            page = await app.query_nodes(1, cursor=cursor, **kwargs)
+            ids += [n["node_id"] for n in page["items"]]
+            cursor = page["next_cursor"]
+            if not cursor:
+                return ids
+    return asyncio.run(go())
+
+
+def test_age_order_means_seconds_since_heartbeat(app_db, monkeypatch):
+    app = app_db
+    monkeypatch.setattr(app.time, "time", lambda: 10_000.0)
+    _seed(app, [("old", 9_000), ("mid", 9_500), ("new", 9_990)])
+    assert _all_pages(app, sort="age") == ["new", "mid", "old"]
+    assert _all_pages(app, sort="age", order="asc") == ["new", "mid", "old"]
+    assert _all_pages(app, sort="age", order="desc") == ["old", "mid", "new"]
+
+
+def test_status_cursor_is_stable_when_node_goes_stale(app_db, monkeypatch):
+    app = app_db
+    clock = [10_000.0]
+    monkeypatch.setattr(app.time, "time", lambda: clock[0])
+    t = 10_000 - app.THRESHOLD
+    # все UP; "d" устареет, пока листаем страницы
+    _seed(app, [("a", t + 50), ("b", t + 50), ("c", t + 50), ("d", t + 1)])
+
+    async def go():
+        by_status = await app.query_nodes(2, sort="status", order="desc")
+        only_up = await app.query_nodes(2, status="UP")
+        clock[0] += 10   # "d" перешёл в DOWN между запросами
+        by_status_2 = await app.query_nodes(2, cursor=by_status["next_cursor"], sort="status", order="desc")
+        only_up_2 = await app.query_nodes(2, cursor=only_up["next_cursor"], status="UP")
+        return by_status, by_status_2, only_up, only_up_2
+
+    by_status, by_status_2, only_up, only_up_2 = asyncio.run(go())
+    # без снимка now "d" повторился бы на второй странице sort=status и пропал бы из status=UP
+    assert [n["node_id"] for n in by_status["items"] + by_status_2["items"]] == ["d", "c", "b", "a"]
+    assert by_status_2["next_cursor"] is None
+    assert [n["node_id"] for n in only_up["items"] + only_up_2["items"]] == ["a", "b", "c", "d"]
+    assert only_up_2["total"] == 4
+    # computed считается от того же момента, что и фильтр: UP-страница не содержит DOWN
+    assert {n["computed"] for n in only_up["items"] + only_up_2["items"]} == {"UP"}
+    assert [n["computed"] for n in by_status_2["items"]] == ["UP", "UP"]
+
+
+def test_cursor_format(app_db):
+    app = app_db
+    _seed(app, [("a", 1), ("b", 1)])
+
+    def cursor(value):
+        return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+
+    # курсор прежнего формата (без now) от уже открытого дашборда продолжает работать
+    page = asyncio.run(app.query_nodes(1, cursor=cursor(["a", "a"])))
+    assert [n["node_id"] for n in page["items"]] == ["b"]
+    for bad in (["a", 1], ["a", "a", "now"], ["a", "a", 1, 2]):
+        with pytest.raises(app.HTTPException):
+            asyncio.run(app.query_nodes(1, cursor=cursor(bad)))
+
+
+def test_sort_without_limit_is_applied(app_db, api):
+    app = app_db
+
+    async def seed():
+        async with app.aiosqlite.connect(app.DB) as db:
+            await db.executemany(
+                "INSERT INTO nodes(node_id, ip, last_seen, last_reported, gswarm_wins) VALUES(?, '10.0.0.1', 1, 'UP', ?)",
+                [("a", 1), ("b", 3), ("c", 2)],
+            )
+            await db.commit()
+
+    async def scenario(client):
+        plain = (await client.get("/api/nodes")).json()
+        by_wins = (await client.get("/api/nodes", params={"sort": "wins", "order": "desc"})).json()
+        return plain, by_wins
+
+    asyncio.run(seed())
+    plain, by_wins = api(scenario)
+    assert [n["node_id"] for n in plain] == ["a", "b", "c"]
+    assert [n["node_id"] for n in by_wins["items"]] == ["b", "c", "a"]
@@ -0,0 +1,76 @@
+import copy
+import random
+
+import app
+
+
+def _reference(values, configs):
+    return app._aggregate_nodes(values, configs, None)
+
+
+def test_deltas_match_full_aggregation():
+    rnd = random.Random(42)
+    index = app.PeerNodeIndex()
+    peers = [f"Qm{i}" for i in range(12)]
+    configs = {}
+    values = {}   # модель: последние данные peer, как их должен помнить индекс
+    before = {}
+    for step in range(2000):
+        op = rnd.random()
+        if op < 0.2:
+            node_id = f"n{rnd.randrange(6)}"
+            configs[node_id] = {
+                "peer_ids": rnd.sample(peers, rnd.randrange(0, 4)),
+                "eoa": rnd.choice((None, "0xabc")),
+                "alert": rnd.choice((None, 0, 1)),
+            }
+            index.configure({node_id: dict(configs[node_id])})
+        elif op < 0.25 and configs:
+            node_id = rnd.choice(sorted(configs))
+            del configs[node_id]
+            index.prune(configs)
+        else:
+            batch = {}
+            for pid in rnd.sample(peers, 4):
+                data = {"wins": rnd.randrange(3)}
+                if rnd.random() < 0.8:
+                    data["rewards"] = rnd.randrange(100)
+                batch[pid] = data
+            model_batch = copy.deepcopy(batch)
+            if op < 0.6 and configs:
+                node_ids = rnd.sample(sorted(configs), min(2, len(configs)))
+                index.apply(batch, node_ids)
+                touched = {p for n in node_ids for p in configs[n]["peer_ids"]}
+            else:
+                index.apply_peers(batch)
+                touched = set(model_batch)
+            for pid in touched:
+                new = model_batch.get(pid)
+                values[pid] = app._keep_rewards(values.get(pid), new)
+                if values[pid] is None:
+                    del values[pid]
+        owned = {p for cfg in configs.values() for p in cfg["peer_ids"]}
+        for pid in [p for p in values if p not in owned]:
+            del values[pid]
+
+        expected = _reference(values, configs)
+        got = {n: index.stats(n) for n in configs if index.stats(n) is not None}
+        assert got == expected, step
+        dirty = index.pop_dirty()
+        # удалённые ноды не пишутся — в dirty только живые
+        changed = {n for n in configs if expected.get(n) != before.get(n)}
+        assert changed <= dirty, step
+        before = copy.deepcopy(expected)
+
+
+def test_rename_keeps_aggregate_and_peer_links():
+    index = app.PeerNodeIndex()
+    index.configure({"n1": {"peer_ids": ["QmA", "QmB"]}})
+    index.apply({"QmA": {"wins": 2, "rewards": 5}}, ["n1"])
+    index.rename_node("n1", "n2")
+    assert index.stats("n1") is None
+    assert index.stats("n2")["totals"] == {"wins": 2, "rewards": 5, "peers": 2, "ranked": 1}
+    index.pop_dirty()
+    index.apply_peers({"QmB": {"wins": 1, "rewards": 1}})
+    assert index.pop_dirty() == {"n2"}
+    assert index.stats("n2")["totals"]["wins"] == 3 and index.stats("n2")["missing_peers"] is None
@@ -0,0 +1,42 @@
+import random
+
+import app
+
+
+def test_sorted_keys_matches_plain_sort(monkeypatch):
+    # маленький блок, чтобы деление и слияние блоков реально срабатывали
+    monkeypatch.setattr(app._SortedKeys, "LOAD", 4)
+    keys = app._SortedKeys()
+    ref = []
+    rnd = random.Random(7)
+    for _ in range(3000):
+        if ref and rnd.random() < 0.45:
+            key = rnd.choice(ref)
+            ref.remove(key)
+            assert keys.remove(key)
+        else:
+            key = (-rnd.randint(0, 50), -rnd.randint(0, 5), f"p{rnd.randint(0, 10**6)}")
+            if key in ref:
+                continue
+            ref.append(key)
+            keys.add(key)
+        ref.sort()
+        assert len(keys) == len(ref)
+        probe = (-rnd.randint(0, 50), -rnd.randint(0, 5))
+        assert keys.bisect_left(probe) == sum(1 for k in ref if k < probe)
+    assert not keys.remove((1, 1, "missing"))
+    for start in (0, 1, 5, len(ref) // 2, len(ref) - 1, len(ref) + 3):
+        assert list(keys.islice(start, start + 17)) == ref[start:start + 17]
+
+
+def test_rank_index_ties_and_updates():
+    idx = app.RankIndex()
+    idx.set_node("n1", {"a": {"wins": 5, "rewards": 10}, "b": {"wins": 5, "rewards": 10}})
+    idx.set_node("n2", {"c": {"wins": 9, "rewards": 1}, "d": {"wins": 1, "rewards": 0}})
+    assert idx.rank("c")["rank"] == 1
+    assert idx.rank("a")["rank"] == idx.rank("b")["rank"] == 2
+    assert idx.rank("d") == {"rank": 4, "percentile": 25.0, "of": 4}
+    idx.set_node("n2", {"d": {"wins": 20, "rewards": 0}})  # c ушёл из ноды
+    assert idx.rank("c") is None
+    assert [r["peer_id"] for r in idx.top(2, 1)] == ["a", "b"]
+    assert idx.top(1)[0] == {"rank": 1, "percentile": 100.0, "peer_id": "d", "wins": 20, "rewards": 0, "nodes": ["n2"]}
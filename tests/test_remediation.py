@@ -0,0 +1,65 @@
+import pytest
+
+
+@pytest.fixture
+def clock(app_db, monkeypatch):
+    app = app_db
+    now = [10_000.0]
+    monkeypatch.setattr(app.time, "time", lambda: now[0])
+    monkeypatch.setattr(app, "REMEDIATION_ENABLED", True)
+    monkeypatch.setattr(app, "REMEDIATION_GRACE_SEC", 120)
+    monkeypatch.setattr(app, "REMEDIATION_BACKOFF_SEC", 600)
+    monkeypatch.setattr(app, "REMEDIATION_BACKOFF_MAX_SEC", 1500)
+    return app, now
+
+
+def _types(actions):
+    return [a["type"] for a in actions]
+
+
+def test_grace_then_exponential_backoff_with_cap(clock):
+    app, now = clock
+    plan = lambda: app.plan_remediation("n1", "DOWN", "reason=no_runtime", None)
+    assert plan() == []                       # только что упала
+    now[0] += 119
+    assert plan() == []                       # grace ещё не вышел
+    now[0] += 1
+    assert _types(plan()) == ["restart-launcher"]
+
+    # паузы 600, 1200, дальше потолок 1500
+    for pause in (600, 1200, 1500, 1500):
+        now[0] += pause - 1
+        assert plan() == []
+        now[0] += 1
+        assert plan() != []
+    assert app._REMEDIATION["n1"]["attempts"] == 5
+
+
+def test_up_resets_backoff_and_results_are_kept(clock):
+    app, now = clock
+    app.plan_remediation("n1", "DOWN", "reason=empty_screen_no_runtime", None)
+    now[0] += 120
+    actions = app.plan_remediation("n1", "DOWN", "reason=empty_screen_no_runtime", None)
+    assert _types(actions) == ["kill-empty-screen", "restart-launcher"]
+    assert len({a["id"] for a in actions}) == 2
+
+    result = {"id": actions[1]["id"], "type": "restart-launcher", "ok": True, "detail": "restarted"}
+    assert app.plan_remediation("n1", "UP", None, [result]) == []
+    view = app._remediation_view("n1")
+    assert view["attempts"] == 0 and view["last_result"]["ok"] is True
+
+    # новое падение снова ждёт grace и начинает backoff с первой ступени
+    now[0] += 5
+    assert app.plan_remediation("n1", "DOWN", None, None) == []
+    now[0] += 120
+    assert app.plan_remediation("n1", "DOWN", None, None) != []
+    assert app._REMEDIATION["n1"]["next_at"] == now[0] + 600
+
+
+def test_disabled_remediation_only_tracks_state(clock, monkeypatch):
+    app, now = clock
+    monkeypatch.setattr(app, "REMEDIATION_ENABLED", False)
+    app.plan_remediation("n1", "DOWN", None, None)
+    now[0] += 3600
+    assert app.plan_remediation("n1", "DOWN", None, None) == []
+    assert app._REMEDIATION["n1"]["down_since"] == 10_000
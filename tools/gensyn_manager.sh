@@ -52,6 +52,7 @@ AGENT_BIN="/usr/local/bin/gensyn_agent.sh"
 AGENT_ENV="/etc/gensyn-agent.env"
 AGENT_SERVICE="/etc/systemd/system/gensyn-agent.service"
 AGENT_TIMER="/etc/systemd/system/gensyn-agent.timer"
+AGENT_DAEMON_SERVICE="/etc/systemd/system/gensyn-agent-daemon.service"
 
 # авторестарт роя (watchdog + screen launcher)
 WATCHDOG_BIN="/usr/local/bin/gensyn-watchdog.sh"
@@ -157,9 +158,11 @@ tr(){
       rm_agent_api)       echo "Removing node from monitor via /api/admin/delete...";;
       rm_agent_done)      echo "Agent removed.";;
 
-      autorestart_install) echo "Installing autorestart (watchdog + launcher)...";;
+      autorestart_install) echo "Installing autorestart (launcher; watchdog only without server remediation)...";;
       autorestart_ok)      echo "Autorestart installed.";;
       autorestart_hint)    echo "Screen session name: gensyn (screen -ls / screen -r gensyn)";;
+      autorestart_remote)  echo "REMOTE_ACTIONS allows restart-launcher: the server restarts a DOWN launcher via heartbeat, watchdog disabled";;
+      autorestart_local)   echo "restart-launcher not in REMOTE_ACTIONS: installing the local watchdog timer";;
 
       autorestart_logs_live) echo "=== live watchdog logs (Ctrl+C to exit) ===";;
       autorestart_logs_tail) echo "=== tail of swarm log (rl-swarm inside screen gensyn) ===";;
@@ -268,9 +271,11 @@ tr(){
       rm_agent_api)       echo "Удаляю ноду из монитора через /api/admin/delete...";;
       rm_agent_done)      echo "Агент удалён.";;
 
-      autorestart_install) echo "Ставлю авторестарт (watchdog + launcher)...";;
+      autorestart_install) echo "Ставлю авторестарт (launcher; watchdog — только без серверной ремедиации)...";;
       autorestart_ok)      echo "Авторестарт установлен.";;
       autorestart_hint)    echo "screen-сессия будет называться gensyn (screen -ls / screen -r gensyn)";;
+      autorestart_remote)  echo "REMOTE_ACTIONS разрешает restart-launcher: упавший launcher перезапускает сервер через heartbeat, watchdog выключен";;
+      autorestart_local)   echo "restart-launcher не разрешён в REMOTE_ACTIONS: ставлю локальный watchdog.timer";;
 
       autorestart_logs_live) echo "=== живые логи watchdog (Ctrl+C чтобы выйти) ===";;
       autorestart_logs_tail) echo "=== хвост лога роя (rl-swarm внутри screen gensyn) ===";;
@@ -620,7 +625,7 @@ Type=simple
 WorkingDirectory=${repo}
 Environment=PYTHONUNBUFFERED=1
 EnvironmentFile=-${repo}/.env
-ExecStart=${repo}/.venv/bin/uvicorn app:app --host 0.0.0.0 --port ${port}
+ExecStart=${repo}/.venv/bin/uvicorn app:app --host 0.0.0.0 --port ${port} --timeout-keep-alive 75
 Restart=always
 RestartSec=2s
 
@@ -729,9 +734,10 @@ install_agent_from_raw(){
   curl -fsSL "$RAW_BASE/agents/linux/gensyn_agent.sh"      -o "$AGENT_BIN"
   curl -fsSL "$RAW_BASE/agents/linux/gensyn-agent.service" -o "$AGENT_SERVICE"
   curl -fsSL "$RAW_BASE/agents/linux/gensyn-agent.timer"   -o "$AGENT_TIMER"
+  curl -fsSL "$RAW_BASE/agents/linux/gensyn-agent-daemon.service" -o "$AGENT_DAEMON_SERVICE"
   chmod 0755 "$AGENT_BIN"
-  chmod 0644 "$AGENT_SERVICE" "$AGENT_TIMER"
-  crlf_fix "$AGENT_BIN" "$AGENT_SERVICE" "$AGENT_TIMER"
+  chmod 0644 "$AGENT_SERVICE" "$AGENT_TIMER" "$AGENT_DAEMON_SERVICE"
+  crlf_fix "$AGENT_BIN" "$AGENT_SERVICE" "$AGENT_TIMER" "$AGENT_DAEMON_SERVICE"
 }
 
 install_agent(){
@@ -756,7 +762,8 @@ install_agent(){
     install -m0755 "$agents_dir/gensyn_agent.sh" "$AGENT_BIN"
     install -m0644 "$agents_dir/gensyn-agent.service" "$AGENT_SERVICE"
     install -m0644 "$agents_dir/gensyn-agent.timer"   "$AGENT_TIMER"
-    crlf_fix "$AGENT_BIN" "$AGENT_SERVICE" "$AGENT_TIMER"
+    install -m0644 "$agents_dir/gensyn-agent-daemon.service" "$AGENT_DAEMON_SERVICE"
+    crlf_fix "$AGENT_BIN" "$AGENT_SERVICE" "$AGENT_TIMER" "$AGENT_DAEMON_SERVICE"
   else
     install_agent_from_raw
   fi
@@ -884,8 +891,8 @@ remove_agent(){
     set -u
   fi
 
-  systemctl disable --now "$(basename "$AGENT_TIMER")" "$(basename "$AGENT_SERVICE")" || true
-  rm -f "$AGENT_TIMER" "$AGENT_SERVICE" "$AGENT_BIN" "$AGENT_ENV"
+  systemctl disable --now "$(basename "$AGENT_TIMER")" "$(basename "$AGENT_SERVICE")" "$(basename "$AGENT_DAEMON_SERVICE")" || true
+  rm -f "$AGENT_TIMER" "$AGENT_SERVICE" "$AGENT_DAEMON_SERVICE" "$AGENT_BIN" "$AGENT_ENV"
   systemctl daemon-reload
 
   if [[ -n "$server_env" && -n "$node_env" && -n "$admin_env" ]]; then
@@ -902,19 +909,44 @@ remove_agent(){
 # -----------------------------
 # autorestart (watchdog + launcher)
 # -----------------------------
+# restart-launcher разрешён агенту (REMOTE_ACTIONS в env агента; пусто = дефолт агента,
+# в котором он есть) — упавший launcher перезапускает сервер, второй рестарт от watchdog не нужен
+remote_restart_enabled(){
+  local v
+  v=$(sed -n "s/^REMOTE_ACTIONS=//p" "$AGENT_ENV" 2>/dev/null | tail -n 1 | tr -d "\"'" || true)
+  if [[ -z "$v" ]]; then
+    return 0
+  fi
+  [[ ",${v}," == *",restart-launcher,"* ]]
+}
+
 install_autorestart(){
   need_root
   info "$(tr autorestart_install)"
 
-  curl -fsSL "$RAW_BASE/agents/linux/gensyn-watchdog.sh"              -o "$WATCHDOG_BIN"
-  curl -fsSL "$RAW_BASE/agents/linux/gensyn-watchdog.service"         -o "$WATCHDOG_SERVICE"
-  curl -fsSL "$RAW_BASE/agents/linux/gensyn-watchdog.timer"           -o "$WATCHDOG_TIMER"
   curl -fsSL "$RAW_BASE/agents/linux/gensyn-screen-launcher.sh"       -o "$LAUNCHER_BIN"
   curl -fsSL "$RAW_BASE/agents/linux/gensyn-screen-launcher.service"  -o "$LAUNCHER_SERVICE"
-
-  chmod 0755 "$WATCHDOG_BIN" "$LAUNCHER_BIN"
-  chmod 0644 "$WATCHDOG_SERVICE" "$WATCHDOG_TIMER" "$LAUNCHER_SERVICE"
-  crlf_fix "$WATCHDOG_BIN" "$WATCHDOG_SERVICE" "$WATCHDOG_TIMER" "$LAUNCHER_BIN" "$LAUNCHER_SERVICE"
+  chmod 0755 "$LAUNCHER_BIN"
+  chmod 0644 "$LAUNCHER_SERVICE"
+  crlf_fix "$LAUNCHER_BIN" "$LAUNCHER_SERVICE"
+
+  local use_watchdog=false
+  if remote_restart_enabled; then
+    info "$(tr autorestart_remote)"
+    # watchdog от прошлой установки выключаем и убираем
+    systemctl disable --now "$(basename "$WATCHDOG_TIMER")" 2>/dev/null || true
+    systemctl disable --now "$(basename "$WATCHDOG_SERVICE")" 2>/dev/null || true
+    rm -f "$WATCHDOG_TIMER" "$WATCHDOG_SERVICE" "$WATCHDOG_BIN"
+  else
+    info "$(tr autorestart_local)"
+    use_watchdog=true
+    curl -fsSL "$RAW_BASE/agents/linux/gensyn-watchdog.sh"              -o "$WATCHDOG_BIN"
+    curl -fsSL "$RAW_BASE/agents/linux/gensyn-watchdog.service"         -o "$WATCHDOG_SERVICE"
+    curl -fsSL "$RAW_BASE/agents/linux/gensyn-watchdog.timer"           -o "$WATCHDOG_TIMER"
+    chmod 0755 "$WATCHDOG_BIN"
+    chmod 0644 "$WATCHDOG_SERVICE" "$WATCHDOG_TIMER"
+    crlf_fix "$WATCHDOG_BIN" "$WATCHDOG_SERVICE" "$WATCHDOG_TIMER"
+  fi
 
   # лог роя
   if [[ ! -f "$SWARM_LOG" ]]; then
@@ -940,8 +972,10 @@ install_autorestart(){
   systemctl restart "$(basename "$AGENT_SERVICE")" || true
   # launcher создает screen gensyn и запускает рой
   systemctl enable --now "$(basename "$LAUNCHER_SERVICE")"
-  # watchdog.timer периодически проверяет статус и если DOWN рестартит launcher
-  systemctl enable --now "$(basename "$WATCHDOG_TIMER")"
+  # без серверной ремедиации: watchdog.timer периодически проверяет статус и если DOWN рестартит launcher
+  if [[ "$use_watchdog" == "true" ]]; then
+    systemctl enable --now "$(basename "$WATCHDOG_TIMER")"
+  fi
 
   ok "$(tr autorestart_ok)"
   info "$(tr autorestart_hint)"